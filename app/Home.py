@@ -1,11 +1,12 @@
 import os
 import sys
-from datetime import date
 
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import streamlit as st
 
+from src import toolkit
+
 st.markdown(
     """
     <style>
@@ -15,7 +16,7 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-today = date(2024, 6, 27)
+today = toolkit.last_updated()
 today_format = today.strftime("%B %-d, %Y")
 
 def main():
@@ -1,15 +1,12 @@
 import os
 import sys
-from datetime import date
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-import pandas as pd
 import streamlit as st
 import sqlite3 as sql
-from matplotlib import rcParams
 
-from src import charts
+from src import config
 from src import toolkit
 
 st.set_page_config(page_title="Release Overview")
@@ -23,21 +20,14 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-connection = sql.connect('data/taylor_swift.db')
-cursor = connection.cursor()
+db_name = 'data/taylor_swift.db'
 
-rcParams, custom_params = toolkit.chart_params(rcParams)
-
-# Creating temporary table to be used throughout
-temp_table = toolkit.sql_to_string('release_temp_table.sql')
-cursor.executescript(temp_table)
-
-today = date(2024, 6, 27)
+today = toolkit.last_updated()
 today_format = today.strftime("%B %-d, %Y")
 
 def main():
-    sidebar()
-    content()
+    eras = sidebar()
+    content(toolkit.db_version(db_name), eras)
 
 def sidebar():
     with st.sidebar:
@@ -51,23 +41,50 @@ def sidebar():
         
         """.format(today_format), unsafe_allow_html=True)
 
-@st.cache_data
-def content():
+        era_labels = dict(toolkit.era_options(db_name))
+        eras = st.multiselect('Eras', list(era_labels), default=list(era_labels), format_func=era_labels.get)
+    return tuple(eras)
+
+# The database version is only an argument so the cached content is
+# rebuilt whenever a new database is published; every era filter
+# combination is cached separately
+@st.cache_data(max_entries=64)
+def content(db_version, eras):
+    # Imported here rather than at the top so a cached rerun never loads
+    # pandas, matplotlib, or seaborn
+    from src import chart_data
+    from src import chart_workers
+    from src import release_dates
+
+    if not eras:
+        st.info('Select at least one era to see the charts.')
+        return
+
+    rcParams, custom_params = toolkit.chart_params()
+
+    # Only the selected eras are queried, from a temporary table; results
+    # are shared with every other reader of the same data
+    frames = toolkit.read_queries(db_name, ['release_formats.sql', 'release_dates_split.sql',
+                                            'month_day_distribution.sql'],
+                                  ['release_temp_table.sql'], eras)
+
+    # Charts are drawn in worker processes while the page is laid out,
+    # and each one fills its placeholder as soon as it's done
+    placeholders = {}
+
     st.markdown("""
     ## Song Release Formats
 
     Taylor Swift currently has over 350 songs in her discography: many have been released on her studio albums, but a significant amount have been released in other formats. To better visualize her discography, I categorized her songs into four groups based on release format: songs on her studio albums (including deluxe versions), songs on her rerecorded albums, songs on other artists' albums (not including soundtracks), and any miscellanious release formats such as EPs, promotional singles, or soundtrack releases.
     """)
     
-    release_formats = toolkit.sql_to_string('release_formats.sql')
-    
-    formats = pd.read_sql(release_formats, connection)
+    formats = frames['release_formats.sql']
     formats_table = formats.set_index('classification')
 
-    formats_fig, formats_ax = charts.formats_pie(custom_params, formats, 'total_songs', 'classification', 'Song Release Formats', 
-                                             ['#f6fff8', '#eaf4f4', '#cce3de', '#a4c3b2'], True, 'release_formats.png', True, formats)
+    formats_chart = chart_workers.submit('formats_pie', custom_params, formats, 'total_songs', 'classification', 'Song Release Formats', 
+                                         config.palette('release_formats'), table_bool=True, table_df=formats)
     
-    st.pyplot(formats_fig)
+    placeholders[formats_chart] = st.empty()
 
     with st.expander("See discussion"):
         st.write("""
@@ -82,13 +99,12 @@ def content():
     1. I plot the frequency distributions for release years, release months, and release days independently, seeing which years, months and days respectively Taylor has released most of her music.
     2. I plot release months against release days to find the most common dates on which Taylor tends to release music.
     """)
-    release_dates_split = toolkit.sql_to_string('release_dates_split.sql')
-    releases = pd.read_sql(release_dates_split, connection)
+    releases = frames['release_dates_split.sql']
 
-    releases_fig, releases_ax = charts.release_hist(custom_params, releases, 'year', 'month', 'day', 'Frequency Distributions of Song Release Dates', 
-                                             'Release Years', 'Release Months', 'Release Days', 'Year', 'Month', 'Day of Month', 'Song Count', 
-                                             ['#d00000', '#e85d04', '#faa307'], ['#6a040f'], True, 'release_dates_distribution.png')
-    st.pyplot(releases_fig)
+    releases_chart = chart_workers.submit('release_hist', custom_params, releases, 'year', 'month', 'day', 'Frequency Distributions of Song Release Dates', 
+                                          'Release Years', 'Release Months', 'Release Days', 'Year', 'Month', 'Day of Month', 'Song Count', 
+                                          config.palette('release_dates'), config.palette('release_dates_edges'))
+    placeholders[releases_chart] = st.empty()
 
     with st.expander("See discussion"):
         st.write("""
@@ -97,21 +113,30 @@ def content():
             For productive months, Taylor tends to release her songs in October, with nearly a third of her entire catalogue being released then. Other months of high activity are November, April, and July, having 60, 59, and 41 songs releases respectively. She does not often release music in February or January, the former only having 3 song releases and the latter having 5 song releases. Taylor also tends to release songs later in the month, most being released between the 19th and 27th days of the month. She also tends to release songs on the 12th, 7th, 9th, and 11th days of the month, falling within the first two weeks of a month.
             """)
 
-    month_day_distribution = toolkit.sql_to_string('month_day_distribution.sql')
-    month_day = pd.read_sql(month_day_distribution, connection)
-    dates = month_day.sort_values(by=['count'], ascending=False)
-    dates = dates[['date', 'count']].head(10)
+    month_day = frames['month_day_distribution.sql']
+    month_day['date'] = release_dates.date_labels(month_day['month'], month_day['day'])
+    dates = chart_data.top_n(month_day, 'date', 'count', 10, other_label=None)
 
-    freq_dates_fig, freq_dates_ax = charts.date_scatter(custom_params, month_day, 'month', 'day', 'count', 'Most Frequent Release Dates', 
-                                                        'Month', 'Day of Month', True, 'most_frequent_dates.png', True, dates)
-    st.pyplot(freq_dates_fig)
+    freq_dates_chart = chart_workers.submit('date_scatter', custom_params, month_day, 'month', 'day', 'count', 'Most Frequent Release Dates', 
+                                            'Month', 'Day of Month', table_bool=True, table_df=dates)
+    placeholders[freq_dates_chart] = st.empty()
 
     with st.expander("See discussion"):
         st.write("""
             The previously noticed pattern of releasing in October still appears when plotting release months against release days, with three different dates in October being in the top 10 most frequent release dates: 10/21, 10/22, and 10/27, the last of which has the most number of song releases. The other months that had high releease distributions when independently plotted show up in the top 10 as well: 4/9 and 4/19 for April, 7/7 and 7/24 for July, and 11/12 for November. These release dates also match the pattern of Taylor either releasing music between the 19th and 27th dates of the month or within the first two weeks of the month.
             """)
 
+    # Gaps are computed from every selected release date rather than a summary query
+    connection = sql.connect(db_name)
+    toolkit.select_eras(connection, eras)
+    gaps = release_dates.gap_summary(release_dates.load_releases(connection, selected_only=True))
+    connection.close()
+
+    with st.expander("See release gaps per era"):
+        st.dataframe(gaps, column_config={'first_release': st.column_config.DateColumn(format='YYYY-MM-DD'),
+                                          'last_release': st.column_config.DateColumn(format='YYYY-MM-DD')})
+
+    chart_workers.stream(placeholders)
+
 if __name__ == '__main__':
     main()
-
-connection.close()
\ No newline at end of file
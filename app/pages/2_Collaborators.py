@@ -1,15 +1,11 @@
 import os
 import sys
-from datetime import date
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-import pandas as pd
 import streamlit as st
-import sqlite3 as sql
-from matplotlib import rcParams
 
-from src import charts
+from src import config
 from src import toolkit
 
 st.set_page_config(page_title="Collaborators")
@@ -23,28 +19,14 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-connection = sql.connect('data/taylor_swift.db')
-cursor = connection.cursor()
+db_name = 'data/taylor_swift.db'
 
-eras = toolkit.eras_order()
-
-credits = {
-    'writer': '#6D466B',
-    'producer': '#58A4B0',
-    'artist': '#FF6B6C'}
-
-rcParams, custom_params = toolkit.chart_params(rcParams)
-
-# Creating several temporary tables to be used throughout
-temp_tables = toolkit.sql_to_string('collab_temp_tables.sql')
-cursor.executescript(temp_tables)
-
-today = date(2024, 6, 27)
+today = toolkit.last_updated()
 today_format = today.strftime("%B %-d, %Y")
 
 def main():
-    sidebar()
-    content()
+    eras, roles = sidebar()
+    content(toolkit.db_version(db_name), eras, roles)
 
 def sidebar():
     with st.sidebar:
@@ -58,8 +40,38 @@ def sidebar():
         
         """.format(today_format), unsafe_allow_html=True)
 
-@st.cache_data
-def content():
+        era_labels = dict(toolkit.era_options(db_name))
+        eras = st.multiselect('Eras', list(era_labels), default=list(era_labels), format_func=era_labels.get)
+        roles = st.multiselect('Credit types', toolkit.credit_roles, default=toolkit.credit_roles)
+    return tuple(eras), tuple(roles)
+
+# The database version is only an argument so the cached content is
+# rebuilt whenever a new database is published; every era/role filter
+# combination is cached separately
+@st.cache_data(max_entries=64)
+def content(db_version, eras, roles):
+    # Imported here rather than at the top so a cached rerun never loads
+    # pandas, matplotlib, or seaborn
+    from src import chart_data
+    from src import chart_workers
+    from src import top_collaborators
+
+    if not eras or not roles:
+        st.info('Select at least one era and one credit type to see the charts.')
+        return
+
+    rcParams, custom_params = toolkit.chart_params()
+    role_colors = {role: color for role, color in config.palette('credit_roles').items() if role in roles}
+
+    # Only the selected eras and roles are queried, from several temporary
+    # tables; results are shared with every other reader of the same data
+    frames = toolkit.read_queries(db_name, ['unique_credit_per_era.sql', 'avg_credit_per_song.sql'],
+                                  ['collab_temp_tables.sql'], eras, roles)
+
+    # Charts are drawn in worker processes while the page is laid out,
+    # and each one fills its placeholder as soon as it's done
+    placeholders = {}
+
     st.markdown("""
     ## Most Collaborative Eras
     
@@ -69,11 +81,8 @@ def content():
     2. I count the *total* number of writers, producers, and artists per song before summarizing by era. I then calculate the average amount of writers, producers, and artists per song for each era, as well as the overall means for each musician type per song. Finally, I compare the eras' averages to the overall means to determine which eras are the most and least collaborative.
     """)
     
-    unique_credit_per_era = toolkit.sql_to_string('unique_credit_per_era.sql')
-    
-    unique_credit = pd.read_sql(unique_credit_per_era, connection)
-    toolkit.abbreviate_ttpd(unique_credit['era'])
-    toolkit.sort_cat_column(unique_credit, 'era', eras)
+    unique_credit = frames['unique_credit_per_era.sql']
+    toolkit.order_by_query(unique_credit, 'era')
     
     # Pivoting dataframe for chart table
     unique_credit_pivot = unique_credit.pivot(columns='era', index='type', values='unique_count')
@@ -82,11 +91,11 @@ def content():
     # Calculating overall means for type
     avg_per_type_unique = unique_credit.groupby('type')['unique_count'].mean().sort_values(ascending=False)
     
-    credits_total_fig, credits_total_ax = charts.credit_chart(credits, custom_params, 'bar', unique_credit, 'era', 'unique_count', 'type', 
+    credits_total_chart = chart_workers.submit('credit_chart', role_colors, custom_params, 'bar', unique_credit, 'era', 'unique_count', 'type', 
                         avg_per_type_unique, 'Total Unique Musicial Credits per Era',
                         'Album/Song Era', '# per Era (Count)', 'Credit Type', True,
-                        True, 'unique_credits_per_era.png', True, unique_credit_pivot)
-    st.pyplot(credits_total_fig)
+                        table_bool=True, table_df=unique_credit_pivot)
+    placeholders[credits_total_chart] = st.empty()
     
     with st.expander("See discussion"):
         st.write("""
@@ -99,11 +108,8 @@ def content():
             Accounting for these issues lead me to my second approach: calculating the average musician type per indiviudal song and comparing the overall averages by era.
         """)
     
-    avg_credit_per_song = toolkit.sql_to_string('avg_credit_per_song.sql')
-    
-    avg_credit = pd.read_sql(avg_credit_per_song, connection)
-    toolkit.abbreviate_ttpd(avg_credit['era'])
-    toolkit.sort_cat_column(avg_credit, 'era', eras)
+    avg_credit = frames['avg_credit_per_song.sql']
+    toolkit.order_by_query(avg_credit, 'era')
     
     # Pivoting dataframe for chart table
     avg_credit_pivot = avg_credit.pivot(columns='era', index='type', values='avg_per_song')
@@ -112,11 +118,11 @@ def content():
     # Calculating overall means for type-per-song
     avg_per_type = avg_credit.groupby('type')['avg_per_song'].mean().sort_values(ascending=False)
     
-    avg_credits_fig, avg_credits_ax = charts.credit_chart(credits, custom_params, 'line', avg_credit, 'era', 'avg_per_song', 'type', 
+    avg_credits_chart = chart_workers.submit('credit_chart', role_colors, custom_params, 'line', avg_credit, 'era', 'avg_per_song', 'type', 
                         avg_per_type, 'Average Number of Musicial Credits per Song by Era',
                         'Album/Song Era', '# per Song (Average)', 'Credit Type', True,
-                        True, 'avg_credits_per_song.png', True, avg_credit_pivot)
-    st.pyplot(avg_credits_fig)
+                        table_bool=True, table_df=avg_credit_pivot)
+    placeholders[avg_credits_chart] = st.empty()
     
     with st.expander("See discussion"):
         st.write("""
@@ -135,21 +141,22 @@ def content():
     For sake of brevity, I rank each of Taylor's collaborators on the total number of songs they worked on across her discography, with #1 having the most songs worked on, and select the twelve musicians with the highest ranks (I would have selected ten, but there's a four-way tie and I want to include them all).
     """)
     
-    most_frequent_collabs = toolkit.sql_to_string('most_frequent_collaborators.sql')
-    
-    freq_collabs = pd.read_sql(most_frequent_collabs, connection)
-    toolkit.abbreviate_ttpd(freq_collabs['era'])
-    toolkit.sort_cat_column(freq_collabs, 'era', eras)
+    # Ranked from the precomputed per-era collaborator counts, read
+    # through the shared query cache
+    era_counts = toolkit.read_query(db_name, top_collaborators.era_counts_query(), eras=eras, roles=roles)
+    freq_collabs = top_collaborators.rank_per_era(era_counts, 9)
+    toolkit.order_by_query(freq_collabs, 'era')
     
     collab_totals = freq_collabs.loc[:,('collaborator', 'total_songs')]
     collab_totals.drop_duplicates('collaborator', inplace=True)
     collab_totals.sort_values('collaborator', inplace=True)
     collab_totals.set_index('collaborator', inplace=True)
     
-    freq_collabs_fig, freq_collabs_ax = charts.collab_heatmap(custom_params, freq_collabs, 'era', 'collaborator', 'songs', 'sum', 
+    freq_collabs_pivot = chart_data.pivot(freq_collabs, 'collaborator', 'era', 'songs')
+    freq_collabs_chart = chart_workers.submit('collab_heatmap', custom_params, freq_collabs_pivot, 
                    'Most Frequent Collaborators per Era', 'Album/Song Era', 'Collaborator Name', 
-                   True, True, 'most_frequent_collabs_per_era.png', table_bool=True, table_df=collab_totals)
-    st.pyplot(freq_collabs_fig)
+                   True, table_bool=True, table_df=collab_totals)
+    placeholders[freq_collabs_chart] = st.empty()
     
     with st.expander("See discussion"):
         st.write("""
@@ -158,7 +165,7 @@ def content():
             Meanwhile, the #2 collaborator, Nathan Chapman, stops working with Taylor shortly after she transitions from country to pop music, only working on 1 song during "1989" despite being credited several times on her previous albums. Interestingly, he does not return to produce the songs on the rerecorded versions of "Fearless," "Speak Now" and "Red." This is despite several collaborators from the original albums coming back for the rerecorded versions, like Liz Rose for "Fearless (Taylor's Version)" and Max Martin and Shellback for "1989 (Taylor's Version)." Instead, Christopher Rowe, Taylor's #3 collaborator, seems to step in to do the bulk of the rerecording collaborations, despite not having worked with Taylor prior to "Fearless (Taylor's Version)."
             """)
 
+    chart_workers.stream(placeholders)
+
 if __name__ == '__main__':
     main()
-
-connection.close()
\ No newline at end of file
@@ -1,15 +1,11 @@
 import os
 import sys
-from datetime import date
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-import pandas as pd
 import streamlit as st
-import sqlite3 as sql
-from matplotlib import rcParams
 
-from src import charts
+from src import config
 from src import toolkit
 
 st.set_page_config(page_title="Genius Page Views")
@@ -23,23 +19,18 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-connection = sql.connect('data/taylor_swift.db')
-cursor = connection.cursor()
+snapshot_db = 'data/page_view_snapshots.db'
 
-eras = toolkit.eras_order()
+db_name = 'data/taylor_swift.db'
 
-rcParams, custom_params = toolkit.chart_params(rcParams)
-
-# Creating temporary table to be used throughout
-temp_table = toolkit.sql_to_string('views_temp_table.sql')
-cursor.executescript(temp_table)
-
-today = date(2024, 6, 27)
+today = toolkit.last_updated()
 today_format = today.strftime("%B %-d, %Y")
 
 def main():
-    sidebar()
-    content()
+    eras = sidebar()
+    content(toolkit.db_version(db_name), eras)
+    if os.path.exists(snapshot_db):
+        growth(toolkit.db_version(snapshot_db))
 
 def sidebar():
     with st.sidebar:
@@ -53,8 +44,35 @@ def sidebar():
         
         """.format(today_format), unsafe_allow_html=True)
 
-@st.cache_data
-def content():
+        era_labels = dict(toolkit.era_options(db_name))
+        eras = st.multiselect('Eras', list(era_labels), default=list(era_labels), format_func=era_labels.get)
+    return tuple(eras)
+
+# The database version is only an argument so the cached content is
+# rebuilt whenever a new database is published; every era filter
+# combination is cached separately
+@st.cache_data(max_entries=64)
+def content(db_version, eras):
+    # Imported here rather than at the top so a cached rerun never loads
+    # pandas, matplotlib, or seaborn
+    from src import chart_data
+    from src import chart_workers
+
+    if not eras:
+        st.info('Select at least one era to see the charts.')
+        return
+
+    rcParams, custom_params = toolkit.chart_params()
+
+    # Only the selected eras are queried, from a temporary table; results
+    # are shared with every other reader of the same data
+    song_views = 'SELECT era, song_title, views FROM song_views ORDER BY era_order'
+    frames = toolkit.read_queries(db_name, [song_views, 'views_totals.sql'], ['views_temp_table.sql'], eras)
+
+    # Charts are drawn in worker processes while the page is laid out,
+    # and each one fills its placeholder as soon as it's done
+    placeholders = {}
+
     st.markdown("""
     ## Genius Page Views
 
@@ -63,20 +81,20 @@ def content():
     1. I total the number of page views for each song and compare them to one another to see which is the most popular, as well as plot the frequency distribution of page views across Taylor's discography.
     2. I plot the distribution of page views via a boxplot to compare the medians, means, and any outliers that potentially influence the previous approach's conclusions.
     """)
-    df_views = pd.read_sql('SELECT * FROM song_views', connection)
-    
-    views_totals = toolkit.sql_to_string('views_totals.sql')
-    era_views = pd.read_sql(views_totals, connection)
-    toolkit.abbreviate_ttpd(era_views['era'])
-    toolkit.abbreviate_ttpd(df_views['era'])
-    toolkit.sort_cat_column(era_views, 'era', eras)
-    toolkit.sort_cat_column(df_views, 'era', eras)
-
-    views_fig, views_ax = charts.views_plots(custom_params, era_views, 'total_views', 'era', df_views, 'views', 
-                                             'Song Page Views on Genius', 'Total Page Views per Era', 'Frequency Distribution of Page Views',
-                                             'Total Page Views', 'Page Views', 'Album/Song Era', 'Song Count', ['#858ae3', '#613dc1'], 
-                                             ['#4e148c', '#2c0735'], True, 'total_page_views_distribution.png')
-    st.pyplot(views_fig)
+    df_views = frames[song_views]
+    era_views = frames['views_totals.sql']
+    toolkit.order_by_query(era_views, 'era')
+    toolkit.order_by_query(df_views, 'era')
+
+    # Charts only get the per-era totals, histogram bins, and box statistics
+    views_bins = chart_data.bin_counts(df_views['views'])
+    views_stats = chart_data.box_stats(df_views, 'views', 'era')
+
+    views_chart = chart_workers.submit('views_plots', custom_params, era_views, 'total_views', 'era', views_bins, 
+                                       'Song Page Views on Genius', 'Total Page Views per Era', 'Frequency Distribution of Page Views',
+                                       'Total Page Views', 'Page Views', 'Album/Song Era', 'Song Count', config.palette('views_totals'), 
+                                       config.palette('views_totals_edges'))
+    placeholders[views_chart] = st.empty()
 
     with st.expander("See discussion"):
         st.write("""
@@ -85,9 +103,9 @@ def content():
             There are a few problems with this approach, as illustrated by the accompanying histogram: the data is skewed to the right, with most song pages having under 1 million views. Because of this, these totals are most likely influenced by outliers, or individual songs with high amounts of views. To counteract that, we plot the distributions and see how the medians compare to one another.
             """)
 
-    view_box_fig, view_box_ax = charts.views_box(custom_params, df_views,'views', 'era', 'Genius Song Page View Distribution per Album/Song Category', 
-                                                 'Page Views', 'Album/Song Era', '#7D7C78', '#3A3633', True, 'page_view_box_distribution.png')
-    st.pyplot(view_box_fig)
+    view_box_chart = chart_workers.submit('views_box', custom_params, views_stats, 'Genius Song Page View Distribution per Album/Song Category', 
+                                          'Page Views', 'Album/Song Era', config.palette('views_box'), config.palette('views_box_edges'))
+    placeholders[view_box_chart] = st.empty()
 
     with st.expander("See discussion"):
         st.write("""
@@ -98,7 +116,26 @@ def content():
             In terms of lowest medians, all four of Taylor's rercorded albums have very low median views-per-page, each having around 0.1 million (100,000) per song, and all rerecorded albums have lower medians than their original counterparts. This could be due to how recently the albums were released, as the original albums have existed on Genius for much longer, but in my opinion it's more likely that Genius suggests the song pages from the original albums more often than it does for their rerecorded counterparts when the user searches for the song title. The only era that is lower than the rerecorded albums is Taylor's non-album songs, such as movie soundtrack releases or promotional singles, which have the lowest median views-per-page.
             """)
 
+    chart_workers.stream(placeholders)
+
+# Snapshots are written separately from the database, so this section is
+# cached on the snapshot database's version instead
+@st.cache_data
+def growth(snapshot_version):
+    # Imported here so a cached rerun never loads pandas
+    from src import view_snapshots
+
+    # Growth section only appears once at least two scrape runs have been snapshotted
+    if len(view_snapshots.list_runs(snapshot_db)) < 2:
+        return
+    st.markdown("""
+    ## Page View Growth
+
+    Page views are recorded every time the data is refreshed, so we can also see which songs are currently gaining the most traffic on Genius between the two most recent snapshots.
+    """)
+    movers = view_snapshots.top_movers(snapshot_db, 10)
+    st.dataframe(movers[['song_title', 'start_views', 'end_views', 'gained', 'growth_rate', 'views_per_day']],
+                 hide_index=True, use_container_width=True)
+
 if __name__ == '__main__':
     main()
-
-connection.close()
\ No newline at end of file
@@ -1,12 +1,12 @@
 import os
 import sys
-from datetime import date
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-import pandas as pd
 import streamlit as st
 
+from src import toolkit
+
 st.set_page_config(page_title="About the Data")
 
 st.markdown(
@@ -18,12 +18,14 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-today = date(2024, 6, 27)
+db_name = 'data/taylor_swift.db'
+
+today = toolkit.last_updated()
 today_format = today.strftime("%B %-d, %Y")
 
 def main():
     sidebar()
-    content()
+    content(toolkit.db_version(db_name))
 
 def sidebar():
     with st.sidebar:
@@ -38,7 +40,7 @@ def sidebar():
         """.format(today_format), unsafe_allow_html=True)
 
 @st.cache_data
-def content():
+def content(db_version):
     st.markdown("""
     ## About the Data
 
@@ -57,9 +59,8 @@ def content():
     The database used in this application as well as the pickle versions of the data can be found on the [project's Github](https://github.com/madroscla/taylor-swift-discography/tree/main/data). The data is also available in CSV format on [Kaggle](https://www.kaggle.com/datasets/madroscla/taylor-swift-released-song-discography-genius) for public use under the CC BY-SA 4.0 license.
     """)
 
-    df = pd.read_pickle('data/taylor_swift_clean.pkl')
-
-    st.dataframe(df.sample(100))
+    # Only the sampled songs' lyrics are read, from the memory-mapped lyric corpus
+    st.dataframe(toolkit.discography_sample(db_name, 100))
     st.markdown("""
     ## Constraints and Limitations of Discography
     
@@ -0,0 +1,93 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import streamlit as st
+
+from src import config
+from src import toolkit
+
+st.set_page_config(page_title="Collaboration Network")
+
+st.markdown(
+    """
+    <style>
+        section.main > div {max-width:65rem}
+    </style>
+    """,
+    unsafe_allow_html=True
+)
+
+db_name = 'data/taylor_swift.db'
+
+today = toolkit.last_updated()
+today_format = today.strftime("%B %-d, %Y")
+
+def main():
+    sidebar()
+    content()
+
+def sidebar():
+    with st.sidebar:
+        st.image('assets/img/TheTorturedPoetsDepartment.jpg')
+        st.markdown("""
+        <h3 style="text-align: center;">Taylor Swift - Song Discography</h3>
+
+        <p style="text-align: center;">This is an ongoing, open-source project. Follow along on <a href='https://github.com/madroscla/taylor-swift-discography'>Github</a>!</p>
+
+        <p style="text-align: center;">Data was last updated on <b>{}</b>.</p>
+
+        """.format(today_format), unsafe_allow_html=True)
+
+# The graph and its metrics are cached per database version inside
+# collab_graph, so widget changes below never rebuild the sparse matrices
+def content():
+    st.markdown("""
+    ## Collaboration Network
+
+    Every writer, producer, and artist credited on a Taylor Swift song is a point in her collaboration network, and two musicians are connected when they worked on the same song. The more songs they share, the stronger the connection. Since Taylor is credited on nearly every song, she is left out by default so the rest of the network's structure can be seen.
+
+    * **Degree** is the number of different musicians someone has shared a song with.
+    * **Weighted degree** is the total number of shared songs across all of those connections.
+    * **Centrality** measures how connected someone is to other well-connected musicians (1 is the most central).
+    * **Community** groups musicians who mostly work with each other.
+    """)
+
+    # Imported here rather than at the top so scipy, matplotlib, and
+    # seaborn only load once the page is actually drawn
+    from src import chart_data
+    from src import charts
+    from src import collab_graph
+
+    rcParams, custom_params = toolkit.chart_params()
+
+    graph = collab_graph.load_graph(db_name)
+    era_options = sorted(set(graph['song_eras']), key=config.era_position)
+
+    selected_eras = st.multiselect('Album/Song Eras', era_options, placeholder='All eras')
+    include_taylor = st.toggle('Include Taylor Swift', value=False)
+    top_n = st.slider('Collaborators shown', min_value=5, max_value=30, value=15)
+
+    exclude = () if include_taylor else ('Taylor Swift',)
+    metrics = collab_graph.collaborator_metrics(db_name, eras=selected_eras, exclude=exclude)
+    top_metrics = metrics.head(top_n)
+
+    st.dataframe(top_metrics, hide_index=True, use_container_width=True)
+
+    if selected_eras:
+        graph = collab_graph.era_subgraph(graph, selected_eras)
+    shared = collab_graph.shared_songs(graph, top_metrics['collaborator'].tolist())
+
+    shared_pivot = chart_data.pivot(shared, 'collaborator', 'partner', 'songs')
+    shared_fig, shared_ax = charts.collab_heatmap(custom_params, shared_pivot,
+                                                  'Songs Shared Between Most Central Collaborators', 'Collaborator Name',
+                                                  'Collaborator Name', True)
+    st.pyplot(shared_fig, dpi=charts.save_presets['screen']['dpi'])
+
+    communities = metrics.groupby('community')['collaborator'].apply(lambda names: ', '.join(names.head(8)))
+    with st.expander("See communities"):
+        st.dataframe(communities.head(10), use_container_width=True)
+
+if __name__ == '__main__':
+    main()
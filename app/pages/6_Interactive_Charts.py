@@ -0,0 +1,94 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import streamlit as st
+
+from src import config
+from src import toolkit
+
+st.set_page_config(page_title="Interactive Charts")
+
+st.markdown(
+    """
+    <style>
+        section.main > div {max-width:65rem}
+    </style>
+    """,
+    unsafe_allow_html=True
+)
+
+db_name = 'data/taylor_swift.db'
+
+today = toolkit.last_updated()
+today_format = today.strftime("%B %-d, %Y")
+
+def main():
+    sidebar()
+    content(payloads(toolkit.db_version(db_name)))
+
+def sidebar():
+    with st.sidebar:
+        st.image('assets/img/TheTorturedPoetsDepartment.jpg')
+        st.markdown("""
+        <h3 style="text-align: center;">Taylor Swift - Song Discography</h3>
+
+        <p style="text-align: center;">This is an ongoing, open-source project. Follow along on <a href='https://github.com/madroscla/taylor-swift-discography'>Github</a>!</p>
+
+        <p style="text-align: center;">Data was last updated on <b>{}</b>.</p>
+
+        """.format(today_format), unsafe_allow_html=True)
+
+# Payloads are read once per database version; they're only rebuilt from
+# the database if the build didn't write them
+@st.cache_data
+def payloads(db_version):
+    from src import chart_payloads
+
+    if chart_payloads.payloads_current(db_name):
+        return chart_payloads.load_payloads()
+    return chart_payloads.payload_frames(chart_payloads.query_frames(db_name))
+
+def content(frames):
+    from src import vega_charts
+
+    st.markdown("""
+    ## Interactive Charts
+
+    The charts from the other pages, drawn in your browser instead: hover over any bar, cell, or point to see its exact values, and click a legend entry to highlight it. The data behind them is computed once whenever the data is updated, so nothing is recalculated while you explore.
+    """)
+
+    st.markdown("### Release Overview")
+    st.altair_chart(vega_charts.formats_pie(frames['release_formats'], 'total_songs', 'classification',
+                                            'Song Release Formats', config.palette('release_formats')))
+    st.altair_chart(vega_charts.release_hist([frames['release_years'], frames['release_months'], frames['release_days']],
+                                             ['Release Years', 'Release Months', 'Release Days'],
+                                             ['Year', 'Month', 'Day of Month'], config.palette('release_dates'),
+                                             config.palette('release_dates_edges'), 'Frequency Distributions of Song Release Dates'))
+    st.altair_chart(vega_charts.date_scatter(frames['month_day'], 'Most Frequent Release Dates'))
+
+    st.markdown("### Collaborators")
+    st.altair_chart(vega_charts.credit_chart(frames['unique_credit'], 'unique_count', 'bar',
+                                             'Total Unique Musicial Credits per Era', '# per Era (Count)'),
+                    use_container_width=True)
+    st.altair_chart(vega_charts.credit_chart(frames['avg_credit'], 'avg_per_song', 'line',
+                                             'Average Number of Musicial Credits per Song by Era', '# per Song (Average)'),
+                    use_container_width=True)
+    st.altair_chart(vega_charts.collab_heatmap(frames['freq_collabs'], 'era', 'collaborator', 'songs',
+                                               'Most Frequent Collaborators per Era', 'Album/Song Era', 'Collaborator Name'),
+                    use_container_width=True)
+
+    st.markdown("### Genius Page Views")
+    totals_colors, totals_edges = config.palette('views_totals'), config.palette('views_totals_edges')
+    st.altair_chart(vega_charts.views_totals(frames['era_views'], 'Total Page Views per Era', totals_colors[0],
+                                             totals_edges[0]), use_container_width=True)
+    st.altair_chart(vega_charts.views_hist(frames['views_bins'], 'Frequency Distribution of Page Views', totals_colors[1],
+                                           totals_edges[1]), use_container_width=True)
+    st.altair_chart(vega_charts.views_box(frames['views_box'], frames['views_fliers'],
+                                          'Genius Song Page View Distribution per Album/Song Category',
+                                          config.palette('views_box'), config.palette('views_box_edges')),
+                    use_container_width=True)
+
+if __name__ == '__main__':
+    main()
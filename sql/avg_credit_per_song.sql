@@ -6,6 +6,7 @@ Depending on SQL dialect and database engine, this query may need to be modified
 -- Calculate average number of writers/prodcuers/artists per song per era
 SELECT
     era,
+    era_order,
     "writer" AS type,
     ROUND(
         CAST(total_writers AS REAL) / total_songs,
@@ -13,9 +14,12 @@ SELECT
     ) AS avg_per_song
 FROM
     credit_counts_per_era
+WHERE
+    'writer' IN (SELECT role FROM temp.selected_roles)
 UNION
 SELECT
     era,
+    era_order,
     "producer" AS type,
     ROUND(
         CAST(total_producers AS REAL) / total_songs,
@@ -23,13 +27,20 @@ SELECT
     ) AS avg_per_song
 FROM
     credit_counts_per_era
+WHERE
+    'producer' IN (SELECT role FROM temp.selected_roles)
 UNION
 SELECT
     era,
+    era_order,
     "artist" AS type,
     ROUND(
         CAST(total_artists AS REAL) / total_songs,
         2
     ) AS avg_per_song
 FROM
-    credit_counts_per_era;
\ No newline at end of file
+    credit_counts_per_era
+WHERE
+    'artist' IN (SELECT role FROM temp.selected_roles)
+ORDER BY
+    era_order, type;
\ No newline at end of file
@@ -5,28 +5,34 @@ Depending on SQL dialect and database engine, this query may need to be modified
 
 -- Temp table of total amounts of unique writers/producers/artists per era
 -- Used in section "Most Collaborative Eras - Unique collaborators Per Era"
+-- All temp tables below only cover the eras in temp.selected_eras and the roles in temp.selected_roles
+-- (see toolkit.select_eras and toolkit.select_roles), labeled and ordered by the eras table
 DROP 
     TABLE IF EXISTS temp.unique_credits_per_era;
 CREATE TABLE temp.unique_credits_per_era (
     era TEXT,
+    era_order INTEGER,
     unique_writers INTEGER,
     unique_producers INTEGER,
     unique_artists INTEGER
 );
 INSERT INTO temp.unique_credits_per_era 
 SELECT 
-    a.category AS era,
+    e.era AS era,
+    e.era_order AS era_order,
     COUNT(DISTINCT w.song_writer) as unique_writers,
     COUNT(DISTINCT p.song_producer) as unique_producers,
     COUNT(DISTINCT sa.song_artist) as unique_artists
 FROM 
-    albums a
+    temp.selected_eras se
+    JOIN eras e ON se.category = e.category
+    JOIN albums a ON e.category = a.category
     LEFT JOIN songs s ON a.album_title = s.album_title
     LEFT JOIN writers w ON s.song_title = w.song_title
     LEFT JOIN producers p ON s.song_title = p.song_title
     LEFT JOIN artists sa ON s.song_title = sa.song_title
 GROUP BY
-    a.category;
+    e.era, e.era_order;
 
 -- Temp table of total number of credits (writers, producers, artists) per song
 -- Used in section "Most Collaborative Eras - Average collaborators Per Song By Era"
@@ -47,7 +53,9 @@ SELECT
     COUNT(DISTINCT p.song_producer) AS producers,
     COUNT(DISTINCT sa.song_artist) AS artists
 FROM
-    songs s
+    temp.selected_eras se
+    JOIN albums a ON se.category = a.category
+    JOIN songs s ON a.album_title = s.album_title
     JOIN writers w ON s.song_title = w.song_title
     JOIN producers p ON s.song_title = p.song_title
     JOIN artists sa ON s.song_title = sa.song_title
@@ -60,6 +68,7 @@ DROP
     TABLE IF EXISTS temp.credit_counts_per_era;
 CREATE TABLE temp.credit_counts_per_era (
     era TEXT,
+    era_order INTEGER,
     total_songs INTEGER,
     total_writers INTEGER,
     total_producers INTEGER,
@@ -67,7 +76,8 @@ CREATE TABLE temp.credit_counts_per_era (
 );
 INSERT INTO temp.credit_counts_per_era
 SELECT
-    a.category AS era,
+    e.era AS era,
+    e.era_order AS era_order,
     COUNT(DISTINCT song_title) AS total_songs,
     SUM(cc.writers) AS total_writers,
     SUM(cc.producers) AS total_producers,
@@ -75,8 +85,9 @@ SELECT
 FROM
     credit_counts_per_song cc
     JOIN albums a ON cc.album_title = a.album_title
+    JOIN eras e ON a.category = e.category
 GROUP BY
-    a.category;
+    e.era, e.era_order;
 
 -- Temp table of collaborators and the songs they worked on, regardless of contribution
 -- Used in section "Frequent Collaborators"
@@ -84,6 +95,7 @@ DROP
     TABLE IF EXISTS temp.collaborators_per_song;
 CREATE TABLE temp.collaborators_per_song (
     era TEXT,
+    era_order INTEGER,
     song_title TEXT,
     collaborator TEXT,
     songs_worked_on INTEGER
@@ -91,43 +103,59 @@ CREATE TABLE temp.collaborators_per_song (
 INSERT INTO temp.collaborators_per_song
 WITH collaborators as (
     SELECT 
-        a.category AS era,
+        e.era AS era,
+        e.era_order AS era_order,
         s.song_title as song_title,
         w.song_writer AS collaborator
     FROM 
-        albums a
+        temp.selected_eras se
+        JOIN eras e ON se.category = e.category
+        JOIN albums a ON e.category = a.category
         JOIN songs s ON a.album_title = s.album_title
         JOIN writers w ON s.song_title = w.song_title
+    WHERE
+        'writer' IN (SELECT role FROM temp.selected_roles)
     UNION ALL
     SELECT 
-        a.category AS era,
+        e.era AS era,
+        e.era_order AS era_order,
         s.song_title as song_title,
         p.song_producer AS collaborator
     FROM 
-        albums a
+        temp.selected_eras se
+        JOIN eras e ON se.category = e.category
+        JOIN albums a ON e.category = a.category
         JOIN songs s ON a.album_title = s.album_title
         JOIN producers p ON s.song_title = p.song_title
+    WHERE
+        'producer' IN (SELECT role FROM temp.selected_roles)
     UNION ALL
     SELECT 
-        a.category AS era,
+        e.era AS era,
+        e.era_order AS era_order,
         s.song_title as song_title,
         sa.song_artist AS collaborator
     FROM 
-        albums a
+        temp.selected_eras se
+        JOIN eras e ON se.category = e.category
+        JOIN albums a ON e.category = a.category
         JOIN songs s ON a.album_title = s.album_title
         JOIN artists sa ON s.song_title = sa.song_title
+    WHERE
+        'artist' IN (SELECT role FROM temp.selected_roles)
     ORDER BY
-        a.category, s.song_title
+        era_order, song_title
 )
 SELECT
     era,
+    era_order,
     song_title,
     collaborator,
     1 AS songs_worked_on
 FROM
     collaborators
 GROUP BY
-    era, song_title, collaborator;
+    era, era_order, song_title, collaborator;
 
 -- Temp table of collaborators and their totals songs worked on per era, removing Taylor Swift
 -- Used in section "Frequent Collaborators"
@@ -135,6 +163,7 @@ DROP
     TABLE IF EXISTS temp.collaborators_per_era;
 CREATE TABLE temp.collaborators_per_era (
     era TEXT,
+    era_order INTEGER,
     collaborator TEXT,
     songs INTEGER,
     total_songs INTEGER
@@ -142,6 +171,7 @@ CREATE TABLE temp.collaborators_per_era (
 INSERT INTO temp.collaborators_per_era
 SELECT
     era,
+    era_order,
     collaborator,
     SUM(songs_worked_on) AS songs,
     SUM(COUNT(*)) OVER (PARTITION BY collaborator) AS total_songs
@@ -150,4 +180,4 @@ FROM
 WHERE
     collaborator != 'Taylor Swift'
 GROUP BY
-    era, collaborator
\ No newline at end of file
+    era, era_order, collaborator
\ No newline at end of file
@@ -7,7 +7,6 @@ Depending on SQL dialect and database engine, this query may need to be modified
 SELECT
     release_month AS month,
     release_day AS day,
-    CAST(release_month AS TEXT) || "/" || CAST(release_day AS TEXT) AS date,
     COUNT(*) AS count
 FROM
     release_info
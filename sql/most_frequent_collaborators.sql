@@ -7,6 +7,7 @@ Depending on SQL dialect and database engine, this query may need to be modified
 WITH collaborators_ranked AS (
     SELECT
         era,
+        era_order,
         collaborator,
         songs,
         total_songs,
@@ -19,4 +20,6 @@ SELECT
 FROM
     collaborators_ranked
 WHERE
-    rank <= 9
\ No newline at end of file
+    rank <= 9
+ORDER BY
+    era_order
\ No newline at end of file
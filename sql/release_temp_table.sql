@@ -5,6 +5,8 @@ Depending on SQL dialect and database engine, this query may need to be modified
 
 -- Temp table of release classifications and broken down release dates
 -- Used throughout "Release Overview" app page
+-- Only covers the eras in temp.selected_eras (see toolkit.select_eras)
+-- Classifications come from the eras table (see data/discography.toml)
 DROP 
     TABLE IF EXISTS temp.release_info;
 CREATE TABLE temp.release_info (
@@ -19,15 +21,12 @@ INSERT INTO temp.release_info
 SELECT
     a.category AS era,
     s.song_title AS song_title,
-    CASE
-        WHEN a.category IN ("Fearless (TV)", "Red (TV)", "Speak Now (TV)", "1989 (TV)") THEN "Rerecorded Albums"
-        WHEN a.category = "Other Artist Songs" THEN "Other Artists' Albums"
-        WHEN a.category = "Non-Album Songs" THEN "Other Release Formats"
-        ELSE "Studio Albums"
-    END AS classification,
-    strftime('%m', s.song_release_date) AS release_month,
-    strftime('%d', s.song_release_date) AS release_day,
-    strftime('%Y', s.song_release_date) AS release_year
+    e.classification AS classification,
+    s.release_month AS release_month,
+    s.release_day AS release_day,
+    s.release_year AS release_year
 FROM
     songs s
-    LEFT JOIN albums a ON s.album_title = a.album_title;
\ No newline at end of file
+    JOIN albums a ON s.album_title = a.album_title
+    JOIN temp.selected_eras se ON a.category = se.category
+    JOIN eras e ON a.category = e.category;
\ No newline at end of file
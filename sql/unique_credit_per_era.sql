@@ -6,22 +6,32 @@ Depending on SQL dialect and database engine, this query may need to be modified
 -- Restructures unique_credits_per_era for visualization
 SELECT
     era,
+    era_order,
     "writer" AS type,
     unique_writers AS unique_count
 FROM
     unique_credits_per_era
+WHERE
+    'writer' IN (SELECT role FROM temp.selected_roles)
 UNION
 SELECT
     era,
+    era_order,
     "producer" AS type,
     unique_producers AS unique_count
 FROM
     unique_credits_per_era
+WHERE
+    'producer' IN (SELECT role FROM temp.selected_roles)
 UNION
 SELECT
     era,
+    era_order,
     "artist" AS type,
     unique_artists AS unique_count
-
 FROM
-    unique_credits_per_era;
\ No newline at end of file
+    unique_credits_per_era
+WHERE
+    'artist' IN (SELECT role FROM temp.selected_roles)
+ORDER BY
+    era_order, type;
\ No newline at end of file
@@ -5,18 +5,25 @@ Depending on SQL dialect and database engine, this query may need to be modified
 
 -- Temp table of songs, their categories, and their page views
 -- Used throughout "Genius Page Views" app page
+-- Only covers the eras in temp.selected_eras (see toolkit.select_eras), labeled and ordered by the eras table
 DROP 
     TABLE IF EXISTS temp.song_views;
 CREATE TABLE temp.song_views (
     era TEXT,
+    era_order INTEGER,
     song_title TEXT,
     views INTEGER
 );
 INSERT INTO temp.song_views
 SELECT
-    a.category AS era,
+    e.era AS era,
+    e.era_order AS era_order,
     s.song_title AS song_title,
     s.song_page_views AS views
 FROM
-    albums a
-    LEFT JOIN songs s ON a.album_title = s.album_title;
\ No newline at end of file
+    temp.selected_eras se
+    JOIN eras e ON se.category = e.category
+    JOIN albums a ON e.category = a.category
+    LEFT JOIN songs s ON a.album_title = s.album_title
+ORDER BY
+    e.era_order;
\ No newline at end of file
@@ -10,4 +10,6 @@ SELECT
 FROM
     song_views
 GROUP BY
-    era;
\ No newline at end of file
+    era, era_order
+ORDER BY
+    era_order;
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""Benchmarks chart output formats and size/quality presets.
+
+   Builds a few representative charts from the database, then reports the
+   encode time and byte size of every format/preset combination.
+
+   Usage (from the project root):
+       python -m src.chart_benchmark
+       python -m src.chart_benchmark --formats png webp --repeat 3
+       python -m src.chart_benchmark --scaling 1 10 100
+"""
+
+import argparse
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from . import chart_data
+from . import charts
+from . import config
+from . import toolkit
+
+song_views_query = 'SELECT era, song_title, views FROM song_views ORDER BY era_order'
+
+def sample_figures(db_name):
+    """Returns {name: figure} for a pie, a heatmap, and a box plot chart."""
+    rcParams, custom_params = toolkit.chart_params()
+
+    formats = toolkit.read_query(db_name, 'release_formats.sql', ['release_temp_table.sql'])
+    formats_fig, _ = charts.formats_pie(custom_params, formats, 'total_songs', 'classification', 'Song Release Formats',
+                                        config.palette('release_formats'))
+
+    freq_collabs = toolkit.read_query(db_name, 'most_frequent_collaborators.sql', ['collab_temp_tables.sql'])
+    toolkit.order_by_query(freq_collabs, 'era')
+    heatmap_fig, _ = charts.collab_heatmap(custom_params, chart_data.pivot(freq_collabs, 'collaborator', 'era', 'songs'),
+                                           'Most Frequent Collaborators per Era', 'Album/Song Era', 'Collaborator Name', True)
+
+    df_views = toolkit.read_query(db_name, song_views_query, ['views_temp_table.sql'])
+    toolkit.order_by_query(df_views, 'era')
+    box_fig, _ = charts.views_box(custom_params, chart_data.box_stats(df_views, 'views', 'era'), 'Genius Song Page View Distribution',
+                                  'Page Views', 'Album/Song Era', config.palette('views_box'),
+                                  config.palette('views_box_edges'))
+    return {'formats_pie': formats_fig, 'collab_heatmap': heatmap_fig, 'views_box': box_fig}
+
+def benchmark(figures, formats, presets, repeat=1):
+    """Returns dataframe of best encode time and byte size per chart, format, and preset."""
+    rows = []
+    for name, fig in figures.items():
+        for image_format in formats:
+            for preset in presets:
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    data = charts.figure_bytes(fig, image_format, preset)
+                    timings.append(time.perf_counter() - start)
+                rows.append({'chart': name, 'format': image_format, 'preset': preset,
+                             'seconds': round(min(timings), 3), 'kilobytes': round(len(data) / 1024, 1)})
+    return pd.DataFrame(rows)
+
+def scaling(db_name, factors):
+    """Returns dataframe of page view chart aggregate and draw times as song rows grow.
+
+       The song views table is repeated 'factor' times (with jittered views)
+       to stand in for a larger catalogue; only the aggregate step should
+       grow with it.
+    """
+    import numpy as np
+
+    rcParams, custom_params = toolkit.chart_params()
+    df_views = toolkit.read_query(db_name, song_views_query, ['views_temp_table.sql'])
+    toolkit.order_by_query(df_views, 'era')
+
+    rng = np.random.default_rng(0)
+    rows = []
+    for factor in factors:
+        scaled = pd.concat([df_views] * factor, ignore_index=True)
+        scaled['views'] = scaled['views'] * rng.uniform(0.5, 1.5, len(scaled))
+
+        start = time.perf_counter()
+        bins = chart_data.bin_counts(scaled['views'])
+        stats = chart_data.box_stats(scaled, 'views', 'era')
+        aggregated = time.perf_counter()
+        for fig, _ in [charts.views_box(custom_params, stats, 'Views', 'Page Views', 'Era', config.palette('views_box'),
+                                        config.palette('views_box_edges')),
+                       charts.views_plots(custom_params, df_views.groupby('era', observed=True, as_index=False)['views'].sum(),
+                                          'views', 'era', bins, 'Views', 'Totals', 'Distribution', 'Views', 'Views',
+                                          'Era', 'Songs', config.palette('views_totals'),
+                                          config.palette('views_totals_edges'))]:
+            charts.figure_bytes(fig, 'png', 'thumbnail')
+        drawn = time.perf_counter()
+        plt.close('all')
+        rows.append({'rows': len(scaled), 'aggregate_seconds': round(aggregated - start, 3),
+                     'draw_seconds': round(drawn - aggregated, 3)})
+    return pd.DataFrame(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='data/taylor_swift.db')
+    parser.add_argument('--formats', nargs='+', default=['png', 'webp', 'svg'])
+    parser.add_argument('--presets', nargs='+', default=list(charts.save_presets))
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--scaling', type=int, nargs='+', default=None,
+                        help='time page view charts with the song rows repeated by these factors instead')
+    args = parser.parse_args()
+
+    if args.scaling:
+        print(scaling(args.db, args.scaling).to_string(index=False))
+        return
+
+    figures = sample_figures(args.db)
+    results = benchmark(figures, args.formats, args.presets, args.repeat)
+    plt.close('all')
+
+    # SVG output doesn't depend on the preset, so only one row is kept for it
+    results = results[(results['format'] != 'svg') | (results['preset'] == args.presets[0])].copy()
+    results.loc[results['format'] == 'svg', 'preset'] = '-'
+    print(results.to_string(index=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Shapes query results into small, fixed-size inputs for the chart functions.
+
+   Charts in charts.py only draw what they're given; everything that grows
+   with the number of songs (pivoting, binning, top-N, box plot quantiles)
+   happens here, so drawing time doesn't depend on catalogue size.
+"""
+
+import numpy as np
+import pandas as pd
+
+def pivot(df, index, columns, values, aggfunc='sum'):
+    """Returns pivoted dataframe (index x columns) for heatmaps, sorted by index.
+
+       Missing cells are 0; categorical columns keep all their categories.
+    """
+    df_pivot = df.pivot_table(index=index, columns=columns, values=values, fill_value=0,
+                              aggfunc=aggfunc, observed=False)
+    df_pivot.sort_values(index, inplace=True)
+    return df_pivot
+
+def top_n(df, label_column, value_column, n, other_label='Other'):
+    """Returns the n rows with the largest values, plus one row summing the rest.
+
+       If other_label is None, or nothing is left over, no extra row is added.
+    """
+    ranked = df[[label_column, value_column]].sort_values(by=[value_column], ascending=False)
+    top = ranked.head(n)
+    rest = ranked.iloc[n:]
+    if other_label is None or len(rest) == 0:
+        return top
+    other = pd.DataFrame({label_column: [other_label], value_column: [rest[value_column].sum()]})
+    return pd.concat([top, other], ignore_index=True)
+
+def bin_counts(values, bins='auto', max_bins=50):
+    """Returns dataframe of histogram bins (left, right, count) of given values.
+
+       Bin edges follow numpy's rule for 'bins' (seaborn's default is
+       'auto'), capped at max_bins so large inputs don't multiply the bars.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    edges = np.histogram_bin_edges(values, bins)
+    if len(edges) - 1 > max_bins:
+        edges = np.histogram_bin_edges(values, max_bins)
+    counts, edges = np.histogram(values, edges)
+    return pd.DataFrame({'left': edges[:-1], 'right': edges[1:], 'count': counts})
+
+def box_stats(df, value_column, group_column, whis=1.5, max_fliers=100):
+    """Returns list of box plot statistics per group, ready for Axes.bxp.
+
+       Each entry holds quartiles, whiskers (furthest values within whis *
+       IQR of the box), mean, and outliers. Only the max_fliers outliers
+       furthest from the median are kept per group. Groups keep their
+       categorical order (or order of appearance).
+    """
+    ordered = isinstance(df[group_column].dtype, pd.CategoricalDtype)
+    stats = []
+    for group, values in df.groupby(group_column, observed=True, sort=ordered)[value_column]:
+        values = values.dropna().to_numpy()
+        if len(values) == 0:
+            continue
+        q1, median, q3 = np.percentile(values, [25, 50, 75])
+        low, high = q1 - whis * (q3 - q1), q3 + whis * (q3 - q1)
+        inside = values[(values >= low) & (values <= high)]
+        fliers = values[(values < low) | (values > high)]
+        if len(fliers) > max_fliers:
+            fliers = fliers[np.argsort(np.abs(fliers - median))[-max_fliers:]]
+        stats.append({'label': group, 'q1': q1, 'med': median, 'q3': q3, 'mean': values.mean(),
+                      'whislo': inside.min() if len(inside) else q1,
+                      'whishi': inside.max() if len(inside) else q3,
+                      'fliers': fliers})
+    return stats
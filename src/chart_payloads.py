@@ -0,0 +1,321 @@
+"""Precomputes the data behind every app chart as compressed JSON payloads.
+
+   Payloads are written at build time (one gzipped JSON file per chart
+   frame, plus a manifest with the digest of the database they came from), so
+   the interactive chart page only reads small files and hands them to the
+   browser as Vega-Lite specs; no SQL or drawing runs per viewer.
+
+   The published figures in figures/charts are redrawn here too (with
+   --figures, or by the pipeline's build stage), always from the full,
+   unfiltered data.
+
+   The parity check draws the matplotlib charts the way the app pages do
+   and compares the values in their artists with the payloads.
+
+   Usage (from the project root):
+       python -m src.chart_payloads
+       python -m src.chart_payloads --figures
+       python -m src.chart_payloads --check
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import sqlite3 as sql
+
+from . import chart_data
+from . import config
+from . import release_dates
+from . import toolkit
+from . import top_collaborators
+
+payload_dir = 'data/charts'
+
+# {frame name: (temp table script, query)}
+chart_queries = {'release_formats': ('release_temp_table.sql', 'release_formats.sql'),
+                 'release_dates_split': ('release_temp_table.sql', 'release_dates_split.sql'),
+                 'month_day_distribution': ('release_temp_table.sql', 'month_day_distribution.sql'),
+                 'unique_credit_per_era': ('collab_temp_tables.sql', 'unique_credit_per_era.sql'),
+                 'avg_credit_per_song': ('collab_temp_tables.sql', 'avg_credit_per_song.sql'),
+                 'views_totals': ('views_temp_table.sql', 'views_totals.sql'),
+                 'song_views': ('views_temp_table.sql',
+                                'SELECT era, era_order, song_title, views FROM song_views ORDER BY era_order')}
+
+def query_frames(db_name):
+    """Returns {name: dataframe} of every chart query, as the app pages run them (all eras and roles)."""
+    frames = {}
+    for setup in dict.fromkeys(script for script, _ in chart_queries.values()):
+        names = [name for name, (script, _) in chart_queries.items() if script == setup]
+        results = toolkit.read_queries(db_name, [chart_queries[name][1] for name in names], [setup])
+        frames.update({name: results[chart_queries[name][1]] for name in names})
+
+    connection = sql.connect(db_name)
+    frames['most_frequent_collaborators'] = top_collaborators.top_k_per_era(connection)
+    connection.close()
+
+    for name in ['unique_credit_per_era', 'avg_credit_per_song', 'most_frequent_collaborators', 'views_totals', 'song_views']:
+        toolkit.order_by_query(frames[name], 'era')
+    month_day = frames['month_day_distribution']
+    month_day['date'] = release_dates.date_labels(month_day['month'], month_day['day'])
+    return frames
+
+def payload_frames(frames):
+    """Returns {payload name: dataframe} of bounded-size chart data built from query frames."""
+    payloads = {'release_formats': frames['release_formats'],
+                'month_day': frames['month_day_distribution'],
+                'unique_credit': frames['unique_credit_per_era'],
+                'avg_credit': frames['avg_credit_per_song'],
+                'era_views': frames['views_totals'],
+                'views_bins': chart_data.bin_counts(frames['song_views']['views'])}
+
+    releases = frames['release_dates_split']
+    for column in ['year', 'month', 'day']:
+        counts = releases[column].dropna().astype(int).value_counts().sort_index()
+        payloads['release_{}s'.format(column)] = pd.DataFrame({'value': counts.index, 'count': counts.to_numpy()})
+
+    freq_collabs = chart_data.pivot(frames['most_frequent_collaborators'], 'collaborator', 'era', 'songs')
+    payloads['freq_collabs'] = freq_collabs.stack().rename('songs').reset_index()
+
+    views = frames['song_views'].dropna(subset=['views'])
+    stats = chart_data.box_stats(views, 'views', 'era')
+    box = pd.DataFrame([{key: value for key, value in box.items() if key != 'fliers'} for box in stats])
+    box.rename(columns={'label': 'era'}, inplace=True)
+    box['era_order'] = range(1, len(box) + 1)
+    payloads['views_box'] = box
+
+    bounds = views.merge(box[['era', 'q1', 'q3']], on='era')
+    spread = 1.5 * (bounds['q3'] - bounds['q1'])
+    outside = (bounds['views'] < bounds['q1'] - spread) | (bounds['views'] > bounds['q3'] + spread)
+    payloads['views_fliers'] = bounds.loc[outside, ['era', 'song_title', 'views']].reset_index(drop=True)
+    return payloads
+
+def db_digest(db_name):
+    """Returns SHA-256 hex digest of given database file.
+
+       Unlike toolkit.db_version it survives a fresh checkout, so committed
+       payloads still match the committed database.
+    """
+    with open(db_name, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def _to_records(df):
+    df = df.copy()
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(str)
+    return json.loads(df.to_json(orient='records'))
+
+def write_payloads(db_name, out_dir=payload_dir):
+    """Writes every chart payload of given database as gzipped JSON, returning {name: bytes written}."""
+    os.makedirs(out_dir, exist_ok=True)
+    payloads = payload_frames(query_frames(db_name))
+
+    sizes = {}
+    for name, df in payloads.items():
+        file_name = os.path.join(out_dir, '{}.json.gz'.format(name))
+        data = gzip.compress(json.dumps(_to_records(df), separators=(',', ':')).encode('utf-8'), mtime=0)
+        with open(file_name, 'wb') as file:
+            file.write(data)
+        sizes[name] = len(data)
+
+    # Manifest goes last, so a half-written set of payloads never looks current
+    _write_manifest(db_name, sorted(payloads), out_dir)
+    return sizes
+
+def _write_manifest(db_name, names, out_dir):
+    manifest = {'db_digest': db_digest(db_name), 'payloads': names}
+    temp_file = os.path.join(out_dir, 'manifest.json.tmp')
+    with open(temp_file, 'w') as file:
+        json.dump(manifest, file)
+    os.replace(temp_file, os.path.join(out_dir, 'manifest.json'))
+
+def stamp_manifest(db_name, out_dir=payload_dir):
+    """Marks the existing payloads as built from given database, without rebuilding them.
+
+       Only for rebuilds known not to change any charted data (see
+       pipeline.chart_groups).
+    """
+    with open(os.path.join(out_dir, 'manifest.json'), 'r') as file:
+        names = json.load(file)['payloads']
+    _write_manifest(db_name, names, out_dir)
+
+def payloads_current(db_name, out_dir=payload_dir):
+    """Returns True if the payloads in out_dir were built from the current database."""
+    try:
+        with open(os.path.join(out_dir, 'manifest.json'), 'r') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return False
+    return manifest.get('db_digest') == db_digest(db_name)
+
+def load_payload(name, out_dir=payload_dir):
+    """Returns dataframe of given chart payload."""
+    with gzip.open(os.path.join(out_dir, '{}.json.gz'.format(name)), 'rt', encoding='utf-8') as file:
+        return pd.DataFrame(json.load(file))
+
+def load_payloads(out_dir=payload_dir):
+    """Returns {name: dataframe} of every payload listed in the manifest."""
+    with open(os.path.join(out_dir, 'manifest.json'), 'r') as file:
+        names = json.load(file)['payloads']
+    return {name: load_payload(name, out_dir) for name in names}
+
+def _same(name, drawn, expected, mismatches, rtol=1e-6):
+    drawn = np.sort(np.asarray(drawn, dtype=float))
+    expected = np.sort(np.asarray(expected, dtype=float))
+    if drawn.shape != expected.shape or not np.allclose(drawn, expected, rtol=rtol):
+        mismatches.append('{}: matplotlib {} vs payload {}'.format(name, drawn.tolist(), expected.tolist()))
+
+def check_parity(db_name, out_dir=payload_dir):
+    """Returns list of mismatches between matplotlib chart values and the stored payloads."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from . import charts
+
+    rcParams, custom_params = toolkit.chart_params()
+    frames = query_frames(db_name)
+    payloads = {name: load_payload(name, out_dir) for name in payload_frames(frames)}
+    mismatches = []
+
+    fig, ax = charts.formats_pie(custom_params, frames['release_formats'], 'total_songs', 'classification', '',
+                                 config.palette('release_formats'))
+    total = payloads['release_formats']['total_songs'].sum()
+    _same('release_formats', [(wedge.theta2 - wedge.theta1) / 360 * total for wedge in ax.patches],
+          payloads['release_formats']['total_songs'], mismatches, rtol=1e-4)
+
+    fig, ax = charts.release_hist(custom_params, frames['release_dates_split'], 'year', 'month', 'day', '', '', '', '',
+                                  '', '', '', '', config.palette('release_dates'),
+                                  config.palette('release_dates_edges'))
+    for axis, column in zip(ax, ['year', 'month', 'day']):
+        heights = [patch.get_height() for patch in axis.patches if patch.get_height() > 0]
+        _same('release_{}s'.format(column), heights, payloads['release_{}s'.format(column)]['count'], mismatches)
+
+    fig, ax = charts.date_scatter(custom_params, frames['month_day_distribution'], 'month', 'day', 'count', '', '', '')
+    offsets = ax.collections[0].get_offsets()
+    _same('month_day', offsets[:, 0] * 100 + offsets[:, 1],
+          payloads['month_day']['month'] * 100 + payloads['month_day']['day'], mismatches)
+
+    for name, query, column, plot_type in [('unique_credit', 'unique_credit_per_era', 'unique_count', 'bar'),
+                                           ('avg_credit', 'avg_credit_per_song', 'avg_per_song', 'line')]:
+        df = frames[query]
+        fig, ax = charts.credit_chart(config.palette('credit_roles'), custom_params,
+                                      plot_type, df, 'era', column, 'type', df.groupby('type')[column].mean(),
+                                      '', '', '', '', True)
+        if plot_type == 'bar':
+            drawn = [patch.get_height() for patch in ax.patches if patch.get_height() > 0]
+        else:
+            drawn = np.concatenate([line.get_ydata() for line in ax.lines if len(line.get_ydata()) > 2])
+        _same(name, drawn, payloads[name][column][payloads[name][column] > 0] if plot_type == 'bar'
+              else payloads[name][column], mismatches)
+
+    fig, ax = charts.collab_heatmap(custom_params, chart_data.pivot(frames['most_frequent_collaborators'],
+                                                                     'collaborator', 'era', 'songs'), '', '', '', True)
+    _same('freq_collabs', [float(text.get_text()) for text in ax.texts], payloads['freq_collabs']['songs'], mismatches)
+
+    views_bins = chart_data.bin_counts(frames['song_views']['views'])
+    fig, ax = charts.views_plots(custom_params, frames['views_totals'], 'total_views', 'era', views_bins, '', '', '',
+                                 '', '', '', '', config.palette('views_totals'),
+                                 config.palette('views_totals_edges'))
+    _same('era_views', [patch.get_width() for patch in ax[0].patches], payloads['era_views']['total_views'], mismatches)
+    _same('views_bins', [patch.get_height() for patch in ax[1].patches], payloads['views_bins']['count'], mismatches)
+
+    stats = chart_data.box_stats(frames['song_views'], 'views', 'era')
+    fig, ax = charts.views_box(custom_params, stats, '', '', '', config.palette('views_box'), config.palette('views_box_edges'))
+    # Median lines are the only vertical lines spanning a whole box (width 0.8)
+    medians = [line.get_xdata()[0] for line in ax.lines
+               if len(line.get_xdata()) == 2 and line.get_xdata()[0] == line.get_xdata()[1]
+               and np.isclose(abs(line.get_ydata()[1] - line.get_ydata()[0]), 0.8)]
+    _same('views_box', medians, payloads['views_box']['med'], mismatches)
+    _same('views_fliers', np.concatenate([line.get_xdata() for line in ax.lines if line.get_marker() == 'd']),
+          payloads['views_fliers']['views'], mismatches)
+
+    plt.close('all')
+    return mismatches
+
+def write_figures(db_name):
+    """Draws every app chart of given database (all eras and roles) and saves it to figures/charts.
+
+       The published figures are only written here, from the full data;
+       the app pages never save theirs, since they follow each visitor's
+       filters.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from . import charts
+
+    rcParams, custom_params = toolkit.chart_params()
+    frames = query_frames(db_name)
+
+    formats = frames['release_formats']
+    charts.formats_pie(custom_params, formats, 'total_songs', 'classification', 'Song Release Formats',
+                       config.palette('release_formats'), True, 'release_formats.png', True, formats)
+    charts.release_hist(custom_params, frames['release_dates_split'], 'year', 'month', 'day',
+                        'Frequency Distributions of Song Release Dates', 'Release Years', 'Release Months',
+                        'Release Days', 'Year', 'Month', 'Day of Month', 'Song Count', config.palette('release_dates'),
+                        config.palette('release_dates_edges'), True, 'release_dates_distribution.png')
+    month_day = frames['month_day_distribution']
+    dates = chart_data.top_n(month_day, 'date', 'count', 10, other_label=None)
+    charts.date_scatter(custom_params, month_day, 'month', 'day', 'count', 'Most Frequent Release Dates',
+                        'Month', 'Day of Month', True, 'most_frequent_dates.png', True, dates)
+
+    for query, column, plot_type, title, y_label, png_name in [
+            ('unique_credit_per_era', 'unique_count', 'bar', 'Total Unique Musicial Credits per Era',
+             '# per Era (Count)', 'unique_credits_per_era.png'),
+            ('avg_credit_per_song', 'avg_per_song', 'line', 'Average Number of Musicial Credits per Song by Era',
+             '# per Song (Average)', 'avg_credits_per_song.png')]:
+        df = frames[query]
+        pivot = df.pivot(columns='era', index='type', values=column)
+        pivot.sort_values('type', ascending=False, inplace=True)
+        averages = df.groupby('type')[column].mean().sort_values(ascending=False)
+        charts.credit_chart(config.palette('credit_roles'), custom_params, plot_type, df, 'era', column, 'type',
+                            averages, title, 'Album/Song Era', y_label, 'Credit Type', True, True, png_name,
+                            True, pivot)
+
+    freq_collabs = frames['most_frequent_collaborators']
+    collab_totals = freq_collabs[['collaborator', 'total_songs']].drop_duplicates('collaborator')
+    collab_totals = collab_totals.sort_values('collaborator').set_index('collaborator')
+    charts.collab_heatmap(custom_params, chart_data.pivot(freq_collabs, 'collaborator', 'era', 'songs'),
+                          'Most Frequent Collaborators per Era', 'Album/Song Era', 'Collaborator Name', True,
+                          True, 'most_frequent_collabs_per_era.png', table_bool=True, table_df=collab_totals)
+
+    song_views = frames['song_views']
+    charts.views_plots(custom_params, frames['views_totals'], 'total_views', 'era',
+                       chart_data.bin_counts(song_views['views']), 'Song Page Views on Genius',
+                       'Total Page Views per Era', 'Frequency Distribution of Page Views', 'Total Page Views',
+                       'Page Views', 'Album/Song Era', 'Song Count', config.palette('views_totals'),
+                       config.palette('views_totals_edges'), True, 'total_page_views_distribution.png')
+    charts.views_box(custom_params, chart_data.box_stats(song_views, 'views', 'era'),
+                     'Genius Song Page View Distribution per Album/Song Category', 'Page Views', 'Album/Song Era',
+                     config.palette('views_box'), config.palette('views_box_edges'), True,
+                     'page_view_box_distribution.png')
+    plt.close('all')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='data/taylor_swift.db')
+    parser.add_argument('--out', default=payload_dir)
+    parser.add_argument('--check', action='store_true', help='compare payloads with the matplotlib charts instead')
+    parser.add_argument('--figures', action='store_true', help='also redraw the published charts in figures/charts')
+    args = parser.parse_args()
+
+    if args.check:
+        mismatches = check_parity(args.db, args.out)
+        for mismatch in mismatches:
+            print(mismatch)
+        print('{} mismatches'.format(len(mismatches)))
+        sys.exit(1 if mismatches else 0)
+
+    for name, size in write_payloads(args.db, args.out).items():
+        print('{:<16} {:>7} bytes'.format(name, size))
+    if args.figures:
+        write_figures(args.db)
+
+if __name__ == '__main__':
+    main()
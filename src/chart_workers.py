@@ -0,0 +1,60 @@
+"""Draws a page's charts in parallel worker processes.
+
+   Matplotlib keeps global state (rcParams, pyplot's current figure) and
+   isn't thread-safe, so each chart is drawn and encoded in its own
+   process and only the image bytes come back. Pages submit all their
+   charts up front, lay out placeholders, and then fill each placeholder
+   as soon as its chart is done, so a page takes about as long as its
+   slowest chart rather than the sum of all of them.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+max_workers = min(4, os.cpu_count() or 1)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+    from . import toolkit
+    toolkit.chart_params()
+
+def executor():
+    """Returns the shared pool of chart worker processes, starting it on first use.
+
+       Workers are spawned rather than forked, since the app server runs
+       several threads.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_init_worker)
+    return _executor
+
+def render(chart_name, args, kwargs, image_format='png', preset='screen'):
+    """Returns image bytes of given charts.py function called with args and kwargs (runs in a worker)."""
+    import matplotlib.pyplot as plt
+    from . import charts
+
+    fig, _ = getattr(charts, chart_name)(*args, **kwargs)
+    data = charts.figure_bytes(fig, image_format, preset)
+    plt.close(fig)
+    return data
+
+def submit(chart_name, *args, image_format='png', preset='screen', **kwargs):
+    """Queues given charts.py function to be drawn by a worker, returning a future of its image bytes."""
+    return executor().submit(render, chart_name, args, kwargs, image_format, preset)
+
+def stream(placeholders):
+    """Fills placeholders with their chart images in the order the charts finish.
+
+       placeholders: dict, {future from submit: Streamlit placeholder}
+    """
+    for future in as_completed(placeholders):
+        placeholders[future].image(future.result(), use_container_width=True)
@@ -1,13 +1,50 @@
 """Builds charts in seaborn/matplotlib."""
 
+import io
+import os
+
 import matplotlib.pyplot as plt
 import seaborn as sns
 from matplotlib import ticker
 from matplotlib.font_manager import FontProperties
 
+# Raster resolution and lossy quality per use; SVG ignores both and keeps
+# text as text, which is usually the smallest and sharpest option
+save_presets = {'thumbnail': {'dpi': 50, 'quality': 70},
+                'screen': {'dpi': 150, 'quality': 85},
+                'print': {'dpi': 300, 'quality': 95}}
+
+def save_kwargs(image_format, preset='screen'):
+    """Returns savefig keyword arguments for given format ('png', 'webp', 'svg') and preset."""
+    settings = save_presets[preset]
+    kwargs = {'format': image_format, 'bbox_inches': 'tight'}
+    match image_format:
+        case 'svg':
+            kwargs['metadata'] = {'Date': None}
+        case 'webp' | 'jpg' | 'jpeg':
+            kwargs['dpi'] = settings['dpi']
+            kwargs['pil_kwargs'] = {'quality': settings['quality'], 'method': 6}
+        case _:
+            kwargs['dpi'] = settings['dpi']
+    return kwargs
+
+def figure_bytes(fig, image_format='png', preset='screen'):
+    """Returns given figure encoded in given format and preset."""
+    buffer = io.BytesIO()
+    with plt.rc_context({'svg.fonttype': 'none'}):
+        fig.savefig(buffer, **save_kwargs(image_format, preset))
+    return buffer.getvalue()
+
+def save_chart(fig, file_name, preset='screen'):
+    """Saves figure to figures/charts, format taken from file name's extension."""
+    image_format = os.path.splitext(file_name)[1].lstrip('.').lower() or 'png'
+    with open('figures/charts/{}'.format(file_name), 'wb') as file:
+        file.write(figure_bytes(fig, image_format, preset))
+
 def credit_chart(color_dict, custom_params, plot_type, df, x_values, y_values, 
                  hues, avg_series, title, x_label, y_label, legend_title, rotate_x, 
-                 save_png=False, png_name=None, table_bool=False, table_df=None):
+                 save_png=False, png_name=None, table_bool=False, table_df=None,
+                 preset='screen'):
     """Build musician credit chart based on given arguments.
 
        Args:
@@ -24,10 +61,11 @@ def credit_chart(color_dict, custom_params, plot_type, df, x_values, y_values,
            y_label: str, y-axis label
            legend_title: str, title for legend
            rotate_x: bool, rotates x tick labels
-           save_png: bool, default False, saves chart to png
-           png_name: str, default None, image name (must include .png)
+           save_png: bool, default False, saves chart to figures/charts
+           png_name: str, default None, image name (.png, .webp, or .svg)
            table_bool: bool, default False, includes values table
            table_df: formatted df, default None, needed for table 
+           preset: str, default 'screen', size/quality preset (see save_presets)
     """
     palette = sns.color_palette(color_dict.values())
     sns.set_theme(style='white', rc=custom_params)
@@ -71,38 +109,32 @@ def credit_chart(color_dict, custom_params, plot_type, df, x_values, y_values,
         ax.tick_params(axis='x', labelrotation=20)
 
     if save_png == True:
-        fig.savefig('figures/charts/{}'.format(png_name), bbox_inches='tight')
+        save_chart(fig, png_name, preset)
 
     return fig, ax
 
-def collab_heatmap(custom_params, df, x_values, y_values, value_field, aggfunc, title, x_label, y_label, 
-                   rotate_x, save_png=False, png_name=None, table_bool=False, table_df=None):
+def collab_heatmap(custom_params, df_pivot, title, x_label, y_label, 
+                   rotate_x, save_png=False, png_name=None, table_bool=False, table_df=None,
+                   preset='screen'):
     """Build collaborator heatmap based on given arguments.
 
        Args:
            custom_params: dict, matplotlib custom params
-           df: pandas dataframe
-           x_values: str, column name in df
-           y_values: str, column name in df
-           value_field: series, column in df, cells in pivoted df
-           aggfunc: str, aggregate function for pivoted df
+           df_pivot: pivoted pandas dataframe (see chart_data.pivot), rows on y-axis
            title: str, chart title
            x_label: str, x-axis label
            y_label: str, y-axis label
            rotate_x: bool, rotates x tick labels
-           save_png: bool, default False, saves chart to png
-           png_name: str, default None, image name (must include .png)
+           save_png: bool, default False, saves chart to figures/charts
+           png_name: str, default None, image name (.png, .webp, or .svg)
            table_bool: bool, default False, includes values table
            table_df: formatted df, default None, needed for table 
+           preset: str, default 'screen', size/quality preset (see save_presets)
     """
     sns.set_theme(style='white', rc=custom_params)
     fig, ax = plt.subplots(figsize=(17, 10))
     fig.patch.set_facecolor('#EDECE8')
 
-    df_pivot = df.pivot_table(index=y_values, columns=x_values, values=value_field, fill_value=0, 
-                              aggfunc=aggfunc, observed=False)
-    df_pivot.sort_values(y_values, inplace=True)
-    
     sns.heatmap(df_pivot, annot=True, linewidths=1.5, linecolor='#FFFFFF', ax=ax, cmap='PuRd', cbar=False)
 
     if table_bool == True:
@@ -123,12 +155,13 @@ def collab_heatmap(custom_params, df, x_values, y_values, value_field, aggfunc,
         ax.tick_params(axis='x', labelrotation=40)
 
     if save_png == True:
-        plt.savefig('figures/charts/{}'.format(png_name), bbox_inches='tight')
+        save_chart(fig, png_name, preset)
 
     return fig, ax
 
 def formats_pie(custom_params, df, wedge_values, wedge_labels, title, colors_list, 
-                save_png=False, png_name=None, table_bool=False, table_df=None):
+                save_png=False, png_name=None, table_bool=False, table_df=None,
+                preset='screen'):
     """Build collaborator heatmap based on given arguments.
 
        Args:
@@ -138,10 +171,11 @@ def formats_pie(custom_params, df, wedge_values, wedge_labels, title, colors_lis
            wedge_labels: str, column name in df
            title: str, chart title
            colors_list: list, colors for wedges
-           save_png: bool, default False, saves chart to png
-           png_name: str, default None, image name (must include .png)
+           save_png: bool, default False, saves chart to figures/charts
+           png_name: str, default None, image name (.png, .webp, or .svg)
            table_bool: bool, default False, includes values table
            table_df: formatted df, default None, needed for table 
+           preset: str, default 'screen', size/quality preset (see save_presets)
     """
     sns.set_theme(style='white', rc=custom_params)
     fig, ax = plt.subplots(figsize=(17, 5))
@@ -150,8 +184,9 @@ def formats_pie(custom_params, df, wedge_values, wedge_labels, title, colors_lis
            wedgeprops={"edgecolor":"#132a13"}, textprops={"fontsize":9})
     ax.set_title(title, fontweight='bold', fontsize='large', x=0.77)
     if table_bool == True:
+        # One row per wedge, which can be fewer than the colors given when eras are filtered
         colors = []
-        for i, color in enumerate(colors_list):
+        for i in range(len(table_df)):
             row_color = [colors_list[i], 'white']
             colors.append(row_color)
             
@@ -163,12 +198,13 @@ def formats_pie(custom_params, df, wedge_values, wedge_labels, title, colors_lis
                 cell.set_text_props(fontproperties=FontProperties(weight='bold'))
                 
     if save_png == True:
-        plt.savefig('figures/charts/{}'.format(png_name), bbox_inches='tight')
+        save_chart(fig, png_name, preset)
 
     return fig, ax
 
 def release_hist(custom_params, df, x1_values, x2_values, x3_values, suptitle, title1, title2, title3, 
-                 x1_label, x2_label, x3_label, y_label, colors_list, edgecolors_list, save_png=False, png_name=None):
+                 x1_label, x2_label, x3_label, y_label, colors_list, edgecolors_list, save_png=False, png_name=None,
+                 preset='screen'):
     """Build three release histograms based on given arguments.
 
        Args:
@@ -187,8 +223,9 @@ def release_hist(custom_params, df, x1_values, x2_values, x3_values, suptitle, t
            y_label: str, y-axis label
            colors_list: list, colors for three histograms
            edgecolors_list: list, edgecolors for three histograms
-           save_png: bool, default False, saves chart to png
-           png_name: str, default None, image name (must include .png)
+           save_png: bool, default False, saves chart to figures/charts
+           png_name: str, default None, image name (.png, .webp, or .svg)
+           preset: str, default 'screen', size/quality preset (see save_presets)
     """
     sns.set_theme(style='white', rc=custom_params)
     fig, ax = plt.subplots(1, 3, figsize=(16, 6), sharey=True)
@@ -223,12 +260,13 @@ def release_hist(custom_params, df, x1_values, x2_values, x3_values, suptitle, t
         ax[2].bar_label(c, fontweight='bold', fontsize=6)
     
     if save_png == True:
-        plt.savefig('figures/charts/{}'.format(png_name), bbox_inches='tight')
+        save_chart(fig, png_name, preset)
 
     return fig, ax
 
 def date_scatter(custom_params, df, x_values, y_values, size_values, title, x_label, 
-                 y_label, save_png=False, png_name=None, table_bool=False, table_df=None):
+                 y_label, save_png=False, png_name=None, table_bool=False, table_df=None,
+                 preset='screen'):
     """Build collaborator heatmap based on given arguments.
 
        Args:
@@ -240,10 +278,11 @@ def date_scatter(custom_params, df, x_values, y_values, size_values, title, x_la
            title: str, chart title
            x_label: str, x-axis label
            y_label: str, y-axis label
-           save_png: bool, default False, saves chart to png
-           png_name: str, default None, image name (must include .png)
+           save_png: bool, default False, saves chart to figures/charts
+           png_name: str, default None, image name (.png, .webp, or .svg)
            table_bool: bool, default False, includes values table
            table_df: formatted df, default None, needed for table 
+           preset: str, default 'screen', size/quality preset (see save_presets)
     """
     fig, ax = plt.subplots(figsize=(7, 5))
     fig.patch.set_facecolor('#EDECE8')
@@ -271,12 +310,13 @@ def date_scatter(custom_params, df, x_values, y_values, size_values, title, x_la
                 cell.set_edgecolor('#A03704')
         
     if save_png == True:
-        plt.savefig('figures/charts/{}'.format(png_name), bbox_inches='tight')
+        save_chart(fig, png_name, preset)
 
     return fig, ax
 
-def views_plots(custom_params, bar_df, barx_values, bary_values, hist_df, histx_values, suptitle, title1, title2,
-                 x1_label, x2_label, y1_label, y2_label, colors_list, edgecolors_list, save_png=False, png_name=None):
+def views_plots(custom_params, bar_df, barx_values, bary_values, hist_bins, suptitle, title1, title2,
+                 x1_label, x2_label, y1_label, y2_label, colors_list, edgecolors_list, save_png=False, png_name=None,
+                 preset='screen'):
     """Build three release histograms based on given arguments.
 
        Args:
@@ -284,8 +324,7 @@ def views_plots(custom_params, bar_df, barx_values, bary_values, hist_df, histx_
            bar_df: pandas dataframe for barplot
            barx_value: str, column name in df for barplot
            bary_values: str, column name in df for barplot
-           hist_df: pandas dataframe for histplot
-           histx_value: str, column name in df for histplot
+           hist_bins: pandas dataframe of histogram bins (see chart_data.bin_counts)
            suptitle: str, overall chart title
            title1: str, title for first subplot
            title2: str, title for second subplot
@@ -295,8 +334,9 @@ def views_plots(custom_params, bar_df, barx_values, bary_values, hist_df, histx_
            y2_label: str, y-axis label for histplot
            colors_list: list, colors for two subplots
            edgecolors_list: list, edgecolors for two subplots
-           save_png: bool, default False, saves chart to png
-           png_name: str, default None, image name (must include .png)
+           save_png: bool, default False, saves chart to figures/charts
+           png_name: str, default None, image name (.png, .webp, or .svg)
+           preset: str, default 'screen', size/quality preset (see save_presets)
     """
     sns.set_theme(style='white', rc=custom_params)
     fig, ax = plt.subplots(1, 2, figsize=(17, 6), gridspec_kw={'width_ratios': [1.5, 1]})
@@ -313,7 +353,9 @@ def views_plots(custom_params, bar_df, barx_values, bary_values, hist_df, histx_
     ax[0].set_ylabel(y1_label, fontweight='bold', fontsize='medium')
     ax[0].margins(x=0.1)
     
-    sns.histplot(hist_df, x=histx_values, ax=ax[1], color=colors_list[1], edgecolor=edgecolors_list[1], shrink=0.8)
+    bin_edges = list(hist_bins['left']) + list(hist_bins['right'].iloc[-1:])
+    sns.histplot(x=hist_bins['left'], weights=hist_bins['count'], bins=bin_edges, ax=ax[1],
+                 color=colors_list[1], edgecolor=edgecolors_list[1], shrink=0.8)
     ax[1].xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, pos: '{:.0f}M'.format(x/1000000)))
     for c in ax[1].containers:
         labels1 = [v if v > 0 else '' for v in c.datavalues] 
@@ -324,32 +366,37 @@ def views_plots(custom_params, bar_df, barx_values, bary_values, hist_df, histx_
     ax[1].set_ylabel(y2_label, fontweight='bold', fontsize='medium')
     
     if save_png == True:
-        plt.savefig('figures/charts/{}'.format(png_name), bbox_inches='tight')
+        save_chart(fig, png_name, preset)
 
     return fig, ax
 
-def views_box(custom_params, df, x_values, y_values, title, x_label, y_label, boxcolor, linecolor, save_png=False, png_name=None):
-    """Build three release histograms based on given arguments.
+def views_box(custom_params, stats, title, x_label, y_label, boxcolor, linecolor, save_png=False, png_name=None,
+              preset='screen'):
+    """Build horizontal box plots based on given arguments.
 
        Args:
            custom_params: dict, matplotlib custom params
-           df: pandas dataframe
-           x_values: str, column name in df
-           y_values: str, column name in df
+           stats: list, box statistics per group (see chart_data.box_stats)
            title: str, chart title
            x_label: str, x-axis label
            y_label: str, y-axis label
            boxcolor: str, color for box faces
            linecolor: str, color for lines
-           save_png: bool, default False, saves chart to png
-           png_name: str, default None, image name (must include .png)
+           save_png: bool, default False, saves chart to figures/charts
+           png_name: str, default None, image name (.png, .webp, or .svg)
+           preset: str, default 'screen', size/quality preset (see save_presets)
     """
     sns.set_theme(style='white', rc=custom_params)
     fig, ax = plt.subplots(figsize=(17, 7))
     fig.patch.set_facecolor('#EDECE8')
-    sns.boxplot(df, y=y_values, x=x_values, linecolor=linecolor, showmeans=True, 
-                boxprops= {'facecolor': boxcolor}, flierprops={'marker': 'd', 'markerfacecolor': linecolor, 'markersize': 3},
-                meanprops={'marker':'8', 'markerfacecolor': fig.get_facecolor(), 'markeredgecolor': linecolor})
+    # Drawn from precomputed statistics, first group at the top as in seaborn
+    line_props = {'color': linecolor}
+    ax.bxp(stats, vert=False, widths=0.8, patch_artist=True, showmeans=True, 
+           boxprops={'facecolor': boxcolor, 'edgecolor': linecolor}, whiskerprops=line_props, capprops=line_props,
+           medianprops=line_props, flierprops={'marker': 'd', 'markerfacecolor': linecolor, 'markeredgecolor': linecolor, 'markersize': 3},
+           meanprops={'marker':'8', 'markerfacecolor': fig.get_facecolor(), 'markeredgecolor': linecolor})
+    ax.set_yticks(range(1, len(stats) + 1), [box['label'] for box in stats])
+    ax.invert_yaxis()
     ax.xaxis.set_major_formatter(ticker.FuncFormatter(lambda x, pos: '{:.0f}M'.format(x/1000000)))
     ax.set_title(title, fontweight='bold', fontsize='medium')
     ax.set_xlabel(x_label, fontweight='bold', fontsize='medium',
@@ -357,6 +404,6 @@ def views_box(custom_params, df, x_values, y_values, title, x_label, y_label, bo
     ax.set_ylabel(y_label, fontweight='bold', fontsize='medium')
     
     if save_png == True:
-        plt.savefig('figures/charts/{}'.format(png_name), bbox_inches='tight')
+        save_chart(fig, png_name, preset)
 
     return fig, ax
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""Builds and analyzes the co-credit collaboration graph with SciPy sparse matrices.
+
+   Two people are connected when they are credited (as writer, producer,
+   or artist) on the same song; edge weights count shared songs. Graphs are
+   cached per data version, so repeated queries never rebuild the matrices.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import sqlite3 as sql
+from scipy import sparse
+from scipy.sparse import linalg
+
+from . import toolkit
+
+credits_query = '''
+SELECT a.category AS era, s.song_title, w.song_writer AS collaborator
+FROM songs s JOIN albums a ON s.album_title = a.album_title
+JOIN writers w ON s.song_title = w.song_title
+UNION
+SELECT a.category AS era, s.song_title, p.song_producer AS collaborator
+FROM songs s JOIN albums a ON s.album_title = a.album_title
+JOIN producers p ON s.song_title = p.song_title
+UNION
+SELECT a.category AS era, s.song_title, sa.song_artist AS collaborator
+FROM songs s JOIN albums a ON s.album_title = a.album_title
+JOIN artists sa ON s.song_title = sa.song_title
+'''
+
+def load_graph(db_name):
+    """Returns cached collaboration graph for current version of given database."""
+    return _build_graph(db_name, toolkit.db_version(db_name))
+
+@lru_cache(maxsize=4)
+def _build_graph(db_name, version):
+    connection = sql.connect(db_name)
+    credits = pd.read_sql(credits_query, connection).dropna()
+    connection.close()
+    return build_graph(credits)
+
+def build_graph(credits):
+    """Builds collaboration graph from dataframe of (era, song_title, collaborator) rows.
+
+       Returns dict with the song x person incidence matrix, the person x
+       person adjacency matrix, person names, and the era of each song.
+    """
+    songs = credits[['song_title', 'era']].drop_duplicates('song_title')
+    song_index = pd.Index(songs['song_title'])
+    people = pd.Index(credits['collaborator'].unique())
+
+    rows = song_index.get_indexer(credits['song_title'])
+    cols = people.get_indexer(credits['collaborator'])
+    incidence = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                                  shape=(len(song_index), len(people)))
+    # Duplicate (song, person) pairs collapse to a single credit
+    incidence.data[:] = 1
+
+    graph = {'people': people,
+             'songs': song_index,
+             'song_eras': songs['era'].to_numpy(),
+             'incidence': incidence,
+             'adjacency': co_credit_matrix(incidence)}
+    return graph
+
+def co_credit_matrix(incidence):
+    """Returns person x person matrix of shared song counts, without self-loops."""
+    adjacency = (incidence.T @ incidence).tocsr()
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+    return adjacency
+
+def era_subgraph(graph, eras):
+    """Returns collaboration graph restricted to songs from given eras."""
+    mask = np.isin(graph['song_eras'], list(eras))
+    incidence = graph['incidence'][mask]
+    active = np.flatnonzero(incidence.getnnz(axis=0))
+    incidence = incidence[:, active]
+
+    subgraph = {'people': graph['people'][active],
+                'songs': graph['songs'][mask],
+                'song_eras': graph['song_eras'][mask],
+                'incidence': incidence,
+                'adjacency': co_credit_matrix(incidence)}
+    return subgraph
+
+def eigenvector_centrality(adjacency):
+    """Returns weighted eigenvector centrality, scaled so the maximum is 1."""
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    if n < 3 or adjacency.nnz == 0:
+        values, vectors = np.linalg.eigh(adjacency.toarray().astype(float))
+    else:
+        values, vectors = linalg.eigsh(adjacency.astype(float), k=1, which='LA')
+    centrality = np.abs(vectors[:, np.argmax(values)])
+    peak = centrality.max()
+    return centrality / peak if peak > 0 else centrality
+
+def label_communities(adjacency, max_iter=20):
+    """Finds communities via weighted label propagation.
+
+       Every node repeatedly takes the label with the largest total edge
+       weight among its neighbours; labels are renumbered from 0 by size.
+    """
+    n = adjacency.shape[0]
+    labels = np.arange(n)
+    weights = (adjacency + sparse.identity(n, format='csr')).tocsr()
+    # Alternating halves are updated in turn, since fully synchronous updates
+    # let two strongly tied nodes swap labels forever
+    halves = np.arange(n) % 2
+    unchanged = 0
+    for iteration in range(2 * max_iter):
+        one_hot = sparse.csr_matrix((np.ones(n), (np.arange(n), labels)), shape=(n, n))
+        scores = (weights @ one_hot).tocsr()
+        best = np.asarray(scores.argmax(axis=1)).ravel()
+        new_labels = np.where(halves == iteration % 2, best, labels)
+        unchanged = unchanged + 1 if np.array_equal(new_labels, labels) else 0
+        labels = new_labels
+        if unchanged == 2:
+            break
+
+    sizes = pd.Series(labels).value_counts()
+    renumber = {label: index for index, label in enumerate(sizes.index)}
+    return np.array([renumber[label] for label in labels])
+
+def graph_metrics(graph, exclude=None):
+    """Returns dataframe of per-person metrics for given collaboration graph.
+
+       Columns: collaborator, songs, degree (distinct co-credited people),
+       weighted_degree (total shared songs), centrality, community. Names in
+       'exclude' (e.g. ['Taylor Swift']) are dropped before computing
+       centrality and communities, since a hub on every song connects everyone.
+    """
+    people = graph['people']
+    incidence = graph['incidence']
+    adjacency = graph['adjacency']
+    if exclude:
+        keep = np.flatnonzero(~people.isin(exclude))
+        people = people[keep]
+        incidence = incidence[:, keep]
+        adjacency = adjacency[keep][:, keep]
+
+    metrics = pd.DataFrame({'collaborator': people,
+                            'songs': np.asarray(incidence.sum(axis=0)).ravel(),
+                            'degree': adjacency.getnnz(axis=1),
+                            'weighted_degree': np.asarray(adjacency.sum(axis=1)).ravel(),
+                            'centrality': eigenvector_centrality(adjacency).round(4),
+                            'community': label_communities(adjacency)})
+    metrics.sort_values(['centrality', 'songs'], ascending=False, inplace=True)
+    metrics.reset_index(drop=True, inplace=True)
+    return metrics
+
+@lru_cache(maxsize=64)
+def _cached_metrics(db_name, version, eras, exclude):
+    graph = _build_graph(db_name, version)
+    if eras:
+        graph = era_subgraph(graph, eras)
+    return graph_metrics(graph, list(exclude))
+
+def collaborator_metrics(db_name, eras=None, exclude=('Taylor Swift',)):
+    """Returns cached metrics dataframe for given database, optionally per era(s)."""
+    eras = tuple(sorted(eras)) if eras else None
+    metrics = _cached_metrics(db_name, toolkit.db_version(db_name), eras, tuple(exclude))
+    return metrics.copy()
+
+def shared_songs(graph, names):
+    """Returns long dataframe of shared song counts between given people."""
+    index = graph['people'].get_indexer(names)
+    names = [name for name, position in zip(names, index) if position >= 0]
+    index = index[index >= 0]
+    block = graph['adjacency'][index][:, index].toarray()
+
+    shared = pd.DataFrame(block, index=names, columns=names)
+    shared.index.name = 'collaborator'
+    shared = shared.reset_index().melt(id_vars='collaborator', var_name='partner', value_name='songs')
+    return shared
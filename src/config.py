@@ -0,0 +1,152 @@
+"""Loads the era and chart configuration of data/discography.toml.
+
+   The file is read and checked once per process. Everything derived from
+   it is computed once too: era order and labels, each era's release
+   classification, and a categorical dtype of the era labels, so putting
+   a query's era column in chart order is an index lookup and a
+   Categorical.from_codes rather than string replaces and a new category
+   list per query.
+"""
+
+import os
+import re
+import threading
+import tomllib
+
+config_file = os.path.join(os.path.dirname(__file__), '..', 'data', 'discography.toml')
+
+credit_roles = ['writer', 'producer', 'artist']
+
+required_palettes = ['background', 'release_formats', 'release_dates', 'release_dates_edges', 'views_totals',
+                     'views_totals_edges', 'views_box', 'views_box_edges', 'credit_roles']
+
+_color = re.compile(r'^#[0-9A-Fa-f]{6}$')
+
+def _colors(value):
+    if isinstance(value, str):
+        return [value]
+    return list(value.values()) if isinstance(value, dict) else list(value)
+
+def validate(settings):
+    """Returns list of problems with given parsed configuration (empty if none)."""
+    problems = []
+    classifications = settings.get('classifications', [])
+    if settings.get('default_classification') not in classifications:
+        problems.append('default_classification is not one of the classifications')
+
+    categories = [era.get('category') for era in settings.get('eras', [])]
+    labels = [era.get('label', era.get('category')) for era in settings.get('eras', [])]
+    if not categories:
+        problems.append('no eras')
+    for name, values in [('category', categories), ('label', labels)]:
+        duplicates = sorted({value for value in values if values.count(value) > 1}, key=str)
+        if duplicates:
+            problems.append('duplicate era {}: {}'.format(name, ', '.join(map(str, duplicates))))
+    for era in settings.get('eras', []):
+        if not isinstance(era.get('category'), str):
+            problems.append('era without a category: {}'.format(era))
+        elif era.get('classification') not in classifications:
+            problems.append('era {} has unknown classification {!r}'.format(era['category'], era.get('classification')))
+
+    palettes = settings.get('palettes', {})
+    for name in required_palettes:
+        if name not in palettes:
+            problems.append('missing palette {}'.format(name))
+    for name, value in palettes.items():
+        bad = [color for color in _colors(value) if not isinstance(color, str) or not _color.match(color)]
+        if bad:
+            problems.append('palette {} has invalid colors: {}'.format(name, ', '.join(map(str, bad))))
+    if set(palettes.get('credit_roles', {})) != set(credit_roles):
+        problems.append('palette credit_roles must have a color for each of {}'.format(', '.join(credit_roles)))
+    return problems
+
+def load_config(file_name=config_file):
+    """Returns checked configuration of given TOML file, with its lookups precomputed.
+
+       Keys: categories and labels (in era order), classifications (of
+       each era), default_classification, palettes, category_positions
+       and label_positions ({category or label: era position}), and
+       category_labels ({category: label}). Raises ValueError listing
+       every problem if the file isn't valid.
+    """
+    with open(file_name, 'rb') as file:
+        settings = tomllib.load(file)
+    problems = validate(settings)
+    if problems:
+        raise ValueError('Invalid configuration in {}:\n  {}'.format(file_name, '\n  '.join(problems)))
+
+    eras = settings['eras']
+    categories = [era['category'] for era in eras]
+    labels = [era.get('label', era['category']) for era in eras]
+    return {'categories': categories,
+            'labels': labels,
+            'classifications': [era['classification'] for era in eras],
+            'default_classification': settings['default_classification'],
+            'palettes': settings['palettes'],
+            'category_positions': {category: position for position, category in enumerate(categories)},
+            'label_positions': {label: position for position, label in enumerate(labels)},
+            'category_labels': dict(zip(categories, labels))}
+
+_config = None
+_era_dtype = None
+_config_lock = threading.Lock()
+
+def config():
+    """Returns the configuration of data/discography.toml, loading it on first use."""
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = load_config()
+    return _config
+
+def era_labels():
+    """Returns list of era labels in chart order."""
+    return list(config()['labels'])
+
+def era_label(category):
+    """Returns chart label of given album category (the category itself if it has none)."""
+    return config()['category_labels'].get(category, category)
+
+def era_position(era):
+    """Returns chart position of given era (category or label), or the number of eras if unknown."""
+    settings = config()
+    return settings['category_positions'].get(era, settings['label_positions'].get(era, len(settings['labels'])))
+
+def era_classification(category):
+    """Returns release classification of given album category."""
+    settings = config()
+    position = settings['category_positions'].get(category)
+    return settings['default_classification'] if position is None else settings['classifications'][position]
+
+def palette(name):
+    """Returns given palette: a color, a list of colors, or a {series: color} dictionary (a copy)."""
+    value = config()['palettes'][name]
+    return value if isinstance(value, str) else type(value)(value)
+
+def era_dtype():
+    """Returns ordered pandas CategoricalDtype of every era label, in chart order."""
+    global _era_dtype
+    if _era_dtype is None:
+        import pandas as pd
+        _era_dtype = pd.CategoricalDtype(era_labels(), ordered=True)
+    return _era_dtype
+
+def era_categorical(values):
+    """Returns ordered Categorical of given era labels, with categories in chart order.
+
+       Built from codes looked up in the precomputed era index, so no new
+       category list is sorted per call. Only eras present are kept as
+       categories (so filtered charts don't get empty slots); labels not
+       in the configuration come after the known eras, in order of
+       appearance.
+    """
+    import pandas as pd
+
+    dtype = era_dtype()
+    codes = dtype.categories.get_indexer(values)
+    if (codes < 0).any():
+        extra = list(dict.fromkeys(value for value, code in zip(values, codes) if code < 0 and pd.notna(value)))
+        if extra:
+            dtype = pd.CategoricalDtype(list(dtype.categories) + extra, ordered=True)
+            codes = dtype.categories.get_indexer(values)
+    return pd.Categorical.from_codes(codes, dtype=dtype).remove_unused_categories()
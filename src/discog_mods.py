@@ -4,14 +4,22 @@
 """
 
 import csv
+import os
 import re
+import shutil
+import zlib
+from datetime import datetime
 
 import pandas as pd
 import requests
 import sqlite3 as sql
 from parsel import Selector
 
+from . import config
 from . import genius_scrape
+from . import people
+from . import record_hashes
+from . import top_collaborators
 
 def drop_song(df, song_name, drop_duplicates=True):
     """Removes rows for given songs from discography dataframe.
@@ -46,7 +54,9 @@ def add_song(df, album_url, category, song_url):
 
        Data is collected using the given variables (album_url, category, and song_url),
        added to a temporary new dataframe before being concatenated to the original. This is
-       also used to add songs without albums (e.g. promo singles).
+       also used to add songs without albums (e.g. promo singles). The song
+       page is fetched once (through the scraper's page cache) and every
+       field is parsed from it, as in genius_scrape.scrape_songs.
     """
     album_checker = True if album_url == '' else False
     album_url_checker = 'NA' if album_checker == True else album_url
@@ -54,7 +64,7 @@ def add_song(df, album_url, category, song_url):
     album_page = 'NA' if album_checker == True else requests.get(album_url).text
     album_selector = 'NA' if album_checker == True else Selector(text=album_page)
 
-    song_page = requests.get(song_url).text
+    song_page = zlib.decompress(genius_scrape.song_fetch_page(song_url)).decode('utf-8')
     song_selector = Selector(text=song_page)
 
     album_title = 'NA' if album_url == '' else album_selector.xpath('//h1[contains(@class, "header_with_cover_art")]//text()').get()
@@ -63,14 +73,14 @@ def add_song(df, album_url, category, song_url):
     number_string = 'NA' if album_checker == True else song_selector.xpath('//div[contains(@class, "HeaderArtistAndTracklist")]/text()').get()
     number = 0 if album_checker == True else int(re.sub(r'\D','', number_string))
 
-    artists = genius_scrape.song_get_artists(song_url)
-    release_date, page_views = genius_scrape.song_get_metadata(song_url)
-    lyrics = genius_scrape.song_get_lyrics(song_url)
-    writers = genius_scrape.song_get_credits(song_url, 'writers')
-    producers = genius_scrape.song_get_credits(song_url, 'producers')
-    tags = genius_scrape.song_get_tags(song_url)
+    song = genius_scrape.song_parse_page(song_page)
+    release_date = genius_scrape.parse_release_dates([song['song_release_date']])[0]
+    page_views = int(genius_scrape.resolve_page_views([song['song_page_views']], [song['song_page_views_string']])[0])
 
-    new_row = [album_title, album_url_checker, category, number, song_title, song_url, artists, release_date, page_views, lyrics, writers, producers, tags]
+    new_row = [album_title, album_url_checker, category, number, song_title, song_url, song['song_artists'], release_date,
+               page_views, song['song_lyrics'], song['song_writers'], song['song_producers'], song['song_tags']]
+    if 'song_lyric_sections' in df.columns:
+        new_row.append(song['song_lyric_sections'])
     new_df = pd.DataFrame([new_row], columns=df.columns)
     df = pd.concat([df, new_df], ignore_index=True)
     return df
@@ -95,46 +105,298 @@ def change_credit_name(series, old_name, new_name):
     series = series.apply(lambda list: [new_name if string == old_name else string for string in list])
     return series
 
-def convert_to_db(df, db_name):
-    """Converts discography dataframe to a SQLite database.
+def change_credit_names_from_file(df, csv_name):
+    """Changes names of individuals in all song credits at once from given CSV file.
 
-       By default makes six tables (albums, songs, artists, writers,
-       producers, tags), replacing them if they already exist.
+       CSV maps each alias to its canonical name; all aliases are merged in
+       one pass over song_artists, song_writers, and song_producers.
     """
+    aliases = people.load_aliases(csv_name)
+    registry = people.create_registry(df, aliases=aliases)
+    df = people.apply_aliases(df, registry)
+    return df
+
+def convert_to_db(df, db_name, incremental=True):
+    """Converts discography dataframe to a SQLite database, returning changelog of what changed.
+
+       By default makes eleven tables (albums, eras, songs, artists, writers,
+       producers, tags, lyric_sections, lyric_lines, song_lines,
+       collaborator_counts), indexed for the app's filtered queries, plus a
+       lyrics view joining the lyric tables back into one row per line and
+       a changelog table. The
+       database is built in a separate file next to db_name, checked, and
+       then swapped in with an atomic rename, so readers of the live
+       database never see a half-built version.
+
+       Songs store one content hash per field group (see record_hashes).
+       If the existing database has the same table layout and incremental
+       is True, it is copied and only songs whose hashes changed are
+       rewritten, in just the tables of the groups that changed.
+    """
+    df = record_hashes.add_record_hashes(fill_lyric_sections(df))
+    tables = db_tables(df)
+
+    temp_name = '{}.building'.format(db_name)
+    if os.path.exists(temp_name):
+        os.remove(temp_name)
+
+    old_songs, old_changelog, same_layout = read_db_state(db_name, tables)
+    if old_songs is None:
+        changelog = record_hashes.diff_records(tables['songs'].iloc[0:0], tables['songs'])
+    else:
+        changelog = record_hashes.diff_records(old_songs, tables['songs'])
+    incremental = incremental and same_layout
+
+    if incremental:
+        shutil.copyfile(db_name, temp_name)
+    connection = sql.connect(temp_name)
+    try:
+        if incremental:
+            update_db_tables(tables, changelog, connection)
+        else:
+            write_db_tables(tables, connection)
+            if old_changelog is not None:
+                old_changelog.to_sql('changelog', connection, if_exists='replace', index=False)
+        write_changelog(changelog, connection)
+        connection.commit()
+        validate_db(connection, {name: len(table) for name, table in tables.items()})
+    except Exception:
+        connection.close()
+        os.remove(temp_name)
+        raise
+    connection.close()
+
+    os.replace(temp_name, db_name)
+    return changelog
+
+def read_db_state(db_name, tables):
+    """Returns (song hashes, changelog, same layout as tables) of existing database.
+
+       Song hashes and changelog are None if the database (or the table)
+       doesn't exist or predates content hashes.
+    """
+    if not os.path.exists(db_name):
+        return None, None, False
+
     connection = sql.connect(db_name)
+    existing = {name: [row[1] for row in connection.execute('PRAGMA table_info("{}")'.format(name))]
+                for name in tables}
+    same_layout = all(existing[name] == list(table.columns) for name, table in tables.items())
+
+    songs = None
+    if set(record_hashes.hash_columns) <= set(existing['songs']):
+        songs = pd.read_sql('SELECT song_url, song_title, {} FROM songs'.format(', '.join(record_hashes.hash_columns)),
+                            connection)
+    has_changelog = connection.execute("SELECT name FROM sqlite_master WHERE name = 'changelog'").fetchone()
+    changelog = pd.read_sql('SELECT * FROM changelog', connection) if has_changelog else None
+    connection.close()
+    return songs, changelog, same_layout and songs is not None and changelog is not None
+
+def write_changelog(changelog, connection):
+    """Appends given changes to the database's changelog table, stamped with the build time."""
+    connection.execute('''CREATE TABLE IF NOT EXISTS changelog (
+        built_at TEXT, song_url TEXT, song_title TEXT, change TEXT, groups TEXT)''')
+    built_at = datetime.now().isoformat(timespec='seconds')
+    connection.executemany('INSERT INTO changelog VALUES (?, ?, ?, ?, ?)',
+                           [(built_at,) + tuple(row) for row in changelog.itertuples(index=False)])
+
+# Tables holding each field group's rows (beyond songs itself), keyed by song_title
+group_tables = {'credits': ['artists', 'writers', 'producers', 'collaborator_counts'],
+                'tags': ['tags'],
+                'lyrics': ['lyric_sections', 'lyric_lines', 'song_lines']}
+
+# Tables numbered or counted across songs (section and line IDs, collaborator
+# counts), so rewritten in full when their group changes
+whole_tables = ['lyric_sections', 'lyric_lines', 'song_lines', 'collaborator_counts']
+
+def update_db_tables(tables, changelog, connection):
+    """Rewrites only the changed songs' rows in an existing database.
+
+       Albums, eras, and views are small and always rewritten. Song rows are
+       replaced by song_url; rows in other tables are replaced by song
+       title, and only in the tables of field groups that changed (a
+       changed title counts as a change to every group).
+    """
+    for name in ['albums', 'eras']:
+        connection.execute('DELETE FROM "{}"'.format(name))
+        tables[name].to_sql(name, connection, if_exists='append', index=False)
+    # Views hold no data, so they're recreated in case their definitions changed
+    for (name,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'view'").fetchall():
+        connection.execute('DROP VIEW "{}"'.format(name))
+    for statement in db_views:
+        connection.execute(statement)
+    if len(changelog) == 0:
+        return
+
+    urls = list(changelog['song_url'])
+    old_titles = {}
+    for url in urls:
+        for (title,) in connection.execute('SELECT song_title FROM songs WHERE song_url = ?', (url,)):
+            old_titles[url] = title
+    connection.executemany('DELETE FROM songs WHERE song_url = ?', [(url,) for url in urls])
+    songs = tables['songs']
+    songs[songs['song_url'].isin(urls)].to_sql('songs', connection, if_exists='append', index=False)
+
+    for group, names in group_tables.items():
+        touched = changelog[changelog['groups'].str.contains(group) | changelog['groups'].str.contains('metadata')]
+        titles = set(touched['song_title']) | {old_titles[url] for url in touched['song_url'] if url in old_titles}
+        if not titles:
+            continue
+        for name in names:
+            table = tables[name]
+            if name in whole_tables:
+                connection.execute('DELETE FROM "{}"'.format(name))
+                table.to_sql(name, connection, if_exists='append', index=False)
+                continue
+            connection.executemany('DELETE FROM "{}" WHERE song_title = ?'.format(name), [(title,) for title in titles])
+            table[table['song_title'].isin(titles)].to_sql(name, connection, if_exists='append', index=False)
+    connection.execute('ANALYZE')
+
+def db_tables(df):
+    """Returns {table name: dataframe} of discography database tables."""
+    tables = {}
 
     albums = df[['album_title','album_url', 'category']].drop_duplicates(subset=['album_title','album_url'])
     albums.reset_index(inplace=True, drop=True)
-    albums.to_sql('albums', connection, if_exists='replace', index=False)
+    tables['albums'] = albums
+
+    tables['eras'] = era_table(albums['category'])
     
-    songs = df[['song_title','album_title', 'album_track_number', 'song_url', 'song_release_date', 'song_page_views']]
+    songs = df[['song_title','album_title', 'album_track_number', 'song_url', 'song_release_date', 'song_page_views']
+               + record_hashes.hash_columns].copy()
     songs.reset_index(inplace=True, drop=True)
-    songs.to_sql('songs', connection, if_exists='replace', index=False)
+    # Release date is stored once as a plain date, with its parts precomputed
+    # so queries don't need strftime on every row
+    release_dates = pd.to_datetime(songs['song_release_date'])
+    songs['song_release_date'] = release_dates.dt.strftime('%Y-%m-%d')
+    songs['release_year'] = release_dates.dt.year.astype('Int64')
+    songs['release_month'] = release_dates.dt.month.astype('Int64')
+    songs['release_day'] = release_dates.dt.day.astype('Int64')
+    songs['release_weekday'] = release_dates.dt.weekday.astype('Int64')
+    tables['songs'] = songs
 
     artists = df[['song_title', 'song_artists']].explode(['song_artists'])
     artists.rename(columns={'song_artists': 'song_artist'}, inplace=True)
     artists.reset_index(inplace=True, drop=True)
-    artists.to_sql('artists', connection, if_exists='replace', index=False)
+    tables['artists'] = artists
     
     writers = df[['song_title', 'song_writers']].explode(['song_writers'])
     writers.rename(columns={'song_writers': 'song_writer'}, inplace=True)
     writers.reset_index(inplace=True, drop=True)
-    writers.to_sql('writers', connection, if_exists='replace', index=False)
+    tables['writers'] = writers
     
     producers = df[['song_title', 'song_producers']].explode(['song_producers'])
     producers.rename(columns={'song_producers': 'song_producer'}, inplace=True)
     producers.reset_index(inplace=True, drop=True)
-    producers.to_sql('producers', connection, if_exists='replace', index=False)
+    tables['producers'] = producers
     
     tags = df[['song_title', 'song_tags']].explode(['song_tags'])
     tags.rename(columns={'song_tags': 'song_tag'}, inplace=True)
     tags.reset_index(inplace=True, drop=True)
-    tags.to_sql('tags', connection, if_exists='replace', index=False)
-
-    lyrics = df[['song_title', 'song_lyrics']].copy()
-    lyrics['lyric_order'] = df['song_lyrics'].apply(lambda lyrics: [index + 1 for index, _ in enumerate(lyrics)])
-    lyrics = lyrics.explode(['song_lyrics', 'lyric_order'])
-    lyrics.rename(columns={'song_lyrics': 'song_lyric'}, inplace=True)
-    lyrics.reset_index(inplace=True, drop=True)
-    lyrics.to_sql('lyrics', connection, if_exists='replace', index=False)
-    connection.close()
\ No newline at end of file
+    tables['tags'] = tags
+
+    tables.update(lyric_tables(df))
+    tables['collaborator_counts'] = top_collaborators.count_table(tables)
+    return tables
+
+def fill_lyric_sections(df):
+    """Returns copy of discography dataframe with lyric sections for every song.
+
+       Songs scraped before sections were kept (or added without them) get
+       one header-less section holding all their lyrics.
+    """
+    df = df.copy()
+    if 'song_lyric_sections' not in df.columns:
+        df['song_lyric_sections'] = None
+    missing = df['song_lyric_sections'].isna()
+    df.loc[missing, 'song_lyric_sections'] = pd.Series([[{'section': None, 'performer': None, 'lines': list(lyrics)}]
+                                                        for lyrics in df.loc[missing, 'song_lyrics']],
+                                                       index=df.index[missing], dtype='object')
+    return df
+
+def lyric_tables(df):
+    """Returns {table name: dataframe} of lyric tables of discography dataframe (with lyric sections).
+
+       lyric_sections holds one row per section (type, number, and
+       performer parsed from its header), lyric_lines holds each distinct
+       line once, and song_lines lists every song's lines in order as
+       (section_id, lyric_order, line_id), so repeated lines like choruses
+       are stored as integers only.
+    """
+    songs = df[['song_title', 'song_lyric_sections']].reset_index(drop=True)
+    sections = songs.explode('song_lyric_sections').dropna(subset=['song_lyric_sections'])
+    sections = pd.concat([sections[['song_title']],
+                          pd.DataFrame(list(sections['song_lyric_sections']), index=sections.index)], axis=1)
+    sections['section_id'] = range(1, len(sections) + 1)
+    sections['section_order'] = sections.groupby(level=0).cumcount() + 1
+    parts = sections['section'].str.extract(r'^(.*?)(?:\s+(\d+))?$')
+    sections['section_type'] = parts[0]
+    sections['section_number'] = pd.to_numeric(parts[1]).astype('Int64')
+
+    lines = sections[['section_id', 'lines']].explode('lines').dropna(subset=['lines'])
+    lines['lyric_order'] = lines.groupby(level=0).cumcount() + 1
+    line_ids, distinct_lines = pd.factorize(lines['lines'])
+    lines['line_id'] = line_ids + 1
+
+    tables = {}
+    tables['lyric_sections'] = sections[['section_id', 'song_title', 'section_order', 'section_type', 'section_number',
+                                         'performer']].reset_index(drop=True)
+    tables['lyric_lines'] = pd.DataFrame({'line_id': range(1, len(distinct_lines) + 1), 'song_lyric': distinct_lines})
+    tables['song_lines'] = lines[['section_id', 'lyric_order', 'line_id']].reset_index(drop=True)
+    return tables
+
+def write_db_tables(tables, connection):
+    """Writes given discography tables to connection, replacing any existing ones."""
+    column_types = {'songs': {'song_release_date': 'DATE'}}
+    for name, table in tables.items():
+        table.to_sql(name, connection, if_exists='replace', index=False, dtype=column_types.get(name))
+    for statement in db_indexes + db_views:
+        connection.execute(statement)
+    connection.execute('ANALYZE')
+
+def era_table(categories):
+    """Returns eras lookup table (category, era label, era_order, classification) for given album categories.
+
+       Order, labels, and classifications follow data/discography.toml (see
+       config); categories missing from it are placed after the known eras
+       in order of appearance.
+    """
+    ordered = sorted(dict.fromkeys(categories), key=config.era_position)
+
+    eras = pd.DataFrame({'category': ordered,
+                         'era': [config.era_label(category) for category in ordered],
+                         'era_order': range(1, len(ordered) + 1),
+                         'classification': [config.era_classification(category) for category in ordered]})
+    return eras
+
+# Indexes used by the app's era/role filtered queries (joins on category and song title)
+db_indexes = ['CREATE UNIQUE INDEX eras_category ON eras (category)',
+              'CREATE INDEX albums_category ON albums (category, album_title)',
+              'CREATE INDEX songs_album ON songs (album_title)',
+              'CREATE INDEX artists_song ON artists (song_title)',
+              'CREATE INDEX writers_song ON writers (song_title)',
+              'CREATE INDEX producers_song ON producers (song_title)',
+              'CREATE INDEX tags_song ON tags (song_title)',
+              'CREATE INDEX lyric_sections_song ON lyric_sections (song_title, section_order)',
+              'CREATE INDEX song_lines_section ON song_lines (section_id, lyric_order)',
+              'CREATE UNIQUE INDEX lyric_lines_id ON lyric_lines (line_id)',
+              'CREATE INDEX collaborator_counts_category ON collaborator_counts (category, role_mask)']
+
+# One row per song line, as the lyrics table was before lines were deduplicated
+db_views = ['''CREATE VIEW lyrics AS
+               SELECT lyric_sections.song_title, lyric_lines.song_lyric, lyric_sections.section_order,
+                      song_lines.lyric_order, lyric_sections.section_type, lyric_sections.section_number, lyric_sections.performer
+               FROM song_lines
+               JOIN lyric_sections ON lyric_sections.section_id = song_lines.section_id
+               JOIN lyric_lines ON lyric_lines.line_id = song_lines.line_id''']
+
+def validate_db(connection, expected_rows):
+    """Checks database integrity and table row counts, raising ValueError on mismatch."""
+    integrity = connection.execute('PRAGMA integrity_check').fetchone()[0]
+    if integrity != 'ok':
+        raise ValueError('Database failed integrity check: {}'.format(integrity))
+
+    for table, expected in expected_rows.items():
+        count = connection.execute('SELECT COUNT(*) FROM "{}"'.format(table)).fetchone()[0]
+        if count != expected:
+            raise ValueError('Table {} has {} rows, expected {}'.format(table, count, expected))
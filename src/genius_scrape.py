@@ -1,8 +1,15 @@
 """Functions breaking down the webbscraping process to format resulting dataframe."""
 
 import csv
+import hashlib
+import json
+import os
 import re
-from datetime import datetime
+import threading
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from urllib.parse import urljoin
 
 import pandas as pd
 import requests
@@ -35,43 +42,104 @@ def album_clean_titles(album_list):
         cleaned.append(title)
     return cleaned
 
-def album_get_tracklist(album_url):
+# Album tracklists are cached here per album URL, with the response's
+# validators, so unchanged albums cost one conditional request on re-scrape
+album_cache_dir = 'data/cache/albums'
+
+def clean_track_title(title):
+    """Removes line breaks, zero-width and non-breaking spaces from given track title."""
+    title = re.sub(r'\n|\u200b', '', title)
+    title = re.sub(r'\xa0', ' ', title)
+    return title.strip()
+
+def album_parse_tracklist(album_page):
+    """Returns (tracklist, next page URL or None) of given Genius album page HTML.
+
+       Each chart row is parsed on its own, so a row without a track
+       number (e.g. an unnumbered bonus track) gets None instead of
+       shifting the numbers of every row after it.
+    """
+    selector = Selector(text=album_page)
+    rows = selector.xpath('//div[contains(concat(" ", normalize-space(@class), " "), " chart_row ")]')
+
+    tracklist = []
+    for row in rows:
+        url = row.xpath('.//div[@class="chart_row-content"]/a/@href').get()
+        title = clean_track_title(''.join(row.xpath('.//div[@class="chart_row-content"]/a/h3/text()').getall()))
+        if url is None or title == '':
+            continue
+        number = row.xpath('.//div[contains(@class,"chart_row-number_container")]/span/span/text()').get()
+        number = number.strip() if number and number.strip() else None
+        tracklist.append({'album_track_number': number,
+                          'song_title': title,
+                          'song_url': url})
+
+    next_page = selector.xpath('//a[@rel="next"]/@href | //a[contains(@class,"next_page")]/@href').get()
+    return tracklist, next_page
+
+def _album_cache_file(album_url, cache_dir):
+    name = hashlib.sha1(album_url.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, '{}.json'.format(name))
+
+def _fetch_album_page(session, page_url, cached):
+    """Returns (page HTML or None if unchanged, response validators)."""
+    headers = {}
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
+    response = session.get(page_url, headers=headers)
+    if response.status_code == 304:
+        return None, cached
+    response.raise_for_status()
+    return response.text, {'etag': response.headers.get('ETag'),
+                           'last_modified': response.headers.get('Last-Modified')}
+
+def album_get_tracklist(album_url, session=None, cache_dir=album_cache_dir):
     """Returns tracklist of given Genius album URL.
 
       Includes track number, song title, and link to the lyrics page
-      for each song.
+      for each song. Follows the album's next-page links, so long
+      (e.g. deluxe) tracklists split over several pages are complete.
+      If cache_dir is set, the tracklist is reused when Genius reports
+      the album's first page unchanged (ETag/Last-Modified).
    """
-    album_page = requests.get(album_url).text
-    selector = Selector(text=album_page)
-    
-    number = selector.xpath(
-        '//div[@class="chart_row-number_container chart_row-number_container--align_left"]/span/span/text()'
-    ).getall()
-    track = selector.xpath('//div[@class="chart_row-content"]/a/h3/text()').getall()
-    url = selector.xpath('//div[@class="chart_row-content"]/a/@href').getall()
-    clean_track = []
-    
-    for title in track:
-        title = re.sub(r'\n|\u200b', '', title)
-        title = re.sub(r'\xa0', ' ', title)
-        title = title.strip()
-        if title != '':
-            clean_track.append(title)
-
-    tracklist = [{'album_track_number': number,
-            'song_title': title,
-            'song_url': url} for number, title, url in zip(number, clean_track, url)]
+    session = session or requests.Session()
+    cache_file = _album_cache_file(album_url, cache_dir) if cache_dir else None
+    cached = None
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file, 'r') as file:
+            cached = json.load(file)
+
+    album_page, validators = _fetch_album_page(session, album_url, cached)
+    if album_page is None:
+        return cached['tracklist']
+
+    tracklist = []
+    seen_pages = {album_url}
+    while True:
+        page_tracks, next_page = album_parse_tracklist(album_page)
+        tracklist.extend(page_tracks)
+        if next_page is None:
+            break
+        next_page = urljoin(album_url, next_page)
+        if next_page in seen_pages:
+            break
+        seen_pages.add(next_page)
+        album_page = session.get(next_page).text
+
+    if cache_file:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_file, 'w') as file:
+            json.dump(dict(validators, album_url=album_url, tracklist=tracklist), file)
     return tracklist
 
-def song_get_artists(song_url):
-    """Returns artist(s)/performer(s) of given Genius song URL.
+def song_parse_artists(selector):
+    """Returns artist(s)/performer(s) from given song page selector.
 
        Also checks if there's a feature on the song; if yes, the featured
        artist/performer is included.
     """
-    song_page = requests.get(song_url).text
-    selector = Selector(text=song_page)
-
     raw_artists = selector.xpath('//div[contains(@class,"HeaderArtistAndTracklistdesktop__ListArtists")]/span/span//text()').get()
     artists = re.split(r',\s|\s&\s', raw_artists)
 
@@ -83,58 +151,199 @@ def song_get_artists(song_url):
         artists.extend(feat)
     return artists
 
-def song_get_metadata(song_url):
-    """Returns song release date and page views of Given song URL."""
+def song_get_artists(song_url):
+    """Returns artist(s)/performer(s) of given Genius song URL."""
     song_page = requests.get(song_url).text
-    selector = Selector(text=song_page)
+    return song_parse_artists(Selector(text=song_page))
+
+def parse_release_dates(date_strings):
+    """Returns datetime series parsed from list of Genius date strings in one vectorized pass.
+
+       Handles full dates ('Oct 27, 2014') and bare years ('2014'); missing
+       or unparseable dates become NaT.
+    """
+    dates = pd.Series(date_strings, dtype='object').str.replace(r'[^\w\s]+', '', regex=True)
+    parsed = pd.to_datetime(dates, format='%b %d %Y', errors='coerce')
+    years = pd.to_datetime(dates, format='%Y', errors='coerce')
+    return parsed.fillna(years)
+
+view_multipliers = {'': 1, 'K': 1000, 'M': 1000000, 'B': 1000000000}
+
+def _view_parts(view_strings):
+    # Number and suffix of each view string ('1.2M viewers', '950 viewers', '12,345')
+    strings = pd.Series(view_strings, dtype='object').astype('string')
+    parts = strings.str.replace(',', '', regex=False).str.extract(r'^\s*(\d+(?:\.(\d+))?)\s*([KMB]?)\b', flags=re.I)
+    numbers = pd.to_numeric(parts[0], errors='coerce')
+    multipliers = parts[2].str.upper().map(view_multipliers)
+    decimals = parts[1].str.len().fillna(0)
+    return numbers, multipliers, decimals
+
+def parse_page_views(view_strings):
+    """Returns integer series of page views parsed from list of Genius view strings in one vectorized pass.
+
+       Handles plain counts ('950 viewers', '12,345') and abbreviated ones
+       ('1.2M viewers', '48K'); missing or unparseable strings become NA.
+    """
+    numbers, multipliers, _ = _view_parts(view_strings)
+    return (numbers * multipliers).round().astype('Int64')
+
+def page_view_precision(view_strings):
+    """Returns series of how far the true count may be from each parsed view string ('1.2M' is only good to 100,000)."""
+    _, multipliers, decimals = _view_parts(view_strings)
+    return multipliers / 10 ** decimals
+
+def _page_state(selector):
+    # The page's embedded JSON: the preloaded state of current pages, or the
+    # page_data meta tag of older ones
+    script = selector.xpath('//script[contains(text(), "__PRELOADED_STATE__")]/text()').get()
+    literal = re.search(r"JSON\.parse\('((?:[^'\\]|\\.)*)'\)", script or '')
+    try:
+        if literal:
+            return json.loads(json.loads('"{}"'.format(literal.group(1).replace("\\'", "'"))))
+        page_data = selector.xpath('//meta[@itemprop="page_data"]/@content').get()
+        return json.loads(page_data) if page_data else None
+    except ValueError:
+        return None
+
+def song_parse_exact_views(selector):
+    """Returns exact page views from the structured data of given song page selector, or None if not there."""
+    state = _page_state(selector)
+    if not isinstance(state, dict):
+        return None
+    if 'songPage' in state:
+        song_id = state['songPage'].get('song')
+        song = state.get('entities', {}).get('songs', {}).get(str(song_id), {})
+    else:
+        song = state.get('song') or {}
+    views = (song.get('stats') or {}).get('pageviews')
+    return int(views) if isinstance(views, (int, float)) else None
+
+def song_parse_metadata(selector, parse_date=True, parse_views=True):
+    """Returns song release date and page views from given song page selector.
+
+       Views are the exact count from the page's structured data where
+       there is one, otherwise parsed from the displayed view string (0 if
+       the page shows none). If parse_date is False, the raw date string is
+       returned instead so a batch of them can be parsed at once with
+       parse_release_dates; likewise, if parse_views is False, views are
+       returned as (exact count or None, raw view string or None) for
+       resolve_page_views.
+    """
     metadata = selector.xpath('//div[contains(@class,"MetadataStats__Container")]/span/span/text()').getall()
 
     date_check = len(metadata) >= 1 and 'viewer' not in metadata[0]
     
-    if date_check == True:
+    if date_check == True and not parse_date:
+        date = metadata[0]
+    elif date_check == True:
         date_string = metadata[0]
         date_string = re.sub(r'[^\w\s]+','', date_string)
         date = datetime.strptime(date_string, '%b %d %Y') if len(date_string) > 4 else datetime.strptime(date_string, '%Y')
     else:
         date = None
 
-    if len(metadata) == 3:
-        views_string = metadata[2]
-        views_string = views_string.split(' ')[0]
-        multiplier = int
-        match views_string[-1]:
-            case 'M':
-                multiplier = 1000000
-            case 'K':
-                multiplier = 1000
-            case _:
-                multiplier = 1
-        views = int(float(views_string[0:len(views_string)-1]) * multiplier)
-    else:
-        views = 0
-    return date, views
+    views_string = next((string.strip() for string in metadata if 'viewer' in string), None)
+    exact_views = song_parse_exact_views(selector)
+    if not parse_views:
+        return date, (exact_views, views_string)
+    return date, int(resolve_page_views([exact_views], [views_string])[0])
 
-def song_get_lyrics(song_url):
-    """Returns list of lyrics of given Genius song URL."""
+def resolve_page_views(exact_views, view_strings):
+    """Returns integer series of page views: the exact count where given, otherwise the parsed view string, otherwise 0."""
+    exact = pd.Series(exact_views, dtype='object').astype('Int64')
+    return exact.fillna(parse_page_views(view_strings)).fillna(0).astype('int64')
+
+def page_views_report(song_urls, exact_views, view_strings, outlier_ratio=50):
+    """Returns dataframe of songs whose page views look suspicious, for review after a scrape.
+
+       Columns: song_url, views (as resolved), exact_views, view_string,
+       and issue, one of:
+           missing: no count in the page data and no view string (views set to 0)
+           unparsed: a view string that couldn't be parsed (views set to 0)
+           mismatch: the exact count is outside the rounding of the view string
+           outlier: more than outlier_ratio times above or below the median song
+    """
+    report = pd.DataFrame({'song_url': song_urls,
+                           'views': resolve_page_views(exact_views, view_strings),
+                           'exact_views': pd.Series(exact_views, dtype='object').astype('Int64'),
+                           'view_string': pd.Series(view_strings, dtype='object')})
+    parsed = parse_page_views(view_strings)
+    precision = page_view_precision(view_strings)
+    median = report['views'][report['views'] > 0].median()
+
+    issues = pd.Series(None, index=report.index, dtype='object')
+    ratio = report['views'] / median
+    issues[(ratio > outlier_ratio) | ((ratio < 1 / outlier_ratio) & (ratio > 0))] = 'outlier'
+    issues[((report['exact_views'] - parsed).abs() >= precision).fillna(False)] = 'mismatch'
+    issues[report['exact_views'].isna() & report['view_string'].isna()] = 'missing'
+    issues[report['exact_views'].isna() & report['view_string'].notna() & parsed.isna()] = 'unparsed'
+    report['issue'] = issues
+    return report[report['issue'].notna()].reset_index(drop=True)
+
+def song_get_metadata(song_url, parse_date=True):
+    """Returns song release date and page views of Given song URL (see song_parse_metadata)."""
     song_page = requests.get(song_url).text
-    selector = Selector(text=song_page)
+    return song_parse_metadata(Selector(text=song_page), parse_date)
+
+def song_parse_lyric_sections(selector):
+    """Returns list of lyric sections from given song page selector.
 
+       Each section is a dictionary of its header name (e.g. 'Verse 1', or
+       None for lines before the first header), performer(s) named in the
+       header (or None), and its lines. Headers split over several text
+       nodes (e.g. a linked performer name) are joined back together.
+    """
     raw_lyrics = selector.xpath('//div[@data-lyrics-container="true"]//text()').getall()
-    lyrics_list = [re.sub(r'\u2005', ' ', lyric) for lyric in raw_lyrics]
-    brackets = re.compile(r'\[.*?\]')
-    lyrics = [lyric for lyric in lyrics_list if bool(brackets.match(lyric)) == False]
-    return lyrics
+    sections = []
+    current = {'section': None, 'performer': None, 'lines': []}
+    header = None
+    for lyric in raw_lyrics:
+        lyric = re.sub(r'\u2005', ' ', lyric)
+        if header is None and lyric.startswith('['):
+            header = ''
+        if header is None:
+            current['lines'].append(lyric)
+            continue
 
-def song_get_tags(song_url):
-    """Returns genre tags of given Genius song URL."""
+        header += lyric
+        if ']' not in lyric:
+            continue
+        if current['lines'] or current['section'] is not None:
+            sections.append(current)
+        header = header.strip()
+        name, _, performer = header[1:header.index(']')].partition(':')
+        current = {'section': name.strip(), 'performer': performer.strip() or None, 'lines': []}
+        header = None
+    if current['lines'] or current['section'] is not None:
+        sections.append(current)
+    return sections
+
+def song_parse_lyrics(selector):
+    """Returns list of lyrics (section headers left out) from given song page selector."""
+    return [line for section in song_parse_lyric_sections(selector) for line in section['lines']]
+
+def song_get_lyrics(song_url):
+    """Returns list of lyrics of given Genius song URL."""
     song_page = requests.get(song_url).text
-    selector = Selector(text=song_page)
+    return song_parse_lyrics(Selector(text=song_page))
 
+def song_get_lyric_sections(song_url):
+    """Returns list of lyric sections of given Genius song URL (see song_parse_lyric_sections)."""
+    song_page = requests.get(song_url).text
+    return song_parse_lyric_sections(Selector(text=song_page))
+
+def song_parse_tags(selector):
+    """Returns genre tags from given song page selector."""
     tags = selector.xpath('//div[@class="SongTags__Container-xixwg3-1 bZsZHM"]//text()').getall()
     return tags
 
-def song_get_credits(song_url, credit):
-    """Returns list of writers/producers of given Genius song URL.
+def song_get_tags(song_url):
+    """Returns genre tags of given Genius song URL."""
+    song_page = requests.get(song_url).text
+    return song_parse_tags(Selector(text=song_page))
+
+def song_parse_credits(selector, credit):
+    """Returns list of writers/producers from given song page selector.
 
        Variable 'credit' has to be either 'producers' or 'writers' and will
        return list of names.
@@ -144,8 +353,6 @@ def song_get_credits(song_url, credit):
     if credit == 'producers':
         query = ['Producer', 'Producers']
     
-    song_page = requests.get(song_url).text
-    selector = Selector(text=song_page)
     div_path = '//div[contains(@class,"SongInfo__Credit")]/div[preceding-sibling::div[contains(@class,"SongInfo__Label") and text()="{}"]]//text()'
     
     raw_list = selector.xpath(div_path.format(query[0])).getall()
@@ -156,37 +363,149 @@ def song_get_credits(song_url, credit):
     credits = [name for name in raw_list if name not in dropped]
     return credits
 
-def create_discography(artist, albums_dict):
-    """Compiles all webscraping data into one discography dataframe."""
+def song_get_credits(song_url, credit):
+    """Returns list of writers/producers of given Genius song URL (see song_parse_credits)."""
+    song_page = requests.get(song_url).text
+    return song_parse_credits(Selector(text=song_page), credit)
+
+def song_parse_page(song_page):
+    """Returns dictionary of every song field parsed from given song page HTML.
+
+       The page is parsed once for all fields; the release date is left as
+       the raw string, for parse_release_dates, and page views as the exact
+       count (or None) plus the raw view string, for resolve_page_views.
+    """
+    selector = Selector(text=song_page)
+    release_date, (page_views, views_string) = song_parse_metadata(selector, parse_date=False, parse_views=False)
+    lyric_sections = song_parse_lyric_sections(selector)
+    return {'song_artists': song_parse_artists(selector),
+            'song_release_date': release_date,
+            'song_page_views': page_views,
+            'song_page_views_string': views_string,
+            'song_lyrics': [line for section in lyric_sections for line in section['lines']],
+            'song_lyric_sections': lyric_sections,
+            'song_writers': song_parse_credits(selector, 'writers'),
+            'song_producers': song_parse_credits(selector, 'producers'),
+            'song_tags': song_parse_tags(selector)}
+
+def song_parse_compressed(compressed_page):
+    """Returns song_parse_page of zlib-compressed page HTML (what parser worker processes receive)."""
+    return song_parse_page(zlib.decompress(compressed_page).decode('utf-8'))
+
+# Song pages are cached here zlib-compressed, one file per song URL, and
+# reused while younger than song_cache_max_age (views go stale after that)
+song_cache_dir = 'data/cache/songs'
+song_cache_max_age = timedelta(days=1)
+
+_thread_state = threading.local()
+
+def _thread_session():
+    # requests sessions aren't thread-safe, so each fetch thread keeps its own
+    if not hasattr(_thread_state, 'session'):
+        _thread_state.session = requests.Session()
+    return _thread_state.session
+
+def _song_cache_file(song_url, cache_dir):
+    name = hashlib.sha1(song_url.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, '{}.html.z'.format(name))
+
+def song_fetch_page(song_url, cache_dir=song_cache_dir, max_age=song_cache_max_age):
+    """Returns zlib-compressed HTML of given Genius song URL.
+
+       If cache_dir is set, a cached page no older than max_age (None for
+       any age) is returned without a request, and fetched pages are
+       cached.
+    """
+    cache_file = _song_cache_file(song_url, cache_dir) if cache_dir else None
+    if cache_file and os.path.exists(cache_file):
+        age = datetime.now() - datetime.fromtimestamp(os.path.getmtime(cache_file))
+        if max_age is None or age <= max_age:
+            with open(cache_file, 'rb') as file:
+                return file.read()
+
+    response = _thread_session().get(song_url)
+    response.raise_for_status()
+    compressed_page = zlib.compress(response.text.encode('utf-8'))
+    if cache_file:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_file = '{}.{}.tmp'.format(cache_file, threading.get_ident())
+        with open(temp_file, 'wb') as file:
+            file.write(compressed_page)
+        os.replace(temp_file, cache_file)
+    return compressed_page
+
+def scrape_songs(song_urls, fetch_workers=8, parse_workers=None, max_pending=None,
+                 cache_dir=song_cache_dir, max_age=song_cache_max_age):
+    """Returns list of song_parse_page dictionaries of given Genius song URLs, in the same order.
+
+       Pages are fetched by fetch_workers threads and passed, still
+       compressed, to parse_workers processes (default: one per core), so
+       parsing isn't held back by the GIL. At most max_pending pages
+       (default: two per parser) are fetched or waiting for a parser at
+       once; fetching pauses until the parsers catch up.
+    """
+    parse_workers = parse_workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * parse_workers
+    results = [None] * len(song_urls)
+    queued = iter(enumerate(song_urls))
+
+    with ThreadPoolExecutor(fetch_workers) as fetchers, ProcessPoolExecutor(parse_workers) as parsers:
+        fetching = {}
+        parsing = {}
+
+        def fill():
+            while len(fetching) < fetch_workers and len(fetching) + len(parsing) < max_pending:
+                item = next(queued, None)
+                if item is None:
+                    return
+                index, song_url = item
+                fetching[fetchers.submit(song_fetch_page, song_url, cache_dir, max_age)] = index
+
+        fill()
+        while fetching or parsing:
+            done, _ = wait(list(fetching) + list(parsing), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in fetching:
+                    index = fetching.pop(future)
+                    parsing[parsers.submit(song_parse_compressed, future.result())] = index
+                else:
+                    results[parsing.pop(future)] = future.result()
+            fill()
+    return results
+
+def create_discography(artist, albums_dict, fetch_workers=8, parse_workers=None, views_report=None):
+    """Compiles all webscraping data into one discography dataframe.
+
+       Song pages are fetched and parsed in parallel (see scrape_songs).
+       If views_report is a file name, the page_views_report of the scrape
+       is written there as CSV.
+    """
     albums = list(albums_dict.keys())
     eras = list(albums_dict.values())
     cleaned_albums = album_clean_titles(albums)
     cleaned_artist = artist_clean_name(artist)
     album_urls = ['https://genius.com/albums/{}/{}'.format(cleaned_artist, title) for title in cleaned_albums]
 
-    tracklists = [album_get_tracklist(url) for url in album_urls]
+    session = requests.Session()
+    tracklists = [album_get_tracklist(url, session) for url in album_urls]
 
     song_urls = [track['song_url'] for list in tracklists for track in list]
 
-    song_artists = [song_get_artists(song) for song in song_urls]
-    song_metadata = [song_get_metadata(song) for song in song_urls]
-    song_release_date, song_page_views = [list(field) for field in list(zip(*song_metadata))]
-    song_lyrics = [song_get_lyrics(song) for song in song_urls]
-    song_writers = [song_get_credits(song, 'writers') for song in song_urls]
-    song_producers = [song_get_credits(song, 'producers') for song in song_urls]
-    song_tags = [song_get_tags(song) for song in song_urls]
+    song_pages = scrape_songs(song_urls, fetch_workers, parse_workers)
+    song_release_date = list(parse_release_dates([page['song_release_date'] for page in song_pages]))
+    exact_views = [page.pop('song_page_views') for page in song_pages]
+    view_strings = [page.pop('song_page_views_string') for page in song_pages]
+    song_page_views = list(resolve_page_views(exact_views, view_strings))
+    if views_report:
+        page_views_report(song_urls, exact_views, view_strings).to_csv(views_report, index=False)
 
     list_index = 0
 
     for album in tracklists:
         for track in album:
-            track.update({'song_artists':song_artists[list_index],
-                          'song_release_date':song_release_date[list_index],
-                          'song_page_views':song_page_views[list_index], 
-                          'song_lyrics':song_lyrics[list_index], 
-                          'song_writers': song_writers[list_index], 
-                          'song_producers': song_producers[list_index], 
-                          'song_tags': song_tags[list_index]})
+            track.update(song_pages[list_index])
+            track['song_release_date'] = song_release_date[list_index]
+            track['song_page_views'] = song_page_views[list_index]
             list_index += 1
         
     collection = [{'album_title': album,
@@ -202,5 +521,6 @@ def create_discography(artist, albums_dict):
     
     df = raw_df.reindex(columns=['album_title', 'album_url', 'category', 'album_track_number', 'song_title', 
                                  'song_url', 'song_artists', 'song_release_date', 'song_page_views', 
-                                 'song_lyrics', 'song_writers', 'song_producers', 'song_tags'])
+                                 'song_lyrics', 'song_writers', 'song_producers', 'song_tags',
+                                 'song_lyric_sections'])
     return df
\ No newline at end of file
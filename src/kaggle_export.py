@@ -0,0 +1,162 @@
+"""Exports and imports the discography dataframe in fast-to-parse formats.
+
+   The Kaggle CSV stores list columns (lyrics, credits, tags) as Python
+   reprs, so reading it back means an ast.literal_eval per cell. These
+   formats keep lists as real arrays instead:
+
+   * JSON Lines: one song per line with native arrays; lossless round trip.
+   * CSV bundle: one CSV per table, mirroring the SQLite database, with a
+     song_id column linking songs to their artists, writers, producers,
+     tags, and lyrics (song titles alone aren't unique). Track numbers are
+     read back as text, as in the database.
+
+   Usage (from the project root):
+       python -m src.kaggle_export --benchmark
+"""
+
+import argparse
+import ast
+import gzip
+import json
+import os
+import time
+
+import pandas as pd
+
+columns = ['album_title', 'album_url', 'category', 'album_track_number', 'song_title',
+           'song_url', 'song_artists', 'song_release_date', 'song_page_views',
+           'song_lyrics', 'song_writers', 'song_producers', 'song_tags']
+
+list_columns = ['song_artists', 'song_lyrics', 'song_writers', 'song_producers', 'song_tags']
+
+# {bundle table: (dataframe list column, table value column)}
+bundle_tables = {'artists': ('song_artists', 'song_artist'),
+                 'writers': ('song_writers', 'song_writer'),
+                 'producers': ('song_producers', 'song_producer'),
+                 'tags': ('song_tags', 'song_tag'),
+                 'lyrics': ('song_lyrics', 'song_lyric')}
+
+def _open_text(file_name, mode):
+    if file_name.endswith('.gz'):
+        return gzip.open(file_name, mode + 't', encoding='utf-8')
+    return open(file_name, mode, encoding='utf-8')
+
+def export_jsonl(df, file_name):
+    """Writes discography dataframe as JSON Lines (gzipped if name ends in .gz)."""
+    records = df[columns].copy()
+    dates = records['song_release_date']
+    records['song_release_date'] = dates.dt.strftime('%Y-%m-%d').where(dates.notna(), None)
+
+    with _open_text(file_name, 'w') as file:
+        for record in records.to_dict(orient='records'):
+            file.write(json.dumps(record, ensure_ascii=False))
+            file.write('\n')
+
+def iter_jsonl(file_name):
+    """Yields one song dictionary per line of given JSON Lines file."""
+    with _open_text(file_name, 'r') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+def read_jsonl(file_name):
+    """Rebuilds discography dataframe from given JSON Lines file.
+
+       Rows are streamed into per-column lists, so no intermediate list of
+       dictionaries is held; dates are converted in one vectorized pass.
+    """
+    data = {column: [] for column in columns}
+    for record in iter_jsonl(file_name):
+        for column in columns:
+            data[column].append(record.get(column))
+
+    df = pd.DataFrame(data, columns=columns)
+    df['song_release_date'] = pd.to_datetime(df['song_release_date'], format='%Y-%m-%d')
+    df['song_page_views'] = df['song_page_views'].astype('int64')
+    return df
+
+def export_bundle(df, dir_name):
+    """Writes discography dataframe as a bundle of normalized CSV files."""
+    os.makedirs(dir_name, exist_ok=True)
+    df = df[columns].reset_index(drop=True)
+    song_id = pd.Series(df.index, name='song_id')
+
+    albums = df[['album_title', 'album_url', 'category']].drop_duplicates(subset=['album_title', 'album_url'])
+    albums.to_csv(os.path.join(dir_name, 'albums.csv'), index=False)
+
+    # Category is kept per song too, since songs added by hand can sit in a
+    # different category than the rest of their album
+    songs = pd.concat([song_id, df[['song_title', 'album_title', 'album_url', 'category', 'album_track_number',
+                                    'song_url', 'song_release_date', 'song_page_views']]], axis=1)
+    songs['song_release_date'] = songs['song_release_date'].dt.strftime('%Y-%m-%d')
+    songs.to_csv(os.path.join(dir_name, 'songs.csv'), index=False)
+
+    for table, (list_column, value_column) in bundle_tables.items():
+        exploded = pd.concat([song_id, df[list_column]], axis=1).explode(list_column).dropna()
+        exploded.rename(columns={list_column: value_column}, inplace=True)
+        exploded.to_csv(os.path.join(dir_name, '{}.csv'.format(table)), index=False)
+
+def read_bundle(dir_name):
+    """Rebuilds discography dataframe from given bundle of normalized CSV files."""
+    df = pd.read_csv(os.path.join(dir_name, 'songs.csv'), dtype={'album_track_number': str},
+                     keep_default_na=False, na_values={'song_release_date': ['']})
+    df['song_release_date'] = pd.to_datetime(df['song_release_date'], format='%Y-%m-%d')
+
+    for table, (list_column, value_column) in bundle_tables.items():
+        values = pd.read_csv(os.path.join(dir_name, '{}.csv'.format(table)), keep_default_na=False)
+        grouped = values.groupby('song_id', sort=False)[value_column].agg(list)
+        lists = grouped.reindex(df['song_id'])
+        df[list_column] = [value if isinstance(value, list) else [] for value in lists]
+
+    df.sort_values('song_id', inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return df[columns]
+
+def read_kaggle_csv(file_name):
+    """Reads the Kaggle CSV the slow way, evaluating every list cell."""
+    df = pd.read_csv(file_name)
+    for column in list_columns:
+        df[column] = df[column].apply(ast.literal_eval)
+    df['song_release_date'] = pd.to_datetime(df['song_release_date'])
+    return df
+
+def benchmark(df, dir_name, repeat=3):
+    """Returns dataframe of best load time and size per format, written to given folder."""
+    csv_name = os.path.join(dir_name, 'benchmark.csv')
+    jsonl_name = os.path.join(dir_name, 'benchmark.jsonl')
+    bundle_name = os.path.join(dir_name, 'benchmark_bundle')
+    df.to_csv(csv_name, index=False)
+    export_jsonl(df, jsonl_name)
+    export_bundle(df, bundle_name)
+
+    bundle_bytes = sum(os.path.getsize(os.path.join(bundle_name, file)) for file in os.listdir(bundle_name))
+    formats = {'csv + literal_eval': (read_kaggle_csv, csv_name, os.path.getsize(csv_name)),
+               'jsonl': (read_jsonl, jsonl_name, os.path.getsize(jsonl_name)),
+               'csv bundle': (read_bundle, bundle_name, bundle_bytes)}
+    rows = []
+    for name, (reader, path, size) in formats.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            reader(path)
+            timings.append(time.perf_counter() - start)
+        rows.append({'format': name, 'seconds': round(min(timings), 4), 'kilobytes': round(size / 1024, 1)})
+    return pd.DataFrame(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pickle', default='data/taylor_swift_clean.pkl')
+    parser.add_argument('--jsonl', default='data/kaggle/ts_discography_released.jsonl')
+    parser.add_argument('--benchmark', action='store_true', help='time round-trip loads instead of exporting')
+    parser.add_argument('--tmp-dir', default='/tmp/discography_export')
+    args = parser.parse_args()
+
+    df = pd.read_pickle(args.pickle)
+    if args.benchmark:
+        os.makedirs(args.tmp_dir, exist_ok=True)
+        print(benchmark(df, args.tmp_dir).to_string(index=False))
+    else:
+        export_jsonl(df, args.jsonl)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Packs every song's lyrics into one memory-mapped file for zero-copy reads.
+
+   The corpus file holds all lyrics as one contiguous UTF-8 buffer (each
+   line ending in a newline, songs back to back in discography order),
+   plus two int64 offset arrays: where each line starts in the buffer,
+   and which line each song starts at. Opening it maps the file with
+   NumPy rather than reading it, so a song's lyrics are a slice of the
+   buffer, only the pages actually read are loaded, and every process
+   reading the corpus (e.g. each Streamlit worker) shares one copy in the
+   OS page cache instead of holding its own lists of strings.
+
+   The corpus is stamped with the digest of the database built alongside
+   it (like the chart payloads' manifest), so readers can tell when it's
+   stale and fall back to the database's lyrics view.
+
+   File layout: the magic bytes, a little-endian uint64 header length,
+   a JSON header (song URLs and titles, the database digest, and the
+   offset and length of each array), then the arrays, each aligned to 8
+   bytes.
+"""
+
+import json
+import os
+import struct
+import threading
+
+import numpy as np
+
+corpus_file = 'data/taylor_swift_lyrics.corpus'
+
+magic = b'TSLYRIC1'
+
+def _aligned(size):
+    return (size + 7) // 8 * 8
+
+def pack_corpus(song_urls, song_titles, song_lyrics, db_digest=None):
+    """Returns corpus file contents (bytes) of given songs and their lists of lyric lines, stamped with db_digest."""
+    line_offsets = [0]
+    song_offsets = [0]
+    chunks = []
+    for lines in song_lyrics:
+        for line in lines:
+            chunk = (line.replace('\n', ' ') + '\n').encode('utf-8')
+            chunks.append(chunk)
+            line_offsets.append(line_offsets[-1] + len(chunk))
+        song_offsets.append(len(line_offsets) - 1)
+
+    arrays = {'line_offsets': np.array(line_offsets, dtype='<i8').tobytes(),
+              'song_offsets': np.array(song_offsets, dtype='<i8').tobytes(),
+              'text': b''.join(chunks)}
+    header = {'songs': list(song_urls), 'titles': list(song_titles), 'db_digest': db_digest, 'arrays': {}}
+    position = 0
+    for name, data in arrays.items():
+        header['arrays'][name] = [position, len(data)]
+        position = _aligned(position + len(data))
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    header_bytes += b' ' * (_aligned(len(magic) + 8 + len(header_bytes)) - len(magic) - 8 - len(header_bytes))
+
+    parts = [magic, struct.pack('<Q', len(header_bytes)), header_bytes]
+    for data in arrays.values():
+        parts.append(data + b'\0' * (_aligned(len(data)) - len(data)))
+    return b''.join(parts)
+
+def write_corpus(df, db_name, file_name=corpus_file):
+    """Writes lyric corpus of discography dataframe (songs keyed by song_url), replacing any existing one atomically.
+
+       The corpus is stamped with the digest of given database, which
+       should already be built from the same dataframe.
+    """
+    from .chart_payloads import db_digest
+
+    contents = pack_corpus(df['song_url'], df['song_title'], df['song_lyrics'], db_digest(db_name))
+    temp_file = '{}.tmp'.format(file_name)
+    with open(temp_file, 'wb') as file:
+        file.write(contents)
+    os.replace(temp_file, file_name)
+
+# Open corpora shared by every caller in the process, reopened when the file changes
+_corpora = {}
+_corpora_lock = threading.Lock()
+
+def open_corpus(file_name=corpus_file):
+    """Returns memory-mapped lyric corpus of given file, as a dictionary.
+
+       Keys: songs (song URLs in corpus order), titles, index ({song URL:
+       position}), db_digest (of the database it was built with, or None),
+       line_offsets, song_offsets, and text (the UTF-8 buffer as a uint8
+       array). The arrays are read-only views of the mapped file; each
+       corpus is opened once per process and reused until the file is
+       replaced.
+    """
+    modified = os.stat(file_name).st_mtime_ns
+    with _corpora_lock:
+        cached = _corpora.get(file_name)
+        if cached is not None and cached[0] == modified:
+            return cached[1]
+
+        buffer = np.memmap(file_name, dtype=np.uint8, mode='r')
+        if bytes(buffer[:len(magic)]) != magic:
+            raise ValueError('{} is not a lyric corpus file'.format(file_name))
+        header_length = struct.unpack('<Q', bytes(buffer[len(magic):len(magic) + 8]))[0]
+        start = len(magic) + 8
+        header = json.loads(bytes(buffer[start:start + header_length]).decode('utf-8'))
+        start += header_length
+
+        corpus = {'songs': header['songs'],
+                  'titles': header['titles'],
+                  'db_digest': header.get('db_digest'),
+                  'index': {song_url: position for position, song_url in enumerate(header['songs'])}}
+        for name, (offset, length) in header['arrays'].items():
+            data = buffer[start + offset:start + offset + length]
+            corpus[name] = data if name == 'text' else data.view('<i8')
+        _corpora[file_name] = (modified, corpus)
+        return corpus
+
+def corpus_current(db_name, file_name=corpus_file):
+    """Returns True if the corpus file exists and was built with the current database."""
+    from .chart_payloads import db_digest
+
+    if not os.path.exists(file_name):
+        return False
+    return open_corpus(file_name)['db_digest'] == db_digest(db_name)
+
+def _song_position(corpus, song):
+    # Songs are given by URL or by position in the corpus
+    return corpus['index'][song] if isinstance(song, str) else song
+
+def _line_range(corpus, song):
+    position = _song_position(corpus, song)
+    return corpus['song_offsets'][position], corpus['song_offsets'][position + 1]
+
+def song_bytes(corpus, song):
+    """Returns memoryview of given song's lyrics (URL or position) as UTF-8, one line per newline, without copying."""
+    first, last = _line_range(corpus, song)
+    offsets = corpus['line_offsets']
+    return memoryview(corpus['text'][offsets[first]:offsets[last]])
+
+def song_text(corpus, song):
+    """Returns given song's lyrics as one string, one line per newline."""
+    return bytes(song_bytes(corpus, song)).decode('utf-8')
+
+def song_lyrics(corpus, song):
+    """Returns given song's lyrics as a list of lines, like the discography dataframe's song_lyrics."""
+    text = song_text(corpus, song)
+    return text[:-1].split('\n') if text else []
+
+def line_counts(corpus):
+    """Returns array of the number of lyric lines of each song, in corpus order."""
+    return np.diff(corpus['song_offsets'])
+
+def byte_counts(corpus):
+    """Returns array of the UTF-8 size of each song's lyrics, in corpus order."""
+    return np.diff(corpus['line_offsets'][corpus['song_offsets']])
@@ -0,0 +1,114 @@
+"""Functions for normalizing musician credits through an interned people registry.
+
+   Every writer, producer, and artist gets one integer ID; aliases (e.g. a
+   pseudonym) point to the same ID as the canonical name, so merging or
+   renaming someone is a single dictionary update instead of a rewrite of
+   every credit list in the dataframe.
+"""
+
+import csv
+
+import numpy as np
+import pandas as pd
+
+credit_columns = ['song_artists', 'song_writers', 'song_producers']
+
+def load_aliases(csv_name):
+    """Creates alias dictionary from given CSV file.
+
+       Dictionary layout: {'alias': 'canonical_name'}, assumes
+       CSV has header rows
+    """
+    aliases = {}
+    with open(csv_name, 'r') as csv_file:
+        csv_reader = csv.DictReader(csv_file)
+        for row in csv_reader:
+            aliases[row['alias']] = row['canonical_name']
+    return aliases
+
+def create_registry(df, columns=credit_columns, aliases=None):
+    """Creates people registry from the credit columns of discography dataframe.
+
+       Registry layout: {'names': [canonical names, indexed by ID],
+       'ids': {name or alias: ID}}. IDs are assigned in order of first
+       appearance; aliases are resolved before assigning IDs so both
+       spellings share one ID.
+    """
+    aliases = aliases or {}
+    names = pd.concat([df[column].explode() for column in columns]).dropna()
+    canonical = names.replace(aliases)
+    _, uniques = pd.factorize(canonical)
+
+    registry = {'names': list(uniques),
+                'ids': {name: person_id for person_id, name in enumerate(uniques)}}
+    for alias, name in aliases.items():
+        if name in registry['ids']:
+            registry['ids'][alias] = registry['ids'][name]
+    return registry
+
+def intern_names(registry, names):
+    """Adds any unseen names to registry, returning it."""
+    for name in names:
+        if name not in registry['ids']:
+            registry['ids'][name] = len(registry['names'])
+            registry['names'].append(name)
+    return registry
+
+def merge_alias(registry, alias, name):
+    """Points alias at the ID of given canonical name."""
+    intern_names(registry, [name])
+    registry['ids'][alias] = registry['ids'][name]
+    return registry
+
+def rename_person(registry, old_name, new_name):
+    """Renames person everywhere their ID is used.
+
+       The old name is kept as an alias so older credit lists still resolve.
+    """
+    person_id = registry['ids'][old_name]
+    registry['names'][person_id] = new_name
+    registry['ids'][new_name] = person_id
+    return registry
+
+def credits_to_ids(series, registry):
+    """Converts column of name lists to column of ID arrays in one pass.
+
+       Names not yet in the registry are interned with new IDs.
+    """
+    if series.empty:
+        return pd.Series([], index=series.index, name=series.name, dtype=object)
+    lengths = series.str.len().to_numpy()
+    flat = series.explode().dropna()
+    intern_names(registry, flat.unique())
+
+    ids = flat.map(registry['ids']).to_numpy(dtype=np.int32)
+    id_arrays = np.split(ids, np.cumsum(lengths)[:-1])
+    return pd.Series(id_arrays, index=series.index, name=series.name)
+
+def ids_to_credits(series, registry):
+    """Converts column of ID arrays back to column of canonical name lists."""
+    names = np.array(registry['names'], dtype=object)
+    return series.apply(lambda ids: names[ids].tolist())
+
+def apply_aliases(df, registry, columns=credit_columns):
+    """Replaces every alias in given credit columns with its canonical name."""
+    df = df.copy()
+    for column in columns:
+        df[column] = ids_to_credits(credits_to_ids(df[column], registry), registry)
+    return df
+
+def count_collaborators(df, registry, columns=credit_columns):
+    """Counts songs worked on per person, regardless of role.
+
+       Returns series indexed by canonical name; a person credited in several
+       roles on the same song is only counted once for that song. An empty
+       dataframe gives an empty series.
+    """
+    if df.empty:
+        return pd.Series([], index=pd.Index([], dtype=object), name='songs', dtype=np.int64)
+    id_columns = [credits_to_ids(df[column], registry) for column in columns]
+    song_ids = [np.unique(np.concatenate(ids)) for ids in zip(*id_columns)]
+    counts = np.bincount(np.concatenate(song_ids), minlength=len(registry['names']))
+
+    totals = pd.Series(counts, index=registry['names'], name='songs')
+    return totals[totals > 0].sort_values(ascending=False)
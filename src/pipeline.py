@@ -0,0 +1,213 @@
+"""Runs the data collection pipeline of notebooks/data_collection.ipynb headless, stage by stage.
+
+   The stages mirror the notebook: scrape the albums from Genius into the
+   raw pickle, clean it (song drops, additions, and credit aliases) into
+   the clean pickle, build the database, chart payloads and figures, and
+   lyric corpus, and export the Kaggle files and page view snapshot. Each
+   stage saves its output, so a partial run (--stages) picks up from the
+   files the previous stages left behind.
+
+   With --profile, each stage runs under a profiler and its output is
+   saved to a timestamped folder in data/profiles: a .prof file (for
+   pstats or snakeviz) and a text summary of the top functions with
+   cProfile, or an HTML report with pyinstrument (if installed). With
+   --memory, tracemalloc records each stage's peak memory and top
+   allocation sites. Profilers slow the stages down, so compare times
+   between runs with the same flags.
+
+   Usage (from the project root):
+       python -m src.pipeline
+       python -m src.pipeline --stages clean build
+       python -m src.pipeline --stages build export --profile --memory
+       python -m src.pipeline --stages build --profile pyinstrument
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from datetime import datetime
+
+album_csv = 'data/csv/album_list.csv'
+drop_csv = 'data/csv/songs_to_drop_part1.csv'
+add_csv = 'data/csv/songs_to_add.csv'
+alias_csv = 'data/csv/credit_aliases.csv'
+raw_pickle = 'data/taylor_swift_raw.pkl'
+clean_pickle = 'data/taylor_swift_clean.pkl'
+db_name = 'data/taylor_swift.db'
+kaggle_csv = 'data/kaggle/ts_discography_released.csv'
+kaggle_jsonl = 'data/kaggle/ts_discography_released.jsonl'
+snapshot_db = 'data/page_view_snapshots.db'
+views_report_csv = 'data/page_view_report.csv'
+profile_dir = 'data/profiles'
+
+# Field groups (see record_hashes) that the chart payloads are built from
+chart_groups = ['metadata', 'views', 'credits']
+
+def _frame(state, key, pickle_name):
+    # A stage's input from earlier in this run, or from the file it left behind
+    if key not in state:
+        import pandas as pd
+        state[key] = pd.read_pickle(pickle_name)
+    return state[key]
+
+def stage_scrape(state):
+    """Scrapes every album in the album list from Genius into the raw pickle."""
+    from . import genius_scrape
+
+    albums = genius_scrape.create_dict_from_file(album_csv)
+    raw_df = genius_scrape.create_discography('Taylor Swift', albums, views_report=views_report_csv)
+    raw_df.to_pickle(raw_pickle)
+    state['raw'] = raw_df
+
+def stage_clean(state):
+    """Applies the manual song drops, additions, and credit aliases to the raw pickle."""
+    from . import discog_mods
+
+    df = _frame(state, 'raw', raw_pickle)
+    df = discog_mods.drop_songs_from_file(df, drop_csv, drop_duplicates=True)
+    df = discog_mods.add_songs_from_file(df, add_csv)
+    df = discog_mods.change_credit_names_from_file(df, alias_csv)
+    df.to_pickle(clean_pickle)
+    state['clean'] = df
+
+def stage_build(state):
+    """Builds the database, chart payloads and figures, and lyric corpus from the clean pickle.
+
+       Only changed songs are rewritten (see discog_mods.convert_to_db);
+       a rebuild that touches no charted field group keeps the payloads
+       and figures.
+    """
+    from . import chart_payloads
+    from . import discog_mods
+    from . import lyric_corpus
+    from . import record_hashes
+
+    df = _frame(state, 'clean', clean_pickle)
+    payloads_current = os.path.exists(db_name) and chart_payloads.payloads_current(db_name)
+    changelog = discog_mods.convert_to_db(df, db_name)
+    groups = record_hashes.changed_groups(changelog)
+    print('{} songs changed ({})'.format(len(changelog), ', '.join(sorted(groups)) or 'nothing'))
+
+    # Lyrics and tags aren't charted, so a rebuild touching only them keeps the payloads
+    if payloads_current and not groups & set(chart_groups):
+        chart_payloads.stamp_manifest(db_name)
+    else:
+        chart_payloads.write_payloads(db_name)
+        chart_payloads.write_figures(db_name)
+    # Rewritten every build (it's quick), so its stamp always matches the new database
+    lyric_corpus.write_corpus(df, db_name)
+    state['changelog'] = changelog
+
+def stage_export(state):
+    """Exports the clean pickle as Kaggle CSV and JSON Lines and records its page view snapshot."""
+    from . import kaggle_export
+    from . import view_snapshots
+
+    df = _frame(state, 'clean', clean_pickle)
+    df[kaggle_export.columns].to_csv(kaggle_csv, index=False)
+    kaggle_export.export_jsonl(df, kaggle_jsonl)
+    view_snapshots.record_snapshot(snapshot_db, df)
+
+stages = {'scrape': stage_scrape,
+          'clean': stage_clean,
+          'build': stage_build,
+          'export': stage_export}
+
+def _profile_stage(stage, state, profiler, out_dir):
+    if profiler == 'pyinstrument':
+        from pyinstrument import Profiler
+
+        stage_profiler = Profiler()
+        stage_profiler.start()
+        try:
+            stages[stage](state)
+        finally:
+            stage_profiler.stop()
+        with open(os.path.join(out_dir, '{}.html'.format(stage)), 'w') as file:
+            file.write(stage_profiler.output_html())
+        return
+
+    stage_profiler = cProfile.Profile()
+    try:
+        stage_profiler.runcall(stages[stage], state)
+    finally:
+        stage_profiler.dump_stats(os.path.join(out_dir, '{}.prof'.format(stage)))
+    summary = io.StringIO()
+    pstats.Stats(stage_profiler, stream=summary).sort_stats('cumulative').print_stats(40)
+    with open(os.path.join(out_dir, '{}.txt'.format(stage)), 'w') as file:
+        file.write(summary.getvalue())
+
+def run(stage_names=None, profiler=None, memory=False, out_dir=None, state=None):
+    """Runs given stages (default: all) in pipeline order, returning a list of per-stage results.
+
+       Each result holds the stage name, its run time in seconds and, with
+       memory, its peak traced memory in MB. With profiler ('cprofile' or
+       'pyinstrument') or memory, profiles and a summary.json of the
+       results are written to out_dir (default: a new timestamped folder
+       in data/profiles), which is also given in each result.
+    """
+    stage_names = [stage for stage in stages if stage_names is None or stage in stage_names]
+    state = {} if state is None else state
+    if (profiler or memory) and out_dir is None:
+        out_dir = os.path.join(profile_dir, datetime.now().strftime('%Y%m%d-%H%M%S'))
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    results = []
+    for stage in stage_names:
+        if memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            if profiler:
+                _profile_stage(stage, state, profiler, out_dir)
+            else:
+                stages[stage](state)
+        finally:
+            result = {'stage': stage, 'seconds': round(time.perf_counter() - start, 3)}
+            if memory:
+                snapshot = tracemalloc.take_snapshot()
+                result['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 1)
+                tracemalloc.stop()
+                top = snapshot.statistics('lineno')[:20]
+                with open(os.path.join(out_dir, '{}_memory.txt'.format(stage)), 'w') as file:
+                    file.write('\n'.join(str(statistic) for statistic in top) + '\n')
+            if out_dir:
+                result['out_dir'] = out_dir
+            results.append(result)
+
+    if out_dir:
+        with open(os.path.join(out_dir, 'summary.json'), 'w') as file:
+            json.dump({'profiler': profiler, 'memory': memory, 'stages': results}, file, indent=2)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stages', nargs='+', choices=list(stages), default=None,
+                        help='stages to run (default: all), always in pipeline order')
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=['cprofile', 'pyinstrument'],
+                        default=None, help='profile each stage (default profiler: cprofile)')
+    parser.add_argument('--memory', action='store_true', help='record peak memory of each stage with tracemalloc')
+    parser.add_argument('--out-dir', default=None, help='folder for profiles (default: new folder in data/profiles)')
+    args = parser.parse_args()
+
+    if args.profile == 'pyinstrument':
+        try:
+            import pyinstrument
+        except ImportError:
+            parser.error('pyinstrument is not installed (pip install pyinstrument)')
+
+    results = run(args.stages, args.profile, args.memory, args.out_dir)
+    for result in results:
+        peak = '{:>9.1f} MB'.format(result['peak_mb']) if 'peak_mb' in result else ''
+        print('{:<8} {:>9.3f} s {}'.format(result['stage'], result['seconds'], peak))
+    if results and 'out_dir' in results[0]:
+        print('Profiles written to {}'.format(results[0]['out_dir']))
+
+if __name__ == '__main__':
+    main()
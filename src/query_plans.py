@@ -0,0 +1,180 @@
+"""Reviews the query plans and run times of every script in sql/.
+
+   Runs each statement of each script against the database (all eras and
+   roles selected, as the app does by default) under EXPLAIN QUERY PLAN,
+   flags full table scans and temporary B-trees (sorts and DISTINCT/GROUP
+   BY without an index), and times it. The results can be saved as a
+   baseline; --check compares against it and exits nonzero if a statement
+   gained a scan or temp B-tree, or got slower than the allowed ratio.
+
+   Usage (from the project root):
+       python -m src.query_plans
+       python -m src.query_plans --write
+       python -m src.query_plans --check --time-ratio 2 --min-ms 5
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+import sqlite3 as sql
+
+from . import toolkit
+
+baseline_file = 'sql/query_plan_baseline.json'
+
+def script_names(sql_dir='sql'):
+    """Returns SQL script names in run order (temp table scripts first, as the app pages run them)."""
+    names = sorted(name for name in os.listdir(sql_dir) if name.endswith('.sql'))
+    return [name for name in names if '_temp_table' in name] + [name for name in names if '_temp_table' not in name]
+
+def _strip_comments(statement):
+    statement = re.sub(r'/\*.*?\*/', '', statement, flags=re.DOTALL)
+    return re.sub(r'--[^\n]*', '', statement).strip()
+
+def script_statements(script):
+    """Returns list of the complete SQL statements in given script."""
+    statements = []
+    buffer = ''
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if ';' in line and sql.complete_statement(buffer):
+            statements.append(buffer)
+            buffer = ''
+    if _strip_comments(buffer):
+        statements.append(buffer + ';')
+    return [statement for statement in statements if _strip_comments(statement)]
+
+def statement_label(statement):
+    """Returns short label of given statement (e.g. 'INSERT INTO temp.credit_counts_per_song')."""
+    words = _strip_comments(statement).split()
+    return ' '.join(words[:3]) if words[0].upper() == 'INSERT' else ' '.join(words[:2])
+
+def _is_query(statement):
+    return _strip_comments(statement).split()[0].upper() in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+def explain(connection, statement):
+    """Returns query plan of given statement as a list of indented detail lines."""
+    depths = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in connection.execute('EXPLAIN QUERY PLAN {}'.format(statement)):
+        depths[node_id] = depths.get(parent, -1) + 1
+        lines.append('{}{}'.format('  ' * depths[node_id], detail))
+    return lines
+
+def plan_flags(plan):
+    """Returns (full scans, temp B-trees) found in given query plan."""
+    details = [line.strip() for line in plan]
+    scans = [detail for detail in details if detail.startswith('SCAN ')]
+    temp_btrees = [detail for detail in details if 'USE TEMP B-TREE' in detail]
+    return scans, temp_btrees
+
+def profile(db_name, repeat=5):
+    """Returns {statement key: result} for every query statement in sql/.
+
+       Keys are 'script.sql:N' (Nth statement of the script); each result
+       holds the statement label, its plan, flagged scans and temp
+       B-trees, and its fastest run time in milliseconds over repeat runs.
+    """
+    connection = sql.connect(db_name)
+    toolkit.select_eras(connection)
+    toolkit.select_roles(connection)
+
+    results = {}
+    for script_name in script_names():
+        statements = script_statements(toolkit.sql_to_string(script_name))
+        timings = [[] for _ in statements]
+        for run in range(repeat):
+            for index, statement in enumerate(statements):
+                key = '{}:{}'.format(script_name, index + 1)
+                if run == 0 and _is_query(statement):
+                    plan = explain(connection, statement)
+                    scans, temp_btrees = plan_flags(plan)
+                    results[key] = {'statement': statement_label(statement), 'plan': plan,
+                                    'scans': scans, 'temp_btrees': temp_btrees}
+                start = time.perf_counter()
+                connection.execute(statement).fetchall()
+                timings[index].append((time.perf_counter() - start) * 1000)
+
+        for index, statement in enumerate(statements):
+            key = '{}:{}'.format(script_name, index + 1)
+            if key in results:
+                results[key]['ms'] = round(min(timings[index]), 3)
+    connection.close()
+    return results
+
+def write_baseline(results, file_name=baseline_file):
+    """Writes given profile results as the baseline."""
+    baseline = {'sqlite_version': sql.sqlite_version, 'statements': results}
+    with open(file_name, 'w') as file:
+        json.dump(baseline, file, indent=2)
+        file.write('\n')
+
+def read_baseline(file_name=baseline_file):
+    """Returns {statement key: result} of the saved baseline."""
+    with open(file_name, 'r') as file:
+        return json.load(file)['statements']
+
+def regressions(results, baseline, time_ratio=2.0, min_ms=5.0):
+    """Returns list of regressions of given profile results against baseline.
+
+       A statement regresses if it gained a full scan or temp B-tree, or
+       if it's more than time_ratio times and min_ms milliseconds slower.
+       Statements missing from the baseline are reported too.
+    """
+    problems = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None or base['statement'] != result['statement']:
+            problems.append('{} ({}): not in baseline'.format(key, result['statement']))
+            continue
+        for flag in ['scans', 'temp_btrees']:
+            added = Counter(result[flag]) - Counter(base[flag])
+            if added:
+                problems.append('{} ({}): new {}: {}'.format(key, result['statement'], flag.replace('_', ' '),
+                                                            ', '.join(sorted(added.elements()))))
+        if result['ms'] > base['ms'] * time_ratio and result['ms'] - base['ms'] > min_ms:
+            problems.append('{} ({}): {:.1f} ms, baseline {:.1f} ms'.format(key, result['statement'],
+                                                                          result['ms'], base['ms']))
+    return problems
+
+def report(results):
+    """Returns printable report of given profile results, slowest statements first."""
+    lines = []
+    for key, result in sorted(results.items(), key=lambda item: -item[1]['ms']):
+        lines.append('{:<36} {:>9.2f} ms  {}'.format(key, result['ms'], result['statement']))
+        for detail in result['plan']:
+            flagged = detail.strip() in result['scans'] + result['temp_btrees']
+            lines.append('    {} {}'.format('!' if flagged else ' ', detail))
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='data/taylor_swift.db')
+    parser.add_argument('--baseline', default=baseline_file)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--write', action='store_true', help='save results as the new baseline')
+    parser.add_argument('--check', action='store_true', help='exit nonzero on regressions against the baseline')
+    parser.add_argument('--time-ratio', type=float, default=2.0)
+    parser.add_argument('--min-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    results = profile(args.db, args.repeat)
+    if args.check:
+        problems = regressions(results, read_baseline(args.baseline), args.time_ratio, args.min_ms)
+        for problem in problems:
+            print(problem)
+        print('{} regressions in {} statements'.format(len(problems), len(results)))
+        sys.exit(1 if problems else 0)
+
+    print(report(results))
+    if args.write:
+        write_baseline(results, args.baseline)
+        print('Baseline written to {}'.format(args.baseline))
+
+if __name__ == '__main__':
+    main()
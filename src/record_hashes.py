@@ -0,0 +1,69 @@
+"""Content hashes of song records, per field group, and the changes between two sets of them.
+
+   Every song gets one hash per field group, so a rebuild can tell not just
+   that a song changed but what changed (e.g. only its page views), and
+   only rewrite (or invalidate caches for) that part.
+"""
+
+import hashlib
+import json
+
+import pandas as pd
+
+# {field group: discography dataframe columns hashed together}
+field_groups = {'metadata': ['album_title', 'category', 'album_track_number', 'song_title', 'song_release_date'],
+                'views': ['song_page_views'],
+                'credits': ['song_artists', 'song_writers', 'song_producers'],
+                'tags': ['song_tags'],
+                'lyrics': ['song_lyrics', 'song_lyric_sections']}
+
+hash_columns = ['hash_{}'.format(group) for group in field_groups]
+
+def _normalize(value):
+    if value is None or value is pd.NaT or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return value
+
+def record_hash(values):
+    """Returns stable hex digest of given field values (JSON-encoded, so lists and dates hash the same every run)."""
+    encoded = json.dumps([_normalize(value) for value in values], ensure_ascii=False, default=str, separators=(',', ':'))
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()[:16]
+
+def add_record_hashes(df):
+    """Returns copy of discography dataframe with one hash column per field group."""
+    df = df.copy()
+    for group, columns in field_groups.items():
+        df['hash_{}'.format(group)] = [record_hash(values) for values in zip(*(df[column] for column in columns))]
+    return df
+
+def diff_records(old, new):
+    """Returns changelog dataframe between two frames of song records with hash columns.
+
+       Songs are matched on song_url. Columns: song_url, song_title,
+       change ('added', 'removed', or 'changed'), and groups (comma-separated
+       field groups that differ, or every group for added/removed songs).
+    """
+    key_columns = ['song_url', 'song_title'] + hash_columns
+    merged = old[key_columns].merge(new[key_columns], on='song_url', how='outer',
+                                    suffixes=('_old', '_new'), indicator=True)
+
+    rows = []
+    for record in merged.to_dict(orient='records'):
+        if record['_merge'] == 'left_only':
+            rows.append((record['song_url'], record['song_title_old'], 'removed', ','.join(field_groups)))
+        elif record['_merge'] == 'right_only':
+            rows.append((record['song_url'], record['song_title_new'], 'added', ','.join(field_groups)))
+        else:
+            groups = [group for group in field_groups
+                      if record['hash_{}_old'.format(group)] != record['hash_{}_new'.format(group)]]
+            if groups:
+                rows.append((record['song_url'], record['song_title_new'], 'changed', ','.join(groups)))
+    return pd.DataFrame(rows, columns=['song_url', 'song_title', 'change', 'groups'])
+
+def changed_groups(changelog):
+    """Returns set of field groups touched by any change in given changelog."""
+    return {group for groups in changelog['groups'] for group in groups.split(',') if group}
@@ -0,0 +1,303 @@
+"""Runs scrape, clean, and build jobs unattended from a persistent SQLite queue.
+
+   Jobs are claimed one at a time in priority order (highest first) and
+   retried with exponential backoff when they fail. Volatile data (page
+   views) is refreshed often, while the full scrape of lyrics and credits
+   only runs rarely; a full scrape queues a clean, and a clean queues a
+   build. Every successful build publishes a new data version that the app
+   reads for its "last updated" date.
+
+   Usage (from the project root):
+       python -m src.refresh_worker enqueue views
+       python -m src.refresh_worker schedule
+       python -m src.refresh_worker work --max-jobs 5 --max-memory-mb 1024
+       python -m src.refresh_worker status
+"""
+
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+import sqlite3 as sql
+
+from . import pipeline
+
+queue_db = 'data/jobs.db'
+version_file = 'data/data_version.json'
+
+# {job kind: (priority, how often 'schedule' queues it)}
+schedule_plan = {'views': (10, timedelta(days=1)),
+                 'scrape': (1, timedelta(days=30))}
+
+default_priorities = {'views': 10, 'build': 8, 'clean': 5, 'scrape': 1}
+
+# Running jobs refresh their heartbeat this often; a running job whose
+# heartbeat is older than stale_after belongs to a worker that stopped
+heartbeat_interval = timedelta(minutes=1)
+stale_after = timedelta(minutes=10)
+
+schema = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    run_after TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    error TEXT,
+    claimed_by TEXT,
+    heartbeat_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, run_after);
+'''
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+def connect(queue_name=queue_db):
+    """Opens job queue database, creating its tables if needed."""
+    connection = sql.connect(queue_name, timeout=30, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(schema)
+    # Queues created before jobs recorded their worker get the new columns
+    columns = {row[1] for row in connection.execute('PRAGMA table_info(jobs)')}
+    for column in ['claimed_by', 'heartbeat_at']:
+        if column not in columns:
+            connection.execute('ALTER TABLE jobs ADD COLUMN {} TEXT'.format(column))
+    return connection
+
+def worker_name():
+    """Returns name identifying this worker process (host and process ID)."""
+    return '{}:{}'.format(socket.gethostname(), os.getpid())
+
+def enqueue(connection, kind, priority=None, delay=None):
+    """Adds job of given kind to queue, returning its job ID.
+
+       A job of the same kind that's already queued is reused instead of
+       adding a duplicate.
+    """
+    if kind not in handlers:
+        raise ValueError('Unknown job kind: {}'.format(kind))
+    queued = connection.execute("SELECT job_id FROM jobs WHERE kind = ? AND status = 'queued'", (kind,)).fetchone()
+    if queued:
+        return queued[0]
+
+    priority = default_priorities[kind] if priority is None else priority
+    run_after = datetime.now() + (delay or timedelta(0))
+    cursor = connection.execute('INSERT INTO jobs (kind, priority, run_after, created_at) VALUES (?, ?, ?, ?)',
+                                (kind, priority, run_after.isoformat(timespec='seconds'), _now()))
+    return cursor.lastrowid
+
+def schedule(connection):
+    """Queues every recurring job whose interval has passed since it last ran."""
+    queued = []
+    for kind, (priority, interval) in schedule_plan.items():
+        last = connection.execute("SELECT MAX(created_at) FROM jobs WHERE kind = ? AND status != 'failed'",
+                                  (kind,)).fetchone()[0]
+        if last is None or datetime.fromisoformat(last) + interval <= datetime.now():
+            queued.append(enqueue(connection, kind, priority))
+    return queued
+
+def claim(connection, worker=None):
+    """Marks the highest priority ready job as running by given worker and returns (job_id, kind), or None."""
+    connection.execute('BEGIN IMMEDIATE')
+    row = connection.execute('''
+        SELECT job_id, kind FROM jobs
+        WHERE status = 'queued' AND run_after <= ?
+        ORDER BY priority DESC, job_id
+        LIMIT 1''', (_now(),)).fetchone()
+    if row:
+        now = _now()
+        connection.execute('''
+            UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ?, claimed_by = ?, attempts = attempts + 1
+            WHERE job_id = ?''', (now, now, worker or worker_name(), row[0]))
+    connection.execute('COMMIT')
+    return row
+
+def recover(connection, stale=stale_after):
+    """Requeues jobs left running by a worker that stopped mid-job, returning how many.
+
+       Only jobs whose heartbeat (or start, for jobs claimed before
+       heartbeats) is older than stale are requeued, so jobs another live
+       worker is running are left alone.
+    """
+    cutoff = (datetime.now() - stale).isoformat(timespec='seconds')
+    cursor = connection.execute('''
+        UPDATE jobs SET status = 'queued', claimed_by = NULL
+        WHERE status = 'running' AND COALESCE(heartbeat_at, started_at, created_at) < ?''', (cutoff,))
+    return cursor.rowcount
+
+def heartbeat(queue_name, job_id, stop, interval=heartbeat_interval):
+    """Refreshes given running job's heartbeat every interval until stop (a threading.Event) is set."""
+    connection = sql.connect(queue_name, timeout=30, isolation_level=None)
+    while not stop.wait(interval.total_seconds()):
+        connection.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND status = 'running'", (_now(), job_id))
+    connection.close()
+
+def finish(connection, job_id, error=None):
+    """Marks job as done, or requeues it with backoff (failing it after its last attempt)."""
+    if error is None:
+        connection.execute("UPDATE jobs SET status = 'done', finished_at = ?, error = NULL WHERE job_id = ?",
+                           (_now(), job_id))
+        return
+
+    attempts, max_attempts = connection.execute('SELECT attempts, max_attempts FROM jobs WHERE job_id = ?',
+                                                (job_id,)).fetchone()
+    if attempts >= max_attempts:
+        connection.execute("UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE job_id = ?",
+                           (_now(), error, job_id))
+    else:
+        retry_at = datetime.now() + timedelta(minutes=2 ** attempts)
+        connection.execute("UPDATE jobs SET status = 'queued', run_after = ?, error = ? WHERE job_id = ?",
+                           (retry_at.isoformat(timespec='seconds'), error, job_id))
+
+def publish_version(kind):
+    """Writes a new data version file, replacing the old one atomically."""
+    version = {'version': datetime.now().strftime('%Y%m%d%H%M%S'),
+               'updated': datetime.now().date().isoformat(),
+               'job': kind}
+    temp_file = version_file + '.tmp'
+    with open(temp_file, 'w') as file:
+        json.dump(version, file)
+    os.replace(temp_file, version_file)
+    return version
+
+def run_scrape(connection):
+    """Scrapes every album in the album list from Genius into the raw pickle (see pipeline)."""
+    pipeline.run(['scrape'])
+    enqueue(connection, 'clean')
+
+def run_clean(connection):
+    """Applies the manual song drops, additions, and credit aliases to the raw pickle (see pipeline)."""
+    pipeline.run(['clean'])
+    enqueue(connection, 'build')
+
+def run_views(connection):
+    """Refreshes page views only, then rebuilds the database."""
+    import pandas as pd
+    from . import genius_scrape
+
+    df = pd.read_pickle(pipeline.clean_pickle)
+    song_urls = list(df['song_url'])
+    song_pages = genius_scrape.scrape_songs(song_urls)
+    exact_views = [page['song_page_views'] for page in song_pages]
+    view_strings = [page['song_page_views_string'] for page in song_pages]
+    df['song_page_views'] = genius_scrape.resolve_page_views(exact_views, view_strings).values
+    report = genius_scrape.page_views_report(song_urls, exact_views, view_strings)
+    report.to_csv(pipeline.views_report_csv, index=False)
+    print('{} songs with suspicious page views (see {})'.format(len(report), pipeline.views_report_csv))
+    df.to_pickle(pipeline.clean_pickle)
+    run_build(connection)
+
+def run_build(connection):
+    """Builds the database, chart payloads, and Kaggle exports from the clean pickle and publishes a new version."""
+    pipeline.run(['build', 'export'])
+    publish_version('build')
+
+handlers = {'scrape': run_scrape,
+            'clean': run_clean,
+            'views': run_views,
+            'build': run_build}
+
+def limit_resources(max_memory_mb=None, niceness=10):
+    """Caps the worker's address space and lowers its CPU priority (where supported)."""
+    try:
+        import resource
+    except ImportError:
+        return
+    if max_memory_mb:
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if niceness:
+        os.nice(niceness)
+
+def work(connection, max_jobs=None, poll_seconds=60, exit_when_idle=False):
+    """Processes queued jobs one at a time, returning the number run.
+
+       Stops after max_jobs jobs, or at the first empty poll when
+       exit_when_idle is set; otherwise sleeps poll_seconds between polls,
+       requeues stale jobs, and queues any recurring jobs that have come
+       due. While a job runs, a background thread keeps its heartbeat
+       current so other workers don't requeue it.
+    """
+    queue_name = connection.execute('PRAGMA database_list').fetchone()[2]
+    worker = worker_name()
+    completed = 0
+    while max_jobs is None or completed < max_jobs:
+        job = claim(connection, worker)
+        if job is None:
+            if exit_when_idle:
+                break
+            time.sleep(poll_seconds)
+            recover(connection)
+            schedule(connection)
+            continue
+
+        job_id, kind = job
+        stop = threading.Event()
+        beat = threading.Thread(target=heartbeat, args=(queue_name, job_id, stop), daemon=True)
+        beat.start()
+        try:
+            handlers[kind](connection)
+        except Exception as error:
+            finish(connection, job_id, '{}: {}'.format(type(error).__name__, error))
+        else:
+            finish(connection, job_id)
+        finally:
+            stop.set()
+            beat.join()
+        completed += 1
+    return completed
+
+def status(connection):
+    """Returns list of (kind, status, count) rows for the queue."""
+    return connection.execute('''
+        SELECT kind, status, COUNT(*) FROM jobs
+        GROUP BY kind, status ORDER BY kind, status''').fetchall()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queue', default=queue_db, help='job queue database')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = commands.add_parser('enqueue', help='queue a job')
+    enqueue_parser.add_argument('kind', choices=sorted(handlers))
+    enqueue_parser.add_argument('--priority', type=int, default=None)
+
+    commands.add_parser('schedule', help='queue every recurring job that is due')
+
+    work_parser = commands.add_parser('work', help='run queued jobs')
+    work_parser.add_argument('--max-jobs', type=int, default=None)
+    work_parser.add_argument('--poll', type=int, default=60, help='seconds between polls of an empty queue')
+    work_parser.add_argument('--exit-when-idle', action='store_true')
+    work_parser.add_argument('--max-memory-mb', type=int, default=None)
+
+    commands.add_parser('status', help='show job counts')
+    args = parser.parse_args()
+
+    connection = connect(args.queue)
+    match args.command:
+        case 'enqueue':
+            print(enqueue(connection, args.kind, args.priority))
+        case 'schedule':
+            print(schedule(connection))
+        case 'work':
+            limit_resources(args.max_memory_mb)
+            recover(connection)
+            schedule(connection)
+            print('{} jobs run'.format(work(connection, args.max_jobs, args.poll, args.exit_when_idle)))
+        case 'status':
+            for kind, job_status, count in status(connection):
+                print('{:<8} {:<8} {}'.format(kind, job_status, count))
+    connection.close()
+
+if __name__ == '__main__':
+    main()
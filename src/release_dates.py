@@ -0,0 +1,92 @@
+"""Vectorized release date analytics over the songs table.
+
+   All functions take a dataframe with an 'era' column and either a
+   'song_release_date' column or the precomputed 'release_year',
+   'release_month', 'release_day' columns built by discog_mods.convert_to_db.
+"""
+
+import numpy as np
+import pandas as pd
+
+release_query = '''
+SELECT
+    e.era,
+    s.song_title,
+    s.song_release_date,
+    s.release_year,
+    s.release_month,
+    s.release_day,
+    s.release_weekday
+FROM
+    songs s
+    JOIN albums a ON s.album_title = a.album_title
+    JOIN eras e ON a.category = e.category
+    {}
+ORDER BY
+    e.era_order, s.song_release_date
+'''
+
+def load_releases(connection, selected_only=False):
+    """Returns dataframe of every song's era and typed release date parts, in era order.
+
+       If selected_only is True, only eras in temp.selected_eras are loaded
+       (see toolkit.select_eras).
+    """
+    selected_join = 'JOIN temp.selected_eras se ON e.category = se.category' if selected_only else ''
+    releases = pd.read_sql(release_query.format(selected_join), connection)
+    releases['song_release_date'] = pd.to_datetime(releases['song_release_date'], format='%Y-%m-%d')
+    for column in ['release_year', 'release_month', 'release_day', 'release_weekday']:
+        releases[column] = releases[column].astype('Int64')
+    return releases
+
+def date_labels(months, days):
+    """Returns 'month/day' labels for given month and day columns."""
+    return months.astype(str) + '/' + days.astype(str)
+
+def release_calendar(df):
+    """Returns 12 x 31 dataframe of songs released per month (rows) and day (columns)."""
+    dated = df.dropna(subset=['release_month', 'release_day'])
+    counts = np.zeros((12, 31), dtype=np.int64)
+    np.add.at(counts, (dated['release_month'].to_numpy(dtype=int) - 1, dated['release_day'].to_numpy(dtype=int) - 1), 1)
+
+    calendar = pd.DataFrame(counts, index=pd.RangeIndex(1, 13, name='month'),
+                            columns=pd.RangeIndex(1, 32, name='day'))
+    return calendar
+
+def release_cadence(df, freq='Y'):
+    """Returns series of songs released per period ('Y' years, 'M' months), empty periods as 0."""
+    dates = df['song_release_date'].dropna()
+    cadence = dates.dt.to_period(freq).value_counts().sort_index()
+    periods = pd.period_range(cadence.index.min(), cadence.index.max(), freq=freq)
+    return cadence.reindex(periods, fill_value=0).rename('songs')
+
+def weekday_distribution(df):
+    """Returns series of songs released per weekday (Monday first)."""
+    names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    counts = np.bincount(df['release_weekday'].dropna().to_numpy(dtype=int), minlength=7)
+    return pd.Series(counts, index=names, name='songs')
+
+def release_gaps(df, by='era'):
+    """Returns days between consecutive release dates within each group.
+
+       Songs released the same day count as one release. Columns: group,
+       release dates, days_since_previous (NaN for each group's first);
+       rows are sorted by date.
+    """
+    releases = df[[by, 'song_release_date']].dropna().drop_duplicates()
+    releases = releases.sort_values('song_release_date', kind='stable').reset_index(drop=True)
+    releases['days_since_previous'] = releases.groupby(by)['song_release_date'].diff().dt.days
+    return releases
+
+def gap_summary(df, by='era'):
+    """Returns per-group summary of release gaps (releases, first/last date, median/max gap).
+
+       Groups keep the order they first appear in df.
+    """
+    gaps = release_gaps(df, by)
+    summary = gaps.groupby(by).agg(releases=('song_release_date', 'size'),
+                                   first_release=('song_release_date', 'min'),
+                                   last_release=('song_release_date', 'max'),
+                                   median_gap_days=('days_since_previous', 'median'),
+                                   max_gap_days=('days_since_previous', 'max'))
+    return summary.reindex(df[by].dropna().unique())
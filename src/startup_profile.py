@@ -0,0 +1,93 @@
+"""Profiles cold start of each Streamlit app page.
+
+   Every page is rendered once in a fresh Python process (so nothing is
+   already imported or cached) through Streamlit's AppTest harness, reporting
+   the time spent importing modules and the total time to first render.
+
+   Usage (from the project root):
+       python -m src.startup_profile
+       python -m src.startup_profile --pages app/Home.py --runs 3
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+heavy_modules = ['pandas', 'matplotlib', 'seaborn', 'scipy', 'numpy']
+
+# Runs inside the child process; import timing is collected by -X importtime,
+# which writes to stderr, so the marker line separates harness imports from
+# imports made by the page itself
+child_script = '''
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+page = sys.argv[1]
+sys.stderr.write('--page-start--\\n')
+sys.stderr.flush()
+start = time.perf_counter()
+app = AppTest.from_file(page, default_timeout=300).run()
+render_s = time.perf_counter() - start
+result = {'render_s': render_s,
+          'exception': [str(e.value) for e in app.exception],
+          'loaded': [m for m in %r if m in sys.modules]}
+print(json.dumps(result))
+''' % (heavy_modules,)
+
+def app_pages(app_dir='app'):
+    """Returns the app's entry page followed by every page in 'pages'."""
+    return [os.path.join(app_dir, 'Home.py')] + sorted(glob.glob(os.path.join(app_dir, 'pages', '*.py')))
+
+def parse_importtime(stderr):
+    """Returns seconds of top-level imports logged after the page start marker."""
+    lines = stderr.split('--page-start--')[-1].splitlines()
+    total_us = 0
+    for line in lines:
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Nested imports are indented further; only top-level ones are summed
+        # so each import is counted once
+        if cumulative.strip().isdigit() and len(name) - len(name.lstrip()) == 1:
+            total_us += int(cumulative)
+    return total_us / 1e6
+
+def profile_page(page):
+    """Renders given page in a fresh process and returns its timings."""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', child_script, page],
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError('Profiling {} failed:\n{}'.format(page, completed.stderr[-2000:]))
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['page'] = page
+    result['import_s'] = parse_importtime(completed.stderr)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', nargs='+', default=None, help='page files (default: every app page)')
+    parser.add_argument('--runs', type=int, default=1, help='fresh-process runs per page, best time is kept')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = []
+    for page in args.pages or app_pages():
+        runs = [profile_page(page) for _ in range(args.runs)]
+        results.append(min(runs, key=lambda run: run['render_s']))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print('{:<40} {:>10} {:>10}  {}'.format('page', 'import s', 'render s', 'heavy modules loaded'))
+    for result in results:
+        print('{:<40} {:>10.3f} {:>10.3f}  {}'.format(result['page'], result['import_s'], result['render_s'],
+                                                     ', '.join(result['loaded']) or '-'))
+        for exception in result['exception']:
+            print('    exception: {}'.format(exception))
+
+if __name__ == '__main__':
+    main()
@@ -1,57 +1,330 @@
-"""Miscellanious functions used in the discography project."""
-
-import matplotlib.font_manager as fm
-import pandas as pd
-
-eras = ['Taylor Swift',
-        'Fearless',
-        'Speak Now',
-        'Red',
-        '1989',
-        'reputation',
-        'Lover',
-        'folklore',
-        'evermore',
-        'Fearless (TV)',
-        'Red (TV)',
-        'Midnights',
-        'Speak Now (TV)',
-        '1989 (TV)',
-        'TTPD',
-        'Non-Album Songs',
-        'Other Artist Songs']
+"""Miscellanious functions used in the discography project.
+
+   Heavy libraries (pandas, matplotlib) are imported inside the functions
+   that need them so importing this module stays cheap for app pages.
+"""
+
+import dataclasses
+import glob
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from . import config
+
+# Era labels in chart order, from data/discography.toml
+eras = config.era_labels()
 
 def eras_order():
     return eras
 
+credit_roles = config.credit_roles
+
+# Date of the original data collection, used until a version is published
+first_collected = date(2024, 6, 27)
+
+def data_version():
+    """Returns the data version published by the refresh worker, or None."""
+    try:
+        with open(os.path.join(project_dir, 'data', 'data_version.json'), 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def db_version(db_name):
+    """Returns version key of given database file (modified time and size).
+
+       Rebuilds swap in a new file, so the key changes with every rebuild.
+    """
+    stat = os.stat(db_name)
+    return '{}-{}'.format(stat.st_mtime_ns, stat.st_size)
+
+def last_updated():
+    """Returns date the data was last updated."""
+    version = data_version()
+    if version is None or 'updated' not in version:
+        return first_collected
+    return date.fromisoformat(version['updated'])
+
+def era_options(db_name):
+    """Returns list of (category, label) of every era in given database, in era order."""
+    import sqlite3 as sql
+
+    connection = sql.connect(db_name)
+    options = connection.execute('SELECT category, era FROM eras ORDER BY era_order').fetchall()
+    connection.close()
+    return options
+
+def select_filter(connection, table_name, column_name, values):
+    """Fills given temp table (one primary key column) with values for filtered queries."""
+    connection.execute('CREATE TEMP TABLE IF NOT EXISTS {} ({} TEXT PRIMARY KEY)'.format(table_name, column_name))
+    connection.execute('DELETE FROM temp.{}'.format(table_name))
+    connection.executemany('INSERT OR IGNORE INTO temp.{} VALUES (?)'.format(table_name),
+                           [(value,) for value in values])
+
+def select_eras(connection, categories=None):
+    """Fills temp.selected_eras(category) with given eras, or every era if None."""
+    if categories is None:
+        categories = [row[0] for row in connection.execute('SELECT category FROM eras')]
+    select_filter(connection, 'selected_eras', 'category', categories)
+
+def select_roles(connection, roles=None):
+    """Fills temp.selected_roles(role) with given credit roles, or every role if None."""
+    select_filter(connection, 'selected_roles', 'role', credit_roles if roles is None else roles)
+
+# {SQL file name: (modified time, contents, SHA-256 fingerprint)}
+_sql_files = {}
+
+def sql_file(sql_file_name):
+    """Returns (contents, SHA-256 fingerprint) of given SQL file.
+
+       Each file is read once and reused until its modified time changes.
+    """
+    path = 'sql/{}'.format(sql_file_name)
+    modified = os.stat(path).st_mtime_ns
+    cached = _sql_files.get(sql_file_name)
+    if cached is None or cached[0] != modified:
+        with open(path, 'r') as file:
+            sql_script = file.read()
+        cached = (modified, sql_script, hashlib.sha256(sql_script.encode('utf-8')).hexdigest())
+        _sql_files[sql_file_name] = cached
+    return cached[1], cached[2]
+
 def sql_to_string(sql_file_name):
     """Converts given SQL file contents to Python string."""
-    with open('sql/{}'.format(sql_file_name), 'r') as file:
-        sql_script = file.read()
+    sql_script, _ = sql_file(sql_file_name)
     
     sql_string = '''\n{}\n'''.format(sql_script)
     return sql_string
 
+def _query_source(query):
+    # Queries are SQL file names or SQL text
+    if query.endswith('.sql'):
+        return sql_to_string(query), sql_file(query)[1]
+    return query, hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+# Query results shared by every caller in the process, least recently used first
+query_cache_size = 128
+_query_cache = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+def query_key(db_name, query, setup=(), eras=None, roles=None):
+    """Returns cache key of given query: database version, fingerprints of the query and setup scripts, and filters."""
+    key = {'db': db_version(db_name),
+           'query': _query_source(query)[1],
+           'setup': [_query_source(script)[1] for script in setup],
+           'eras': None if eras is None else sorted(eras),
+           'roles': None if roles is None else sorted(roles)}
+    return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()
+
+def _cached_result(key, cache_dir):
+    with _query_cache_lock:
+        if key in _query_cache:
+            _query_cache.move_to_end(key)
+            return _query_cache[key]
+    if cache_dir and os.path.exists(os.path.join(cache_dir, '{}.arrow'.format(key))):
+        import pandas as pd
+
+        df = pd.read_feather(os.path.join(cache_dir, '{}.arrow'.format(key)))
+        _store_result(key, df, None)
+        return df
+    return None
+
+def _store_result(key, df, cache_dir):
+    with _query_cache_lock:
+        _query_cache[key] = df
+        _query_cache.move_to_end(key)
+        while len(_query_cache) > query_cache_size:
+            _query_cache.popitem(last=False)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        file_name = os.path.join(cache_dir, '{}.arrow'.format(key))
+        temp_file = '{}.{}.tmp'.format(file_name, threading.get_ident())
+        df.to_feather(temp_file)
+        os.replace(temp_file, file_name)
+
+def read_queries(db_name, queries, setup=(), eras=None, roles=None, cache_dir=None):
+    """Returns {query: dataframe} of given queries (SQL file names or SQL text), using cached results.
+
+       setup scripts (e.g. temp tables) run first, after selecting the
+       given eras and roles (see select_eras and select_roles). Results
+       are cached in memory, keyed by query_key, with the least recently
+       used dropped past query_cache_size; if cache_dir is set, they're
+       also kept there as Arrow files (written with pyarrow), shared
+       between processes. The database is only opened if a query isn't
+       cached. Callers get their own copies of the dataframes.
+    """
+    keys = {query: query_key(db_name, query, setup, eras, roles) for query in queries}
+    results = {query: _cached_result(key, cache_dir) for query, key in keys.items()}
+
+    missing = [query for query, df in results.items() if df is None]
+    if missing:
+        import pandas as pd
+        import sqlite3 as sql
+
+        connection = sql.connect(db_name)
+        select_eras(connection, eras)
+        select_roles(connection, roles)
+        for script in setup:
+            connection.executescript(_query_source(script)[0])
+        for query in missing:
+            results[query] = pd.read_sql(_query_source(query)[0], connection)
+            _store_result(keys[query], results[query], cache_dir)
+        connection.close()
+    return {query: df.copy() for query, df in results.items()}
+
+def read_query(db_name, query, setup=(), eras=None, roles=None, cache_dir=None):
+    """Returns dataframe of given query (SQL file name or SQL text), using cached results (see read_queries)."""
+    return read_queries(db_name, [query], setup, eras, roles, cache_dir)[query]
+
+def clear_query_cache(cache_dir=None):
+    """Empties the in-memory query cache, and the Arrow files in cache_dir if given."""
+    with _query_cache_lock:
+        _query_cache.clear()
+    if cache_dir:
+        for file_name in glob.glob(os.path.join(cache_dir, '*.arrow')):
+            os.remove(file_name)
+
+def discography_sample(db_name, n=100, corpus_file=None):
+    """Returns dataframe of n random songs with the columns of the discography dataframe.
+
+       Song details and credits come from the database and lyrics from the
+       memory-mapped lyric corpus (see lyric_corpus), only for the sampled
+       songs, so the rest of the lyrics are never loaded. If the corpus
+       wasn't built with the current database (or lacks a song), lyrics
+       come from the database's lyrics view instead, matched by title.
+    """
+    import sqlite3 as sql
+    import pandas as pd
+    from . import lyric_corpus
+
+    connection = sql.connect(db_name)
+    songs = pd.read_sql('''
+        SELECT a.album_title, a.album_url, a.category, s.album_track_number, s.song_title, s.song_url,
+               s.song_release_date, s.song_page_views
+        FROM songs s JOIN albums a ON s.album_title = a.album_title''',
+                        connection, parse_dates=['song_release_date'])
+    sample = songs.sample(min(n, len(songs))).reset_index(drop=True)
+
+    placeholders = ', '.join('?' * len(sample))
+    for table, column, list_column in [('artists', 'song_artist', 'song_artists'),
+                                       ('writers', 'song_writer', 'song_writers'),
+                                       ('producers', 'song_producer', 'song_producers'),
+                                       ('tags', 'song_tag', 'song_tags')]:
+        credits = pd.read_sql('SELECT song_title, {} FROM {} WHERE song_title IN ({}) ORDER BY rowid'.format(
+                                  column, table, placeholders), connection, params=list(sample['song_title']))
+        lists = credits.dropna().groupby('song_title', sort=False)[column].agg(list)
+        sample[list_column] = [lists.get(title, []) for title in sample['song_title']]
+
+    corpus_file = corpus_file or lyric_corpus.corpus_file
+    corpus = lyric_corpus.open_corpus(corpus_file) if lyric_corpus.corpus_current(db_name, corpus_file) else None
+    stale = [title for song_url, title in zip(sample['song_url'], sample['song_title'])
+             if corpus is None or song_url not in corpus['index']]
+    fallback = {}
+    if stale:
+        lyrics = pd.read_sql('''
+            SELECT song_title, song_lyric FROM lyrics WHERE song_title IN ({})
+            ORDER BY song_title, section_order, lyric_order'''.format(', '.join('?' * len(stale))),
+                             connection, params=stale)
+        fallback = lyrics.groupby('song_title', sort=False)['song_lyric'].agg(list)
+    connection.close()
+
+    sample['song_lyrics'] = [lyric_corpus.song_lyrics(corpus, song_url) if title not in stale else fallback.get(title, [])
+                             for song_url, title in zip(sample['song_url'], sample['song_title'])]
+    return sample[['album_title', 'album_url', 'category', 'album_track_number', 'song_title', 'song_url',
+                   'song_artists', 'song_release_date', 'song_page_views', 'song_lyrics', 'song_writers',
+                   'song_producers', 'song_tags']]
+
+project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+font_dir = os.path.join(project_dir, 'assets', 'fonts')
+
+_fonts_installed = False
+
+def font_files():
+    """Returns sorted paths of font files in the project's 'fonts' folder."""
+    fonts = glob.glob(os.path.join(font_dir, '*.ttf')) + glob.glob(os.path.join(font_dir, '*.otf'))
+    return sorted(fonts)
+
+def font_cache_key(fonts):
+    """Returns cache key of given font files ({path: modified time})."""
+    return {font: os.stat(font).st_mtime_ns for font in fonts}
+
 def install_fonts():
-    """Installs all fonts in the 'font' folder."""
-    font_dir = ['/assets/fonts']
-    for font in fm.findSystemFonts(font_dir):
-        fm.fontManager.addfont(font)
+    """Installs all fonts in the 'font' folder.
+
+       Fonts are only registered once per process; later calls are no-ops.
+       Parsed font entries are saved to matplotlib's cache directory, keyed
+       by the font files' modified times, so new processes can register
+       them without opening any font files.
+    """
+    global _fonts_installed
+    if _fonts_installed:
+        return
+
+    import matplotlib as mpl
+    import matplotlib.font_manager as fm
+
+    fonts = font_files()
+    key = font_cache_key(fonts)
+    cache_file = os.path.join(mpl.get_cachedir(), 'discography-fontlist.json')
+
+    cached = None
+    try:
+        with open(cache_file, 'r') as file:
+            cached = json.load(file)
+    except (OSError, ValueError):
+        pass
+
+    # Cached entries are added to the font list directly, which leaves any
+    # earlier findfont lookups stale. Matplotlib has no public way to reset
+    # them, so this shortcut is only taken where the lookup cache can be
+    # cleared (matplotlib 3.4 and later); otherwise the fonts go through
+    # addfont, which resets it itself
+    clear_lookups = getattr(getattr(fm.fontManager, '_findfont_cached', None), 'cache_clear', None)
+    if cached is not None and cached.get('key') == key and clear_lookups is not None:
+        fm.fontManager.ttflist.extend(fm.FontEntry(**entry) for entry in cached['fonts'])
+        clear_lookups()
+    else:
+        for font in fonts:
+            fm.fontManager.addfont(font)
+        entries = [dataclasses.asdict(entry) for entry in fm.fontManager.ttflist if entry.fname in key]
+        try:
+            with open(cache_file, 'w') as file:
+                json.dump({'key': key, 'fonts': entries}, file)
+        except OSError:
+            # A read-only cache directory only costs the parse on next start
+            pass
+    _fonts_installed = True
 
 def sort_cat_column(df, column_name, cat_list):
     """Sorts categorical column by given list."""
+    import pandas as pd
+
     df[column_name] = pd.Categorical(df[column_name], cat_list)
     df.sort_values(column_name, inplace=True)
     df.reset_index(drop=True, inplace=True)
     return df
 
-def abbreviate_ttpd(df_column):
-    """Abbreviates 'The Tortured Poets Department' to 'TTPD' to save space."""
-    df_column = df_column.replace('The Tortured Poets Department', 'TTPD', inplace=True)
-    return df_column
+def order_by_query(df, column_name):
+    """Makes era column categorical in chart order (see config.era_categorical).
+
+       Used for era columns of queries, so charts keep the eras' order
+       without re-sorting.
+    """
+    df[column_name] = config.era_categorical(df[column_name])
+    return df
+
+def chart_params(rcParams=None):
+    """Setting the aesthetic parameters for the charts.
 
-def chart_params(rcParams):
-    """Setting the aesthetic parameters for the charts."""
+       Matplotlib is only imported here when rcParams isn't given, so
+       pages can defer it until they actually draw a chart.
+    """
+    if rcParams is None:
+        from matplotlib import rcParams
     install_fonts()
     rcParams['font.family'] = 'Lato'
     rcParams['figure.dpi'] = 300
@@ -0,0 +1,175 @@
+"""Ranks the most frequent collaborators from precomputed song counts.
+
+   Every build stores, per era and collaborator, how many songs they
+   worked on for each combination of roles (a bitmask of writer, producer,
+   and artist). A ranking for any era and role filter is then a sum over
+   that small table instead of joining and window-sorting every credit,
+   and it's still exact: a song where someone both wrote and produced is
+   counted once, as in most_frequent_collaborators.sql.
+
+   For credits streamed in from many artists, where keeping every count
+   isn't practical, the Space-Saving sketch keeps approximate counts of
+   the heaviest hitters in fixed memory.
+"""
+
+import heapq
+
+import pandas as pd
+
+from . import toolkit
+
+role_bits = {'writer': 1, 'producer': 2, 'artist': 4}
+
+# {credit table: (name column, role)}
+credit_tables = {'writers': ('song_writer', 'writer'),
+                 'producers': ('song_producer', 'producer'),
+                 'artists': ('song_artist', 'artist')}
+
+excluded_collaborators = ['Taylor Swift']
+
+def role_mask(roles=None):
+    """Returns bitmask of given credit roles, or of every role if None."""
+    roles = role_bits if roles is None else roles
+    mask = 0
+    for role in roles:
+        mask |= role_bits[role]
+    return mask
+
+def count_table(tables):
+    """Returns collaborator_counts table (category, collaborator, role_mask, songs) of given database tables.
+
+       Songs are matched to credits by title and to eras through their
+       album, like the collaborator temp tables.
+    """
+    songs = tables['songs'][['song_title', 'album_title']].merge(tables['albums'][['album_title', 'category']],
+                                                                 on='album_title')
+    credits = []
+    for table_name, (column, role) in credit_tables.items():
+        credit = tables[table_name][['song_title', column]].dropna().rename(columns={column: 'collaborator'})
+        credit['role_mask'] = role_bits[role]
+        credits.append(credit)
+    credits = songs.merge(pd.concat(credits, ignore_index=True), on='song_title')
+
+    # One row per era, song, and collaborator, with every role they had on it
+    # (each role is its own bit, so summing the distinct ones combines them)
+    credits.drop_duplicates(['category', 'song_title', 'collaborator', 'role_mask'], inplace=True)
+    per_song = credits.groupby(['category', 'song_title', 'collaborator'], sort=False)['role_mask'].sum()
+    counts = per_song.reset_index().groupby(['category', 'collaborator', 'role_mask'], as_index=False).size()
+    counts.rename(columns={'size': 'songs'}, inplace=True)
+    return counts
+
+def era_counts_query(exclude=excluded_collaborators):
+    """Returns SQL text of songs worked on (era, era_order, collaborator, songs) leaving out given collaborators.
+
+       Eras and roles come from temp.selected_eras and temp.selected_roles
+       (see toolkit.select_eras and toolkit.select_roles), so the query can
+       be run and cached with toolkit.read_query like any other.
+    """
+    role_cases = ' '.join("WHEN '{}' THEN {}".format(role, bit) for role, bit in role_bits.items())
+    excluded = ', '.join("'{}'".format(name.replace("'", "''")) for name in exclude)
+    return '''
+        SELECT e.era, e.era_order, c.collaborator, SUM(c.songs) AS songs
+        FROM collaborator_counts c
+        JOIN eras e ON c.category = e.category
+        WHERE c.category IN (SELECT category FROM temp.selected_eras)
+          AND (c.role_mask & (SELECT COALESCE(SUM(CASE r.role {} END), 0) FROM temp.selected_roles r)) != 0
+          {}
+        GROUP BY e.era, e.era_order, c.collaborator'''.format(
+            role_cases, 'AND c.collaborator NOT IN ({})'.format(excluded) if exclude else '')
+
+def era_counts(connection, roles=None, eras=None, exclude=excluded_collaborators):
+    """Returns dataframe of songs worked on (era, era_order, collaborator, songs) for given role and era filters.
+
+       eras are categories, as in toolkit.select_eras; None means every era.
+    """
+    toolkit.select_eras(connection, eras)
+    toolkit.select_roles(connection, roles)
+    return pd.read_sql(era_counts_query(exclude), connection)
+
+def _totals(counts):
+    totals = counts.groupby('collaborator', as_index=False)['songs'].sum()
+    totals.rename(columns={'songs': 'total_songs'}, inplace=True)
+    return totals
+
+def _rank(totals, k, dense):
+    totals = totals.sort_values(['total_songs', 'collaborator'], ascending=[False, True])
+    if dense:
+        totals['rank'] = totals['total_songs'].rank(method='dense', ascending=False).astype(int)
+        return totals[totals['rank'] <= k]
+    totals['rank'] = range(1, len(totals) + 1)
+    return totals.head(k)
+
+def rank_overall(counts, k=9, dense=True):
+    """Returns dataframe of the top k collaborators (collaborator, total_songs, rank) of given era_counts dataframe.
+
+       With dense, k counts distinct song totals, so ties all make the cut
+       (DENSE_RANK, like most_frequent_collaborators.sql); otherwise exactly
+       k collaborators are kept, ties broken by name.
+    """
+    return _rank(_totals(counts), k, dense).reset_index(drop=True)
+
+def rank_per_era(counts, k=9, dense=True):
+    """Returns per-era song counts of the top k collaborators of given era_counts dataframe, in era order.
+
+       Columns match most_frequent_collaborators.sql: era, era_order,
+       collaborator, songs, total_songs, and rank.
+    """
+    per_era = counts.merge(_rank(_totals(counts), k, dense), on='collaborator')
+    per_era.sort_values(['era_order', 'rank', 'collaborator'], inplace=True)
+    return per_era[['era', 'era_order', 'collaborator', 'songs', 'total_songs', 'rank']].reset_index(drop=True)
+
+def top_k(connection, k=9, roles=None, eras=None, exclude=excluded_collaborators, dense=True):
+    """Returns dataframe of the top k collaborators (collaborator, total_songs, rank) across given eras (see rank_overall)."""
+    return rank_overall(era_counts(connection, roles, eras, exclude), k, dense)
+
+def top_k_per_era(connection, k=9, roles=None, eras=None, exclude=excluded_collaborators, dense=True):
+    """Returns per-era song counts of the top k collaborators, in era order (see rank_per_era)."""
+    return rank_per_era(era_counts(connection, roles, eras, exclude), k, dense)
+
+def sketch_new(capacity=1000):
+    """Returns empty Space-Saving sketch tracking at most capacity items."""
+    return {'capacity': capacity, 'counts': {}, 'errors': {}, 'heap': []}
+
+def sketch_add(sketch, item, count=1):
+    """Adds count occurrences of item to given sketch.
+
+       When the sketch is full, a new item replaces the one with the
+       smallest count and inherits that count as its possible overcount.
+    """
+    counts = sketch['counts']
+    if item not in counts and len(counts) >= sketch['capacity']:
+        heap = sketch['heap']
+        # Heap entries go stale as counts grow; skip them until a current one
+        while True:
+            smallest, evicted = heapq.heappop(heap)
+            if counts.get(evicted) == smallest:
+                break
+        del counts[evicted]
+        del sketch['errors'][evicted]
+        counts[item] = smallest
+        sketch['errors'][item] = smallest
+    elif item not in counts:
+        counts[item] = 0
+        sketch['errors'][item] = 0
+    counts[item] += count
+    heapq.heappush(sketch['heap'], (counts[item], item))
+    if len(sketch['heap']) > 4 * sketch['capacity']:
+        sketch['heap'] = [(value, key) for key, value in counts.items()]
+        heapq.heapify(sketch['heap'])
+
+def sketch_update(sketch, items):
+    """Adds every item of given iterable (e.g. one collaborator per credited song) to sketch."""
+    for item in items:
+        sketch_add(sketch, item)
+    return sketch
+
+def sketch_top(sketch, k=9):
+    """Returns dataframe of the k items with the largest estimated counts.
+
+       Columns: collaborator, songs (an upper bound), and error (how much
+       of that might be overcount); songs - error is a lower bound.
+    """
+    top = heapq.nlargest(k, sketch['counts'].items(), key=lambda entry: entry[1])
+    return pd.DataFrame({'collaborator': [item for item, _ in top],
+                         'songs': [count for _, count in top],
+                         'error': [sketch['errors'][item] for item, _ in top]})
@@ -0,0 +1,112 @@
+"""Builds interactive charts as Vega-Lite specs with Altair.
+
+   Mirrors the chart set in charts.py, but takes the precomputed payload
+   frames from chart_payloads, so the browser does all the drawing,
+   hovering, and filtering. Every chart gets tooltips; charts split by era
+   can have eras toggled by clicking the legend.
+"""
+
+import altair as alt
+
+from . import config
+
+background = config.palette('background')
+
+credit_colors = config.palette('credit_roles')
+
+def _era_sort(df):
+    return list(dict.fromkeys(df.sort_values('era_order')['era'])) if 'era_order' in df else list(dict.fromkeys(df['era']))
+
+def _finish(chart, title, width=700, height=350):
+    return chart.properties(title=title, width=width, height=height, background=background)
+
+def credit_chart(df, value_column, plot_type, title, y_label):
+    """Returns bar or line chart of credit counts per era and credit type, with type averages as rules."""
+    types = [role for role in credit_colors if role in set(df['type'])]
+    color = alt.Color('type:N', title='Credit Type',
+                      scale=alt.Scale(domain=types, range=[credit_colors[role] for role in types]))
+    x = alt.X('era:N', sort=_era_sort(df), title='Album/Song Era', axis=alt.Axis(labelAngle=-40))
+    y = alt.Y('{}:Q'.format(value_column), title=y_label)
+    tooltip = ['era:N', 'type:N', '{}:Q'.format(value_column)]
+    selection = alt.selection_point(fields=['type'], bind='legend')
+    opacity = alt.condition(selection, alt.value(1), alt.value(0.2))
+
+    base = alt.Chart(df)
+    if plot_type == 'bar':
+        marks = base.mark_bar().encode(x=x, y=y, color=color, xOffset='type:N', tooltip=tooltip, opacity=opacity)
+    else:
+        marks = base.mark_line(point=True).encode(x=x, y=y, color=color, tooltip=tooltip, opacity=opacity)
+    averages = base.mark_rule(strokeDash=[6, 4], opacity=0.5).encode(
+        y='mean({}):Q'.format(value_column), color=color)
+    return _finish((marks + averages).add_params(selection), title, width=900)
+
+def collab_heatmap(df, x_column, y_column, value_column, title, x_label, y_label):
+    """Returns heatmap of given long-form frame (one row per cell) with cell labels."""
+    x = alt.X('{}:N'.format(x_column), sort=_era_sort(df) if x_column == 'era' else 'ascending',
+              title=x_label, axis=alt.Axis(labelAngle=-40))
+    y = alt.Y('{}:N'.format(y_column), sort='ascending', title=y_label)
+    tooltip = ['{}:N'.format(y_column), '{}:N'.format(x_column), '{}:Q'.format(value_column)]
+    base = alt.Chart(df).encode(x=x, y=y)
+    cells = base.mark_rect(stroke='#FFFFFF', strokeWidth=1.5).encode(
+        color=alt.Color('{}:Q'.format(value_column), scale=alt.Scale(scheme='purplered'), legend=None),
+        tooltip=tooltip)
+    labels = base.mark_text().encode(text='{}:Q'.format(value_column))
+    return _finish(cells + labels, title, width=900, height=450)
+
+def formats_pie(df, value_column, label_column, title, colors_list):
+    """Returns pie chart of given values per label."""
+    labels = list(df[label_column])
+    return _finish(alt.Chart(df).mark_arc(stroke='#132a13').encode(
+        theta='{}:Q'.format(value_column),
+        color=alt.Color('{}:N'.format(label_column), title='Format',
+                        scale=alt.Scale(domain=labels, range=colors_list[:len(labels)])),
+        tooltip=['{}:N'.format(label_column), '{}:Q'.format(value_column)]), title, width=350, height=350)
+
+def release_hist(frames, titles, x_labels, colors_list, edgecolors_list, title):
+    """Returns row of bar charts of release counts, one per (value, count) frame, all edged in the first edge color."""
+    charts = []
+    for df, subtitle, x_label, color in zip(frames, titles, x_labels, colors_list):
+        charts.append(alt.Chart(df).mark_bar(color=color, stroke=edgecolors_list[0]).encode(
+            x=alt.X('value:O', title=x_label), y=alt.Y('count:Q', title='Song Count'),
+            tooltip=[alt.Tooltip('value:O', title=x_label), 'count:Q']).properties(title=subtitle, width=260, height=300))
+    return alt.hconcat(*charts).properties(title=title, background=background)
+
+def date_scatter(df, title):
+    """Returns scatter of release counts per month and day of month, sized by count."""
+    return _finish(alt.Chart(df).mark_point(shape='M0,-1L0.87,-0.5L0.87,0.5L0,1L-0.87,0.5L-0.87,-0.5Z',
+                                            filled=True, stroke='#0d1b2a').encode(
+        x=alt.X('month:Q', title='Month', scale=alt.Scale(domain=[0, 13])),
+        y=alt.Y('day:Q', title='Day of Month', scale=alt.Scale(domain=[0, 32])),
+        size=alt.Size('count:Q', legend=None),
+        color=alt.Color('count:Q', scale=alt.Scale(scheme='goldorange'), legend=None),
+        tooltip=['date:N', 'count:Q']), title, width=450, height=350)
+
+def views_totals(df, title, color, edgecolor):
+    """Returns horizontal bar chart of total page views per era."""
+    return _finish(alt.Chart(df).mark_bar(color=color, stroke=edgecolor).encode(
+        x=alt.X('total_views:Q', title='Total Page Views', axis=alt.Axis(format='~s')),
+        y=alt.Y('era:N', sort=_era_sort(df), title='Album/Song Era'),
+        tooltip=['era:N', alt.Tooltip('total_views:Q', format=',')]), title, width=500)
+
+def views_hist(df, title, color, edgecolor):
+    """Returns histogram of page views from precomputed bins (left, right, count)."""
+    return _finish(alt.Chart(df).mark_bar(color=color, stroke=edgecolor).encode(
+        x=alt.X('left:Q', bin='binned', title='Page Views', axis=alt.Axis(format='~s')),
+        x2='right:Q',
+        y=alt.Y('count:Q', title='Song Count'),
+        tooltip=[alt.Tooltip('left:Q', format=','), alt.Tooltip('right:Q', format=','), 'count:Q']), title, width=400)
+
+def views_box(stats, fliers, title, boxcolor, linecolor):
+    """Returns horizontal box plots drawn from precomputed statistics and outliers."""
+    order = _era_sort(stats)
+    y = alt.Y('era:N', sort=order, title='Album/Song Era')
+    x_axis = alt.Axis(format='~s')
+    tooltip = ['era:N'] + ['{}:Q'.format(column) for column in ['whislo', 'q1', 'med', 'mean', 'q3', 'whishi']]
+    base = alt.Chart(stats).encode(y=y, tooltip=tooltip)
+    whiskers = base.mark_rule(color=linecolor).encode(x=alt.X('whislo:Q', title='Page Views', axis=x_axis), x2='whishi:Q')
+    boxes = base.mark_bar(size=18, color=boxcolor, stroke=linecolor).encode(x='q1:Q', x2='q3:Q')
+    medians = base.mark_tick(color=linecolor, size=18, thickness=1.5).encode(x='med:Q')
+    means = base.mark_point(shape='circle', filled=True, color=background, stroke=linecolor).encode(x='mean:Q')
+    outliers = alt.Chart(fliers).mark_point(shape='diamond', filled=True, color=linecolor, size=15).encode(
+        x='views:Q', y=alt.Y('era:N', sort=order), tooltip=['era:N', 'song_title:N', alt.Tooltip('views:Q', format=',')])
+    return _finish(whiskers + boxes + medians + means + outliers, title, width=900, height=450)
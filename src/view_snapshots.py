@@ -0,0 +1,139 @@
+"""Stores Genius page views per song per scrape run as delta-encoded time series.
+
+   Snapshots live in their own SQLite database so rebuilding the discography
+   database never discards the history. Each run only stores the change in
+   views since the song's previous value, and unchanged songs store nothing,
+   so daily snapshots stay small; SQLite's variable-length integers keep the
+   (mostly small) deltas to a few bytes each.
+"""
+
+from datetime import datetime
+
+import pandas as pd
+import sqlite3 as sql
+
+schema = '''
+CREATE TABLE IF NOT EXISTS snapshot_runs (
+    run_id INTEGER PRIMARY KEY,
+    taken_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot_songs (
+    song_id INTEGER PRIMARY KEY,
+    song_url TEXT NOT NULL UNIQUE,
+    song_title TEXT
+);
+CREATE TABLE IF NOT EXISTS view_deltas (
+    song_id INTEGER NOT NULL,
+    run_id INTEGER NOT NULL,
+    delta INTEGER NOT NULL,
+    PRIMARY KEY (song_id, run_id)
+) WITHOUT ROWID;
+'''
+
+views_query = '''
+SELECT s.song_id, s.song_url, s.song_title, SUM(d.delta) AS views
+FROM view_deltas d JOIN snapshot_songs s ON d.song_id = s.song_id
+WHERE d.run_id <= ?
+GROUP BY s.song_id
+'''
+
+def connect(db_name):
+    """Opens snapshot database, creating its tables if needed."""
+    connection = sql.connect(db_name)
+    connection.executescript(schema)
+    return connection
+
+def record_snapshot(db_name, df, taken_at=None):
+    """Records page views of every song in discography dataframe as a new run.
+
+       Returns the new run ID. Songs are matched on song_url; only songs whose
+       views changed since their last recorded value get a row.
+    """
+    taken_at = taken_at or datetime.now()
+    connection = connect(db_name)
+    with connection:
+        cursor = connection.execute('INSERT INTO snapshot_runs (taken_at) VALUES (?)',
+                                    (pd.Timestamp(taken_at).isoformat(),))
+        run_id = cursor.lastrowid
+
+        songs = df[['song_url', 'song_title', 'song_page_views']].drop_duplicates('song_url')
+        connection.executemany('INSERT OR IGNORE INTO snapshot_songs (song_url, song_title) VALUES (?, ?)',
+                               songs[['song_url', 'song_title']].itertuples(index=False))
+
+        song_ids = pd.read_sql('SELECT song_id, song_url FROM snapshot_songs', connection)
+        previous = pd.read_sql('SELECT song_id, SUM(delta) AS views FROM view_deltas GROUP BY song_id', connection)
+
+        current = songs.merge(song_ids, on='song_url').merge(previous, on='song_id', how='left')
+        previous_views = pd.to_numeric(current['views']).fillna(0).astype('int64')
+        current['delta'] = current['song_page_views'] - previous_views
+        changed = current[current['delta'] != 0]
+        connection.executemany('INSERT INTO view_deltas (song_id, run_id, delta) VALUES (?, ?, ?)',
+                               ((int(song_id), run_id, int(delta)) for song_id, delta
+                                in zip(changed['song_id'], changed['delta'])))
+    connection.close()
+    return run_id
+
+def list_runs(db_name):
+    """Returns dataframe of snapshot runs (run_id, taken_at), oldest first."""
+    connection = connect(db_name)
+    runs = pd.read_sql('SELECT run_id, taken_at FROM snapshot_runs ORDER BY run_id', connection,
+                       parse_dates=['taken_at'])
+    connection.close()
+    return runs
+
+def views_at(db_name, run_id=None):
+    """Returns dataframe of each song's page views as of given run (default latest)."""
+    connection = connect(db_name)
+    if run_id is None:
+        run_id = connection.execute('SELECT MAX(run_id) FROM snapshot_runs').fetchone()[0] or 0
+    views = pd.read_sql(views_query, connection, params=(int(run_id),))
+    connection.close()
+    return views
+
+def view_history(db_name, song_url):
+    """Returns page view time series (taken_at, views) of given song."""
+    connection = connect(db_name)
+    history = pd.read_sql('''
+        SELECT r.run_id, r.taken_at,
+            SUM(COALESCE(d.delta, 0)) OVER (ORDER BY r.run_id) AS views
+        FROM snapshot_runs r
+        LEFT JOIN view_deltas d ON d.run_id = r.run_id
+            AND d.song_id = (SELECT song_id FROM snapshot_songs WHERE song_url = ?)
+        ORDER BY r.run_id
+        ''', connection, params=(song_url,), parse_dates=['taken_at'])
+    connection.close()
+    return history
+
+def growth(db_name, start_run=None, end_run=None):
+    """Returns dataframe of page view growth per song between two runs.
+
+       Defaults to the two most recent runs. Columns: song_url, song_title,
+       start_views, end_views, gained, growth_rate (gained / start_views),
+       and views_per_day.
+    """
+    runs = list_runs(db_name)
+    if len(runs) == 0:
+        return pd.DataFrame(columns=['song_url', 'song_title', 'start_views', 'end_views',
+                                     'gained', 'growth_rate', 'views_per_day'])
+    end_run = int(end_run or runs['run_id'].iloc[-1])
+    start_run = int(start_run or runs['run_id'].iloc[max(len(runs) - 2, 0)])
+
+    start = views_at(db_name, start_run).rename(columns={'views': 'start_views'})
+    end = views_at(db_name, end_run).rename(columns={'views': 'end_views'})
+    changes = end.merge(start[['song_id', 'start_views']], on='song_id', how='left')
+    changes['start_views'] = changes['start_views'].fillna(0).astype('int64')
+    changes['gained'] = changes['end_views'] - changes['start_views']
+    changes['growth_rate'] = (changes['gained'] / changes['start_views'].where(changes['start_views'] > 0)).round(4)
+
+    taken_at = runs.set_index('run_id')['taken_at']
+    days = (taken_at[end_run] - taken_at[start_run]).total_seconds() / 86400
+    changes['views_per_day'] = (changes['gained'] / days).round(1) if days > 0 else float('nan')
+    return changes.drop(columns='song_id')
+
+def top_movers(db_name, n=10, start_run=None, end_run=None, by='gained'):
+    """Returns the n songs with the largest growth between two runs.
+
+       Variable 'by' has to be either 'gained' or 'growth_rate'.
+    """
+    changes = growth(db_name, start_run, end_run)
+    return changes.sort_values(by, ascending=False).head(n).reset_index(drop=True)